@@ -0,0 +1,61 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:28
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_counters(apps, schema_editor):
+    QuoteRequest = apps.get_model('quotes', 'QuoteRequest')
+    Proposal = apps.get_model('quotes', 'Proposal')
+    StatusCounter = apps.get_model('audits', 'StatusCounter')
+    DailyPremium = apps.get_model('audits', 'DailyPremium')
+
+    counters = []
+    for model_name, model in (('quote_request', QuoteRequest), ('proposal', Proposal)):
+        for row in model.objects.values('status').annotate(total=Count('id')):
+            counters.append(StatusCounter(model_name=model_name, status=row['status'], count=row['total']))
+    StatusCounter.objects.bulk_create(counters)
+
+    daily = (
+        Proposal.objects.filter(status='COMPLETED')
+        .annotate(day=TruncDate('proposal_date')).values('day')
+        .annotate(completed=Count('id'), premium=Sum('total_premium'))
+    )
+    DailyPremium.objects.bulk_create([
+        DailyPremium(date=row['day'], completed_count=row['completed'], total_premium=row['premium'] or 0)
+        for row in daily
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0006_proposal_pdf_hash'),
+        ('audits', '0002_auditlog_content_type_auditlog_object_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPremium',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('total_premium', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50)),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('model_name', 'status')},
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
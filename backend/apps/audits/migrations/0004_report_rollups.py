@@ -0,0 +1,67 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('insurers', '0001_initial'),
+        ('audits', '0003_statuscounter_dailypremium'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50, unique=True)),
+                ('refreshed_until', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupDirtyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50)),
+                ('date', models.DateField()),
+            ],
+            options={
+                'unique_together': {('model_name', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyQuoteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('cargo_type', models.CharField(max_length=100)),
+                ('quote_count', models.IntegerField(default=0)),
+                ('total_cargo_value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('broker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('date', 'status', 'cargo_type', 'broker')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProposalRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('cargo_type', models.CharField(max_length=100)),
+                ('proposal_count', models.IntegerField(default=0)),
+                ('total_premium', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('broker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('insurer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='insurers.insurer')),
+            ],
+            options={
+                'unique_together': {('date', 'status', 'insurer', 'cargo_type', 'broker')},
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+from datetime import date, datetime, timezone
+
+from django.db import migrations
+
+MONTHS_AHEAD = 3
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_auditlog(apps, schema_editor):
+    """
+    Converte audits_auditlog em tabela particionada por mês de timestamp
+    (PostgreSQL). A chave primária passa a ser (id, timestamp), exigência do
+    particionamento; índices e restrições são recriados com os mesmos nomes.
+    Antes do PostgreSQL 17, tabelas particionadas não aceitam colunas
+    IDENTITY: o id passa a ser um bigint comum com default nextval() de uma
+    sequência própria, continuada a partir do maior id existente.
+    Nos demais bancos a tabela permanece como está.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'audits_auditlog'::regclass")
+        if cursor.fetchone()[0] == 'p':
+            return
+
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = 'audits_auditlog' AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = 'audits_auditlog'::regclass AND contype = 'p')"
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = 'audits_auditlog'::regclass AND contype IN ('f', 'c')"
+        )
+        constraints = cursor.fetchall()
+        cursor.execute('SELECT min("timestamp"), max(id) FROM audits_auditlog')
+        first_timestamp, max_id = cursor.fetchone()
+        cursor.execute(
+            "SELECT attidentity <> '', pg_get_serial_sequence('audits_auditlog', 'id') FROM pg_attribute "
+            "WHERE attrelid = 'audits_auditlog'::regclass AND attname = 'id'"
+        )
+        is_identity, sequence = cursor.fetchone()
+
+        cursor.execute('ALTER TABLE audits_auditlog RENAME TO audits_auditlog_legacy')
+        # A sequência é desvinculada da tabela antiga (que será excluída) e
+        # passa a alimentar o id da tabela particionada
+        if is_identity:
+            cursor.execute('ALTER TABLE audits_auditlog_legacy ALTER COLUMN id DROP IDENTITY')
+            sequence = 'audits_auditlog_id_seq'
+            cursor.execute(f'CREATE SEQUENCE {sequence}')
+        else:
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+        cursor.execute(
+            'CREATE TABLE audits_auditlog (LIKE audits_auditlog_legacy INCLUDING DEFAULTS) '
+            'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute("ALTER TABLE audits_auditlog ALTER COLUMN id SET DEFAULT nextval(%s::regclass)", [sequence])
+        cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY audits_auditlog.id')
+        cursor.execute('CREATE TABLE audits_auditlog_default PARTITION OF audits_auditlog DEFAULT')
+
+        current = datetime.now(timezone.utc).date().replace(day=1)
+        month = first_timestamp.astimezone(timezone.utc).date().replace(day=1) if first_timestamp else current
+        while month <= add_months(current, MONTHS_AHEAD):
+            cursor.execute(
+                f'CREATE TABLE audits_auditlog_y{month.year}m{month.month:02d} PARTITION OF audits_auditlog '
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+            )
+            month = add_months(month, 1)
+
+        cursor.execute('INSERT INTO audits_auditlog SELECT * FROM audits_auditlog_legacy')
+        cursor.execute("SELECT setval(%s::regclass, %s, %s)", [sequence, max_id or 1, max_id is not None])
+        cursor.execute('DROP TABLE audits_auditlog_legacy')
+
+        cursor.execute('ALTER TABLE audits_auditlog ADD CONSTRAINT audits_auditlog_pkey PRIMARY KEY (id, "timestamp")')
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in constraints:
+            cursor.execute(f'ALTER TABLE audits_auditlog ADD CONSTRAINT "{name}" {definition}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audits', '0006_alter_auditlog_timestamp'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_auditlog, migrations.RunPython.noop),
+    ]
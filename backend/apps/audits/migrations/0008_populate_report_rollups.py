@@ -0,0 +1,60 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def populate_rollups(apps, schema_editor):
+    QuoteRequest = apps.get_model('quotes', 'QuoteRequest')
+    Proposal = apps.get_model('quotes', 'Proposal')
+    DailyQuoteRollup = apps.get_model('audits', 'DailyQuoteRollup')
+    DailyProposalRollup = apps.get_model('audits', 'DailyProposalRollup')
+    RollupWatermark = apps.get_model('audits', 'RollupWatermark')
+
+    started_at = timezone.now()
+    quotes = (
+        QuoteRequest.objects.annotate(day=TruncDate('request_date'))
+        .values('day', 'status', 'cargo_type', 'user')
+        .annotate(total=Count('id'), cargo_value=Sum('cargo_value'))
+        .order_by()
+    )
+    DailyQuoteRollup.objects.all().delete()
+    DailyQuoteRollup.objects.bulk_create([
+        DailyQuoteRollup(
+            date=row['day'], status=row['status'], cargo_type=row['cargo_type'], broker_id=row['user'],
+            quote_count=row['total'], total_cargo_value=row['cargo_value'] or 0,
+        )
+        for row in quotes
+    ], batch_size=1000)
+
+    proposals = (
+        Proposal.objects.annotate(day=TruncDate('proposal_date'))
+        .values('day', 'status', 'quote_result__insurer', 'quote_request__cargo_type', 'quote_request__user')
+        .annotate(total=Count('id'), premium=Sum('total_premium'))
+        .order_by()
+    )
+    DailyProposalRollup.objects.all().delete()
+    DailyProposalRollup.objects.bulk_create([
+        DailyProposalRollup(
+            date=row['day'], status=row['status'], insurer_id=row['quote_result__insurer'],
+            cargo_type=row['quote_request__cargo_type'], broker_id=row['quote_request__user'],
+            proposal_count=row['total'], total_premium=row['premium'] or 0,
+        )
+        for row in proposals
+    ], batch_size=1000)
+
+    # A próxima atualização agendada parte daqui, sem reconstruir as tabelas
+    for model_name in ('quote_request', 'proposal'):
+        RollupWatermark.objects.update_or_create(model_name=model_name, defaults={'refreshed_until': started_at})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0007_proposal_updated_at_quoterequest_updated_at'),
+        ('audits', '0007_partition_auditlog'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
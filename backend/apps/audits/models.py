@@ -1,5 +1,6 @@
 
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
@@ -7,9 +8,14 @@ from django.contrib.contenttypes.models import ContentType
 User = get_user_model()
 
 class AuditLog(models.Model):
+    """
+    Registro de auditoria. Em PostgreSQL a tabela é particionada por mês de
+    timestamp (ver core.business_logic.audit_partitions).
+    """
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_index=True)
     action = models.CharField(max_length=255)
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Horário da ação, informado pelo evento quando a gravação é feita em lote (ver audit_sink)
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     details = models.JSONField(null=True, blank=True)
 
     # Campos para GenericForeignKey
@@ -17,6 +23,107 @@ class AuditLog(models.Model):
     object_id = models.PositiveIntegerField(null=True, blank=True)
     content_object = GenericForeignKey("content_type", "object_id")
 
+    class Meta:
+        indexes = [
+            # Feed de atividades: paginação por (timestamp, id) decrescentes, geral e por usuário
+            models.Index(fields=["-timestamp", "-id"], name="auditlog_timestamp_id_desc"),
+            models.Index(fields=["user", "-timestamp", "-id"], name="auditlog_user_timestamp_desc"),
+        ]
+
     def __str__(self):
         return f"{self.action} by {self.user.username if self.user else 'Anonymous'} at {self.timestamp}"
 
+
+
+class StatusCounter(models.Model):
+    """
+    Total de registros por status (cotações e propostas), mantido de forma
+    incremental na mesma transação das alterações. Lido pelo dashboard.
+    """
+    model_name = models.CharField(max_length=50)
+    status = models.CharField(max_length=20)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('model_name', 'status')
+
+    def __str__(self):
+        return f"{self.model_name}:{self.status} = {self.count}"
+
+
+class DailyPremium(models.Model):
+    """
+    Propostas concluídas e soma do prêmio por dia da proposta, mantidas de
+    forma incremental. Lido pelo dashboard (receita dos últimos 30 dias).
+    """
+    date = models.DateField(unique=True)
+    completed_count = models.IntegerField(default=0)
+    total_premium = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.date}: {self.completed_count} propostas, R$ {self.total_premium}"
+
+
+class DailyQuoteRollup(models.Model):
+    """
+    Cotações por dia da solicitação, status, tipo de carga e corretor,
+    pré-agregadas para os relatórios (ver core.business_logic.report_rollups).
+    """
+    date = models.DateField()
+    status = models.CharField(max_length=20)
+    cargo_type = models.CharField(max_length=100)
+    broker = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    quote_count = models.IntegerField(default=0)
+    total_cargo_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'status', 'cargo_type', 'broker')
+
+    def __str__(self):
+        return f"{self.date} {self.status} {self.cargo_type}: {self.quote_count} cotações"
+
+
+class DailyProposalRollup(models.Model):
+    """
+    Propostas por dia da proposta, status, seguradora, tipo de carga e
+    corretor, com a soma do prêmio, pré-agregadas para os relatórios.
+    """
+    date = models.DateField()
+    status = models.CharField(max_length=20)
+    insurer = models.ForeignKey("insurers.Insurer", on_delete=models.CASCADE, related_name='+')
+    cargo_type = models.CharField(max_length=100)
+    broker = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    proposal_count = models.IntegerField(default=0)
+    total_premium = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'status', 'insurer', 'cargo_type', 'broker')
+
+    def __str__(self):
+        return f"{self.date} {self.status} {self.insurer_id}: {self.proposal_count} propostas"
+
+
+class RollupWatermark(models.Model):
+    """
+    Até quando as alterações de cada tabela de origem já foram agregadas.
+    """
+    model_name = models.CharField(max_length=50, unique=True)
+    refreshed_until = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.model_name}: {self.refreshed_until}"
+
+
+class RollupDirtyDay(models.Model):
+    """
+    Dias a reagregar por exclusões de registros de origem, que não deixam
+    rastro em updated_at.
+    """
+    model_name = models.CharField(max_length=50)
+    date = models.DateField()
+
+    class Meta:
+        unique_together = ('model_name', 'date')
+
+    def __str__(self):
+        return f"{self.model_name}: {self.date}"
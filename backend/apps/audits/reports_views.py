@@ -1,24 +1,80 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import status
-from apps.quotes.models import QuoteRequest, Proposal
-from django.db.models import Count, Sum, F
-from datetime import datetime, timedelta
+from rest_framework.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from core.business_logic.report_rollups import QUOTE_GROUPS, PROPOSAL_GROUPS, quote_report, proposal_report
+
+# Período padrão (dias até hoje) e período máximo aceito pelos relatórios
+REPORT_DEFAULT_DAYS = 30
+REPORT_MAX_DAYS = 366
+
+
+def _can_view_all_brokers(user) -> bool:
+    return user.is_staff or user.groups.filter(name__in=['Manager', 'Admin', 'Auditor']).exists()
+
+
+def _parse_date_param(request, name, default):
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Data inválida. Use o formato AAAA-MM-DD."})
+    return parsed
+
+
+def _report_params(request, groups, default_group_by):
+    """
+    Lê os parâmetros comuns dos relatórios: período (date_from/date_to),
+    agrupamento (group_by, separado por vírgulas) e filtros (status,
+    cargo_type, insurer, broker). Corretores só veem as próprias cotações.
+    """
+    date_to = _parse_date_param(request, "date_to", timezone.localdate())
+    date_from = _parse_date_param(request, "date_from", date_to - timedelta(days=REPORT_DEFAULT_DAYS - 1))
+    if date_from > date_to:
+        raise ValidationError({"date_from": "A data inicial deve ser anterior à data final."})
+    if (date_to - date_from).days >= REPORT_MAX_DAYS:
+        raise ValidationError({"date_from": f"O período máximo é de {REPORT_MAX_DAYS} dias."})
+
+    group_by = [name for name in request.query_params.get("group_by", default_group_by).split(",") if name]
+    invalid = [name for name in group_by if name not in groups]
+    if invalid or not group_by:
+        raise ValidationError({"group_by": f"Agrupamentos aceitos: {', '.join(groups)}."})
+
+    filters = {}
+    for name in ("status", "cargo_type"):
+        if request.query_params.get(name):
+            filters[name] = request.query_params[name]
+    for name in ("insurer", "broker"):
+        if request.query_params.get(name):
+            try:
+                filters[f"{name}_id"] = int(request.query_params[name])
+            except ValueError:
+                raise ValidationError({name: "Informe o ID numérico."})
+    if not _can_view_all_brokers(request.user):
+        filters["broker_id"] = request.user.id
+    return date_from, date_to, group_by, filters
+
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def quotes_by_status_report(request):
-    # Example report: count of quotes by status
-    report_data = QuoteRequest.objects.values("status").annotate(count=Count("id"))
-    return Response(report_data)
+    # Cotações por status no período, lidas das tabelas agregadas (ver core.business_logic.report_rollups)
+    date_from, date_to, group_by, filters = _report_params(request, QUOTE_GROUPS, "status")
+    return Response(quote_report(date_from, date_to, group_by, **filters))
+
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def proposals_by_insurer_report(request):
-    # Example report: total premium by insurer for completed proposals
-    # Corrigindo: Proposal não tem campo insurer_name, mas tem quote_result que tem insurer
-    report_data = Proposal.objects.filter(status="COMPLETED").select_related('quote_result__insurer').values("quote_result__insurer__name").annotate(total_premium=Sum("total_premium"))
-    return Response(report_data)
-
-
+    # Prêmio por seguradora no período; sem filtro ou agrupamento por status, apenas propostas concluídas
+    date_from, date_to, group_by, filters = _report_params(request, PROPOSAL_GROUPS, "insurer")
+    if "status" not in filters and "status" not in group_by:
+        filters["status"] = "COMPLETED"
+    return Response(proposal_report(date_from, date_to, group_by, **filters))
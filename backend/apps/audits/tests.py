@@ -0,0 +1,376 @@
+from decimal import Decimal
+from datetime import date, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
+import json
+from django.test import TestCase, override_settings
+from django.db import connection
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.files.storage import storages
+import gzip
+import tempfile
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.insurers.models import Insurer
+from apps.quotes.models import QuoteRequest, QuoteResult, Proposal
+from apps.audits.models import AuditLog, StatusCounter, DailyPremium, DailyProposalRollup
+from core.business_logic.dashboard_counters import reconcile_counters
+from core.business_logic.proposal_state import transition
+from core.business_logic.report_rollups import refresh_report_rollups
+from core.business_logic.activity_feed import record_activity, audit_entry
+from core.business_logic.audit_sink import _store_entries, store_audit_events
+from core.business_logic.audit_partitions import (
+    add_months, archive_audit_partitions, ensure_audit_partitions, export_audit_rows, partition_month, partition_name,
+)
+
+User = get_user_model()
+
+
+class AuditsTestMixin:
+    """
+    Cotações e propostas mínimas compartilhadas pelas suítes de auditoria e relatórios.
+    """
+    def create_base_data(self):
+        self.user = User.objects.create_user(username='broker', email='broker@example.com', password='StrongPassword123')
+        self.insurer = Insurer.objects.create(name='Seguradora A')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_quote_request(self, **overrides):
+        data = {
+            'user': self.user,
+            'client_name': 'Transportadora Exemplo',
+            'client_document': '12.345.678/0001-90',
+            'cargo_type': 'Eletrônicos',
+            'cargo_value': Decimal('50000.00'),
+            'origin': 'Rio de Janeiro - RJ',
+            'destination': 'Curitiba - PR',
+            'monthly_revenue': Decimal('800000.00'),
+            'general_lmg': Decimal('400000.00'),
+        }
+        data.update(overrides)
+        return QuoteRequest.objects.create(**data)
+
+    def create_proposal(self, premium=Decimal('1000.00'), **overrides):
+        quote_request = self.create_quote_request()
+        quote_result = QuoteResult.objects.create(
+            quote_request=quote_request, insurer=self.insurer, rctr_c_rate=Decimal('0.1500'), rc_dc_rate=Decimal('0.0800'),
+            rctr_c_limit=Decimal('400000.00'), rc_dc_limit=Decimal('300000.00'), premium_value=premium
+        )
+        data = {
+            'quote_request': quote_request,
+            'quote_result': quote_result,
+            'total_premium': premium,
+            'rctr_c_rate': quote_result.rctr_c_rate,
+            'rc_dc_rate': quote_result.rc_dc_rate,
+            'rctr_c_limit': quote_result.rctr_c_limit,
+            'rc_dc_limit': quote_result.rc_dc_limit,
+            'valid_until': timezone.localdate() + timedelta(days=30),
+        }
+        data.update(overrides)
+        return Proposal.objects.create(**data)
+
+
+class DashboardCountersTest(AuditsTestMixin, TestCase):
+    """
+    Suite de testes para os contadores incrementais do dashboard.
+    """
+    def setUp(self):
+        self.create_base_data()
+
+    def test_dashboard_reads_counters(self):
+        """
+        Testa se os contadores acompanham criações e transições e se o dashboard os lê sem varrer as tabelas.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_quote_request()
+            pending = self.create_proposal()
+            completed = self.create_proposal(premium=Decimal('2500.50'))
+            transition(completed, 'approve')
+            transition(completed, 'complete')
+            # Os contadores só são alterados depois do commit
+            self.assertFalse(StatusCounter.objects.exists())
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/audits/dashboard-stats/')
+        self.assertEqual(response.data['totalQuotes'], 3)
+        self.assertEqual(response.data['pendingProposals'], 1)
+        self.assertEqual(response.data['completedProposals'], 1)
+        self.assertEqual(Decimal(response.data['monthlyRevenue']), Decimal('2500.50'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pending.delete()
+        self.assertEqual(StatusCounter.objects.get(model_name='proposal', status='PENDING').count, 0)
+
+    def test_reconciliation_fixes_drift(self):
+        """
+        Testa se a reconciliação corrige contadores e receita divergentes.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_proposal()
+        StatusCounter.objects.filter(model_name='proposal', status='PENDING').update(count=10)
+        DailyPremium.objects.create(date=timezone.localdate(), completed_count=3, total_premium=Decimal('99.00'))
+
+        drift = reconcile_counters()
+
+        self.assertEqual(drift['proposal:PENDING'], -9)
+        self.assertEqual(StatusCounter.objects.get(model_name='proposal', status='PENDING').count, 1)
+        self.assertEqual(DailyPremium.objects.get(date=timezone.localdate()).total_premium, Decimal('0'))
+        self.assertEqual(reconcile_counters(), {})
+
+
+class ReportRollupTest(AuditsTestMixin, TestCase):
+    """
+    Suite de testes para as tabelas agregadas dos relatórios.
+    """
+    def setUp(self):
+        self.create_base_data()
+
+    def test_incremental_refresh(self):
+        """
+        Testa se a atualização reagrega apenas os dias alterados, inclusive por exclusões.
+        """
+        completed = self.create_proposal(premium=Decimal('1500.00'))
+        transition(completed, 'approve')
+        transition(completed, 'complete')
+        self.create_proposal()
+        self.assertEqual(refresh_report_rollups(), {'quote_request': 1, 'proposal': 1})
+        self.assertEqual(DailyProposalRollup.objects.get(status='COMPLETED').total_premium, Decimal('1500.00'))
+
+        # Registros antigos, fora da margem da última atualização, não são reagregados
+        old = timezone.now() - timedelta(days=3)
+        Proposal.objects.update(updated_at=old)
+        QuoteRequest.objects.update(updated_at=old)
+        self.assertEqual(refresh_report_rollups(), {'quote_request': 0, 'proposal': 0})
+
+        # Alterações na cotação reagregam também as propostas dela
+        QuoteRequest.objects.filter(id=completed.quote_request_id).update(updated_at=timezone.now())
+        self.assertEqual(refresh_report_rollups(), {'quote_request': 1, 'proposal': 1})
+
+        completed.quote_request.delete()
+        self.assertEqual(refresh_report_rollups(), {'quote_request': 1, 'proposal': 1})
+        self.assertFalse(DailyProposalRollup.objects.filter(status='COMPLETED').exists())
+        self.assertEqual(DailyProposalRollup.objects.get().proposal_count, 1)
+
+    def test_reports_read_rollups(self):
+        """
+        Testa se os relatórios filtram por período e corretor e validam os parâmetros.
+        """
+        completed = self.create_proposal(premium=Decimal('1500.00'))
+        transition(completed, 'approve')
+        transition(completed, 'complete')
+        other_broker = User.objects.create_user(username='other', email='other@example.com', password='StrongPassword123')
+        self.create_quote_request(user=other_broker)
+        refresh_report_rollups()
+
+        with self.assertNumQueries(2):  # grupos do usuário + tabela agregada
+            response = self.client.get('/api/v1/audits/reports/proposals-by-insurer/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['quote_result__insurer__name'], 'Seguradora A')
+        self.assertEqual(response.data[0]['total_premium'], Decimal('1500.00'))
+
+        # Corretores veem apenas as próprias cotações
+        response = self.client.get('/api/v1/audits/reports/quotes-by-status/')
+        self.assertEqual([(row['status'], row['count']) for row in response.data], [('PENDING', 1)])
+
+        yesterday = timezone.localdate() - timedelta(days=1)
+        response = self.client.get('/api/v1/audits/reports/quotes-by-status/', {'date_to': yesterday.isoformat()})
+        self.assertEqual(list(response.data), [])
+
+        self.assertEqual(self.client.get('/api/v1/audits/reports/quotes-by-status/', {'date_from': '2020-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/audits/reports/quotes-by-status/', {'group_by': 'insurer'}).status_code, 400)
+
+    def test_auditors_view_all_brokers(self):
+        """
+        Testa se auditores veem as cotações de todos os corretores.
+        """
+        self.create_quote_request()
+        other_broker = User.objects.create_user(username='other', email='other@example.com', password='StrongPassword123')
+        self.create_quote_request(user=other_broker)
+        refresh_report_rollups()
+        auditor_group, _ = Group.objects.get_or_create(name='Auditor')
+        self.user.groups.add(auditor_group)
+
+        response = self.client.get('/api/v1/audits/reports/quotes-by-status/')
+        self.assertEqual([(row['status'], row['count']) for row in response.data], [('PENDING', 2)])
+
+
+@override_settings(AUDIT_SINK='sync')
+class ActivityFeedTest(AuditsTestMixin, TestCase):
+    """
+    Suite de testes para o feed de atividades baseado no AuditLog.
+    """
+    def setUp(self):
+        cache.clear()
+        self.create_base_data()
+        self.other_user = User.objects.create_user(username='other', email='other@example.com', password='StrongPassword123')
+
+    def test_keyset_pagination_per_user(self):
+        """
+        Testa se o feed mostra apenas as atividades do usuário e pagina por cursor sem repetir itens.
+        """
+        quote_requests = [self.create_quote_request(client_name=f'Cliente {i}') for i in range(5)]
+        for quote_request in quote_requests:
+            record_activity(self.user, 'QUOTE_REQUEST_CREATED', f'Nova cotação para {quote_request.client_name}', quote_request)
+        record_activity(self.other_user, 'QUOTE_REQUEST_CREATED', 'Cotação de outro corretor')
+
+        with self.assertNumQueries(2):  # grupos do usuário + página do feed
+            first = self.client.get('/api/v1/audits/recent-activity/', {'limit': 3})
+        self.assertEqual([item['id'] for item in first.data], [q.id for q in reversed(quote_requests[2:])])
+        self.assertEqual(first.data[0]['action_type'], 'QUOTE_REQUEST')
+        self.assertEqual(first.data[0]['details'], 'Nova cotação para Cliente 4')
+
+        second = self.client.get('/api/v1/audits/recent-activity/', {'limit': 3, 'cursor': first['X-Next-Cursor']})
+        self.assertEqual([item['id'] for item in second.data], [q.id for q in reversed(quote_requests[:2])])
+        self.assertNotIn('X-Next-Cursor', second)
+
+        self.assertEqual(self.client.get('/api/v1/audits/recent-activity/', {'cursor': 'invalido'}).status_code, 400)
+
+    def test_first_page_cache_invalidated_on_write(self):
+        """
+        Testa se a primeira página vem do cache e é descartada quando há nova atividade.
+        """
+        record_activity(self.user, 'QUOTE_REQUEST_CREATED', 'Primeira atividade')
+        self.client.get('/api/v1/audits/recent-activity/')
+        with self.assertNumQueries(1):  # apenas os grupos do usuário
+            cached = self.client.get('/api/v1/audits/recent-activity/')
+        self.assertEqual(len(cached.data), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record_activity(self.user, 'PROPOSAL_APPROVED', 'Segunda atividade')
+        response = self.client.get('/api/v1/audits/recent-activity/')
+        self.assertEqual([item['details'] for item in response.data], ['Segunda atividade', 'Primeira atividade'])
+
+
+@override_settings(AUDIT_SINK='stream')
+class AuditSinkTest(AuditsTestMixin, TestCase):
+    """
+    Suite de testes para o envio assíncrono de eventos de auditoria.
+    """
+    def setUp(self):
+        self.create_base_data()
+
+    def test_stream_mode_defers_write(self):
+        """
+        Testa se o evento só é enviado após o commit e se o modo durável grava na transação.
+        """
+        quote_request = self.create_quote_request()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertIsNone(record_activity(self.user, 'QUOTE_REQUEST_CREATED', 'Nova cotação', quote_request))
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(AuditLog.objects.exists())
+
+        log = record_activity(self.user, 'PROPOSAL_APPROVED', 'Proposta aprovada', quote_request, durable=True)
+        self.assertEqual(AuditLog.objects.get().pk, log.pk)
+
+    def test_stream_unavailable_falls_back_to_database(self):
+        """
+        Testa se, sem o Redis, os eventos são gravados diretamente com o horário e o objeto originais.
+        """
+        quote_request = self.create_quote_request()
+        event = audit_entry(self.user, 'QUOTE_REQUEST_CREATED', 'Nova cotação', quote_request)
+        with mock.patch('core.business_logic.audit_sink.get_redis_connection', side_effect=ConnectionError):
+            with self.captureOnCommitCallbacks(execute=True):
+                record_activity(self.user, 'QUOTE_REQUEST_CREATED', 'Nova cotação', quote_request)
+        log = AuditLog.objects.get()
+        self.assertEqual(log.content_object, quote_request)
+        self.assertEqual(log.details, {'description': 'Nova cotação'})
+
+        # Eventos lidos do stream (JSON) mantêm o horário da ação
+        stored, = store_audit_events([json.loads(json.dumps(event))])
+        self.assertEqual(AuditLog.objects.get(pk=stored.pk).timestamp.isoformat(), event['timestamp'])
+
+
+    @override_settings(AUDIT_DEAD_LETTER_KEY='audit:events:dead')
+    def test_invalid_event_goes_to_dead_letter(self):
+        """
+        Testa se um evento inválido não impede a gravação do lote e é enviado ao stream de descarte.
+        """
+        valid = json.dumps(audit_entry(self.user, 'QUOTE_REQUEST_CREATED', 'Nova cotação')).encode()
+        entries = [(b'1-0', {b'event': valid}), (b'2-0', {b'event': b'{invalido'}), (b'3-0', {b'event': valid})]
+        connection = mock.Mock()
+
+        self.assertEqual(_store_entries(connection, entries), 2)
+        self.assertEqual(AuditLog.objects.count(), 2)
+        connection.xadd.assert_called_once()
+        key, fields = connection.xadd.call_args.args
+        self.assertEqual(key, 'audit:events:dead')
+        self.assertEqual((fields[b'entry_id'], fields[b'event']), (b'2-0', b'{invalido'))
+
+
+class AuditLogQueryTest(AuditsTestMixin, TestCase):
+    """
+    Suite de testes para a consulta de auditoria por período e o arquivamento.
+    """
+    def setUp(self):
+        self.create_base_data()
+        auditor_group, _ = Group.objects.get_or_create(name='Auditor')
+        self.user.groups.add(auditor_group)
+        now = timezone.now()
+        self.recent = [
+            AuditLog.objects.create(user=self.user, action='PROPOSAL_APPROVED', timestamp=now - timedelta(hours=i))
+            for i in range(3)
+        ]
+        self.old = AuditLog.objects.create(user=self.user, action='PROPOSAL_APPROVED', timestamp=now - timedelta(days=90))
+
+    def test_list_is_bounded_and_paginated(self):
+        """
+        Testa se a listagem se limita ao período padrão, pagina por cursor e valida o período.
+        """
+        response = self.client.get('/api/v1/audits/auditlogs/', {'page_size': 2})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.recent[0].id, self.recent[1].id])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['results']], [self.recent[2].id])
+        self.assertIsNone(response.data['next'])
+
+        since = (timezone.now() - timedelta(days=120)).date().isoformat()
+        response = self.client.get('/api/v1/audits/auditlogs/', {'timestamp_from': since})
+        self.assertEqual(len(response.data['results']), 4)
+
+        self.assertEqual(self.client.get('/api/v1/audits/auditlogs/', {'timestamp_from': '2020-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/audits/auditlogs/', {'timestamp_to': 'ontem'}).status_code, 400)
+
+    def test_export_and_partition_names(self):
+        """
+        Testa se a exportação grava JSONL compactado e se os nomes de partição são interpretados.
+        """
+        self.assertEqual(partition_month('audits_auditlog_y2025m12'), date(2025, 12, 1))
+        self.assertIsNone(partition_month('audits_auditlog_default'))
+        self.assertEqual(add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+
+        rows = [json.dumps({'id': log.id, 'action': log.action}) for log in self.recent]
+        with tempfile.TemporaryDirectory() as location:
+            with mock.patch.object(storages['audit_archive'], 'location', location):
+                name = export_audit_rows(iter(rows), 'audits_auditlog_y2025m12')
+                with storages['audit_archive'].open(name, 'rb') as archive:
+                    lines = gzip.decompress(archive.read()).decode().splitlines()
+        self.assertEqual(name, 'audits_auditlog_y2025m12.jsonl.gz')
+        self.assertEqual([json.loads(line)['id'] for line in lines], [log.id for log in self.recent])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Particionamento disponível apenas no PostgreSQL')
+    def test_partition_maintenance(self):
+        """
+        Testa se registros da partição padrão ganham a partição do mês, se a retenção exporta e exclui
+        as partições antigas e se o id continua sendo gerado pela sequência da tabela particionada.
+        """
+        old_month = timezone.localtime(self.old.timestamp, dt_timezone.utc).date().replace(day=1)
+        self.assertIn(partition_name(old_month), ensure_audit_partitions())
+        self.assertEqual(ensure_audit_partitions(), [])
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {partition_name(old_month)}')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            # Na suíte tudo roda em uma transação: as verificações de FK adiadas impediriam o DROP TABLE
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+        with tempfile.TemporaryDirectory() as location:
+            with mock.patch.object(storages['audit_archive'], 'location', location):
+                archived = archive_audit_partitions(retention_months=1)
+                self.assertIn(f'{partition_name(old_month)}.jsonl.gz', archived)
+        self.assertFalse(AuditLog.objects.filter(id=self.old.id).exists())
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_get_serial_sequence('audits_auditlog', 'id')")
+            self.assertIsNotNone(cursor.fetchone()[0])
+        self.assertGreater(AuditLog.objects.create(action='PROPOSAL_APPROVED').id, self.recent[-1].id)
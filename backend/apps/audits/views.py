@@ -1,4 +1,9 @@
 from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from .models import AuditLog
 from .serializers import AuditLogSerializer
 from rest_framework.permissions import IsAuthenticated
@@ -9,14 +14,68 @@ from rest_framework import status
 from django.db import connection
 from django_redis import get_redis_connection
 from rest_framework.permissions import AllowAny
-from apps.quotes.models import QuoteRequest, Proposal
 from datetime import datetime, timedelta
-from django.db.models import Count, Sum, F
+from core.business_logic.dashboard_counters import get_dashboard_counters
+from core.business_logic.activity_feed import get_recent_activity, ACTIVITY_DEFAULT_LIMIT, ACTIVITY_MAX_LIMIT
+
+class AuditLogPagination(CursorPagination):
+    ordering = ("-timestamp", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
 
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Consulta de auditoria paginada por cursor e sempre limitada a um período
+    (timestamp_from/timestamp_to, padrão AUDIT_QUERY_DEFAULT_DAYS dias), para
+    que o PostgreSQL leia apenas as partições mensais do período. Filtros
+    opcionais: user, action, content_type e object_id.
+    """
     queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
     permission_classes = [IsAuthenticated, IsAuditor]
+    pagination_class = AuditLogPagination
+
+    def _timestamp_param(self, name, default):
+        value = self.request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                day = parse_date(value)
+                parsed = datetime.combine(day, datetime.min.time()) if day else None
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: "Informe uma data (AAAA-MM-DD) ou data e hora ISO 8601."})
+        return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != "list":
+            return queryset
+
+        timestamp_to = self._timestamp_param("timestamp_to", timezone.now())
+        timestamp_from = self._timestamp_param(
+            "timestamp_from", timestamp_to - timedelta(days=settings.AUDIT_QUERY_DEFAULT_DAYS)
+        )
+        if timestamp_from > timestamp_to:
+            raise ValidationError({"timestamp_from": "O início deve ser anterior ao fim do período."})
+        if timestamp_to - timestamp_from > timedelta(days=settings.AUDIT_QUERY_MAX_DAYS):
+            raise ValidationError({"timestamp_from": f"O período máximo é de {settings.AUDIT_QUERY_MAX_DAYS} dias."})
+        queryset = queryset.filter(timestamp__gte=timestamp_from, timestamp__lt=timestamp_to)
+
+        for param, field in (("user", "user_id"), ("content_type", "content_type_id"), ("object_id", "object_id")):
+            value = self.request.query_params.get(param)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({param: "Informe o ID numérico."})
+                queryset = queryset.filter(**{field: int(value)})
+        if self.request.query_params.get("action"):
+            queryset = queryset.filter(action=self.request.query_params["action"])
+        return queryset
 
 @api_view(["GET"])
 @permission_classes([AllowAny]) # Health check should be accessible without authentication
@@ -49,52 +108,33 @@ def health_check(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
-    total_quotes = QuoteRequest.objects.count()
-    pending_proposals = Proposal.objects.filter(status="PENDING").count()
-    completed_proposals = Proposal.objects.filter(status="COMPLETED").count()
-
-    # Monthly revenue (example: sum of total_premium for completed proposals in the last 30 days)
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    monthly_revenue = Proposal.objects.filter(
-        status="COMPLETED",
-        proposal_date__gte=thirty_days_ago
-    ).aggregate(Sum("total_premium"))["total_premium__sum"] or 0
-
-    return Response({
-        "totalQuotes": total_quotes,
-        "pendingProposals": pending_proposals,
-        "completedProposals": completed_proposals,
-        "monthlyRevenue": monthly_revenue,
-    })
+    # Totais mantidos incrementalmente em tabelas de resumo (ver core.business_logic.dashboard_counters)
+    return Response(get_dashboard_counters())
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def recent_activity(request):
-    # Fetch recent QuoteRequests and Proposals
-    recent_quote_requests = QuoteRequest.objects.order_by("-request_date")[:5]
-    recent_proposals = Proposal.objects.order_by("-proposal_date")[:5]
-
-    activity_list = []
-
-    for req in recent_quote_requests:
-        activity_list.append({
-            "id": req.id,
-            "action_type": "QUOTE_REQUEST",
-            "details": f"Nova cotação para {req.client_name}",
-            "timestamp": req.request_date,
-        })
-
-    for prop in recent_proposals:
-        activity_list.append({
-            "id": prop.id,
-            "action_type": "PROPOSAL",
-            "details": f"Proposta {prop.status} para {prop.quote_request.client_name}",
-            "timestamp": prop.proposal_date,
-        })
-
-    # Sort by timestamp and return top 5
-    activity_list.sort(key=lambda x: x["timestamp"], reverse=True)
-
-    return Response(activity_list[:5])
+    """
+    Feed de atividades a partir do AuditLog. Gerentes veem as atividades de
+    todos os usuários (ou de um, com ?user=<id>); os demais, apenas as próprias.
+    A próxima página é pedida com ?cursor=<X-Next-Cursor>.
+    """
+    try:
+        limit = min(max(int(request.query_params.get("limit", ACTIVITY_DEFAULT_LIMIT)), 1), ACTIVITY_MAX_LIMIT)
+    except ValueError:
+        return Response({"error": "O parâmetro limit deve ser um número inteiro."}, status=status.HTTP_400_BAD_REQUEST)
 
+    user = request.user
+    user_id = user.id
+    if user.is_staff or user.groups.filter(name__in=['Manager', 'Admin']).exists():
+        user_id = request.query_params.get("user") or None
 
+    try:
+        activities, next_cursor = get_recent_activity(user_id, limit, request.query_params.get("cursor"))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = Response(activities)
+    if next_cursor:
+        response["X-Next-Cursor"] = next_cursor
+    return response
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.business_logic.tariff_loader import TariffLoadError, load_tariffs, read_tariff_csv, read_tariff_parquet
+
+CHUNK_SIZE = 64 * 1024
+
+
+class Command(BaseCommand):
+    help = 'Loads an insurer tariff sheet (CSV or Parquet) into the business rule tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the tariff sheet.')
+        parser.add_argument('--format', choices=['csv', 'parquet'], help='File format (inferred from the extension by default).')
+        parser.add_argument('--delimiter', default=';', help='CSV delimiter (default: ";").')
+        parser.add_argument('--no-reprice', action='store_true', help='Do not reprice open quotes of the affected insurers.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('parquet' if path.endswith('.parquet') else 'csv')
+
+        try:
+            with open(path, 'rb') as tariff_file:
+                if file_format == 'parquet':
+                    rows = read_tariff_parquet(tariff_file)
+                else:
+                    rows = read_tariff_csv(iter(lambda: tariff_file.read(CHUNK_SIZE), b''), options['delimiter'])
+                summary = load_tariffs(rows, reprice=not options['no_reprice'])
+        except OSError as e:
+            raise CommandError(f'Could not read {path}: {e}')
+        except (TariffLoadError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        if summary['error_count']:
+            for error in summary['errors']:
+                self.stderr.write(error)
+            raise CommandError(f"{summary['error_count']} invalid rows. Nothing was loaded.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['loaded']} business rules loaded, {summary['merchandise_types_created']} merchandise types created."
+        ))
@@ -0,0 +1,127 @@
+from decimal import Decimal
+from io import StringIO
+import os
+import tempfile
+from unittest import mock, skipUnless
+from django.db import connection
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from apps.insurers.models import Insurer, InsurerBusinessRule, MerchandiseType
+from core.business_logic.rating_snapshot import get_rating_snapshot
+from core.business_logic import tariff_loader
+from core.business_logic.tariff_loader import load_tariffs, read_tariff_csv
+
+
+class TariffLoaderTest(TestCase):
+    """
+    Suite de testes para a carga em lote de planilhas de tarifas.
+    """
+    HEADER = 'insurer;merchandise_type;risk_level;rctr_c_rate;rc_dc_rate;high_risk_multiplier;is_active\n'
+
+    def setUp(self):
+        self.insurer_a = Insurer.objects.create(name='Seguradora A')
+        self.insurer_b = Insurer.objects.create(name='Seguradora B')
+        self.electronics = MerchandiseType.objects.create(name='Eletrônicos', risk_level='MODERATE')
+        InsurerBusinessRule.objects.create(
+            insurer=self.insurer_a, merchandise_type=self.electronics,
+            rctr_c_rate=Decimal('0.1000'), rc_dc_rate=Decimal('0.0500'), observations='Regra antiga'
+        )
+
+    def load(self, content, **kwargs):
+        return load_tariffs(read_tariff_csv([content.encode('utf-8')]), **kwargs)
+
+    def test_load_upserts_rules_and_merchandise_types(self):
+        """
+        Testa se a carga atualiza regras existentes, cria novas regras e tipos de mercadoria e invalida o snapshot.
+        """
+        version = get_rating_snapshot().version
+        content = self.HEADER + (
+            'Seguradora A;Eletrônicos;HIGH;0,1500;0.0800;1.50;true\n'
+            'Seguradora B;Eletrônicos;;0.1200;0.0500;;\n'
+            'Seguradora B;Grãos;LOW;0.0300;0.0200;;false\n'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            summary = self.load(content, reprice=False)
+
+        self.assertEqual(summary['loaded'], 3)
+        self.assertEqual(summary['merchandise_types_created'], 1)
+        self.assertEqual(InsurerBusinessRule.objects.count(), 3)
+        updated = InsurerBusinessRule.objects.get(insurer=self.insurer_a, merchandise_type=self.electronics)
+        self.assertEqual((updated.rctr_c_rate, updated.high_risk_multiplier), (Decimal('0.1500'), Decimal('1.50')))
+        # Coluna ausente da planilha: valor atual mantido
+        self.assertEqual(updated.observations, 'Regra antiga')
+        self.electronics.refresh_from_db()
+        self.assertEqual(self.electronics.risk_level, 'HIGH')
+        grains = InsurerBusinessRule.objects.get(merchandise_type__name='Grãos')
+        self.assertFalse(grains.is_active)
+        self.assertEqual(grains.merchandise_type.risk_level, 'LOW')
+        self.assertNotEqual(get_rating_snapshot().version, version)
+
+    def test_partial_sheet_keeps_existing_values(self):
+        """
+        Testa se colunas ausentes e células vazias mantêm os valores das regras existentes e se regras novas usam os padrões.
+        """
+        InsurerBusinessRule.objects.filter(insurer=self.insurer_a).update(
+            high_risk_multiplier=Decimal('2.00'), volume_discount_rate=Decimal('5.00'), valid_from='2024-01-01'
+        )
+        content = (
+            'insurer;merchandise_type;rctr_c_rate;rc_dc_rate;high_risk_multiplier\n'
+            'Seguradora A;Eletrônicos;0.2000;;\n'
+            'Seguradora B;Eletrônicos;0.1200;0.0500;\n'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            summary = self.load(content, reprice=False)
+
+        self.assertEqual(summary['loaded'], 2)
+        updated = InsurerBusinessRule.objects.get(insurer=self.insurer_a)
+        self.assertEqual(
+            (updated.rctr_c_rate, updated.rc_dc_rate, updated.high_risk_multiplier, updated.volume_discount_rate),
+            (Decimal('0.2000'), Decimal('0.0500'), Decimal('2.00'), Decimal('5.00'))
+        )
+        self.assertEqual((updated.observations, str(updated.valid_from)), ('Regra antiga', '2024-01-01'))
+        created = InsurerBusinessRule.objects.get(insurer=self.insurer_b)
+        self.assertEqual((created.high_risk_multiplier, created.observations), (Decimal('1.00'), ''))
+
+    @skipUnless(connection.vendor == 'postgresql', 'Carga via COPY disponível apenas no PostgreSQL')
+    def test_postgresql_load_uses_copy(self):
+        """
+        Testa se, no PostgreSQL, a carga passa pelo COPY com as mesmas regras de colunas parciais.
+        """
+        with mock.patch('core.business_logic.tariff_loader._upsert_rules_copy', wraps=tariff_loader._upsert_rules_copy) as copy:
+            self.test_partial_sheet_keeps_existing_values()
+        copy.assert_called_once()
+
+    def test_invalid_rows_abort_load(self):
+        """
+        Testa se linhas inválidas são reportadas e impedem qualquer gravação.
+        """
+        content = self.HEADER + (
+            'Seguradora A;Eletrônicos;;0.2000;0.0800;;\n'
+            'Seguradora X;Eletrônicos;;0.1200;0.0500;;\n'
+            'Seguradora B;Grãos;ALTISSIMO;abc;0.0200;;\n'
+        )
+        summary = self.load(content)
+
+        self.assertEqual(summary['loaded'], 0)
+        self.assertEqual(summary['error_count'], 2)
+        self.assertTrue(summary['errors'][0].startswith('Linha 3:'))
+        self.assertEqual(InsurerBusinessRule.objects.get(insurer=self.insurer_a).rctr_c_rate, Decimal('0.1000'))
+        self.assertFalse(MerchandiseType.objects.filter(name='Grãos').exists())
+
+    def test_management_command(self):
+        """
+        Testa se o comando load_tariffs carrega o arquivo e falha quando faltam colunas obrigatórias.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tarifas.csv')
+            with open(path, 'w', encoding='utf-8') as tariff_file:
+                tariff_file.write(self.HEADER + 'Seguradora B;Eletrônicos;;0.1200;0.0500;;\n')
+            out = StringIO()
+            call_command('load_tariffs', path, '--no-reprice', stdout=out)
+            self.assertIn('1 business rules loaded', out.getvalue())
+
+            with open(path, 'w', encoding='utf-8') as tariff_file:
+                tariff_file.write('insurer;rctr_c_rate\nSeguradora B;0.1\n')
+            with self.assertRaisesMessage(CommandError, 'merchandise_type'):
+                call_command('load_tariffs', path)
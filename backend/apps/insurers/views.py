@@ -1,9 +1,15 @@
 
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.response import Response
+from django.db import transaction
 from .models import Insurer, InsurerBusinessRule, MerchandiseType
 from .serializers import InsurerSerializer, InsurerBusinessRuleSerializer, MerchandiseTypeSerializer
 from rest_framework.permissions import IsAuthenticated
 from apps.users.permissions import IsAdmin
+from apps.tasks.pricing_tasks import reprice_open_quotes_task
+from core.business_logic.tariff_loader import TariffLoadError, load_tariffs, read_tariff_csv, read_tariff_parquet
 
 class InsurerViewSet(viewsets.ModelViewSet):
     queryset = Insurer.objects.all()
@@ -20,4 +26,36 @@ class InsurerBusinessRuleViewSet(viewsets.ModelViewSet):
     serializer_class = InsurerBusinessRuleSerializer
     permission_classes = [IsAuthenticated, IsAdmin]
 
+    def perform_update(self, serializer):
+        previous_rates = (serializer.instance.rctr_c_rate, serializer.instance.rc_dc_rate)
+        rule = serializer.save()
+        # Mudança de taxa: recalcular as cotações em aberto da seguradora após o commit
+        if (rule.rctr_c_rate, rule.rc_dc_rate) != previous_rates:
+            transaction.on_commit(lambda: reprice_open_quotes_task.delay([rule.insurer_id]))
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsAdmin],
+            parser_classes=[MultiPartParser, FormParser])
+    def bulk_load(self, request):
+        """
+        Carrega uma planilha de tarifas (CSV separado por ';' ou Parquet) em lote.
+        Se alguma linha for inválida, nada é gravado e os erros são retornados.
+        """
+        if 'file' not in request.FILES:
+            return Response({'error': 'Nenhum arquivo de tarifas fornecido.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        tariff_file = request.FILES['file']
+        try:
+            if tariff_file.name.endswith('.parquet'):
+                rows = read_tariff_parquet(tariff_file)
+            else:
+                rows = read_tariff_csv(tariff_file.chunks(), request.data.get('delimiter') or ';')
+            summary = load_tariffs(rows)
+        except TariffLoadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except UnicodeDecodeError:
+            return Response({'error': 'O arquivo deve estar codificado em UTF-8.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if summary['error_count']:
+            return Response({'message': 'Planilha com erros. Nenhuma regra foi gravada.', **summary},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({'message': f"{summary['loaded']} regras carregadas.", **summary}, status=status.HTTP_200_OK)
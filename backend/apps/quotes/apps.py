@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class QuotesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.quotes'
+
+    def ready(self):
+        """
+        Conecta os sinais que mantêm os caches de configuração atualizados.
+        """
+        import apps.quotes.signals
@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.core.files.storage import storages
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+import re
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if not header or not etag:
+        return False
+    candidates = [value.strip() for value in header.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def parse_range(header: str, size: int):
+    """
+    Interpreta um cabeçalho Range de intervalo único. Retorna (início, fim)
+    inclusivos, None para ignorar o cabeçalho (formato não suportado, como
+    múltiplos intervalos) ou ValueError se o intervalo não for satisfatível.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Sufixo: últimos N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _iter_file_range(file, start: int, length: int):
+    try:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = file.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def proposal_pdf_response(request, proposal):
+    """
+    Resposta de download do PDF da proposta.
+
+    O ETag forte é o hash do conteúdo (pdf_hash): clientes que já têm o
+    arquivo recebem 304. Com PROPOSAL_PDF_ACCEL_REDIRECT_PREFIX configurado, o
+    envio dos bytes (inclusive Range) é delegado ao nginx via X-Accel-Redirect;
+    caso contrário o arquivo é transmitido do storage em blocos, com suporte a
+    requisições Range de intervalo único.
+    """
+    etag = f'"{proposal.pdf_hash}"' if proposal.pdf_hash else None
+    filename = f"proposta_{proposal.id}.pdf"
+
+    def with_headers(response):
+        if etag:
+            response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    if _etag_matches(request.headers.get('If-None-Match'), etag):
+        return with_headers(HttpResponseNotModified())
+
+    if settings.PROPOSAL_PDF_ACCEL_REDIRECT_PREFIX:
+        response = HttpResponse(content_type='application/pdf')
+        response['X-Accel-Redirect'] = f"{settings.PROPOSAL_PDF_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{proposal.pdf_file}"
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+        return with_headers(response)
+
+    storage = storages["proposals"]
+    size = storage.size(proposal.pdf_file)
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    # If-Range com outro ETag (ou data): a cópia do cliente mudou, enviar o arquivo inteiro
+    if range_header and (not if_range or (etag and if_range.strip() == etag)):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return with_headers(response)
+
+    pdf_file = storage.open(proposal.pdf_file, 'rb')
+    if byte_range is None:
+        response = FileResponse(pdf_file, content_type='application/pdf', filename=filename)
+        return with_headers(response)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        _iter_file_range(pdf_file, start, length), status=206, content_type='application/pdf'
+    )
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Disposition'] = f'inline; filename="{filename}"'
+    return with_headers(response)
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework.exceptions import AuthenticationFailed
+from asgiref.sync import sync_to_async
+from apps.tasks.events import subscribe_events
+from apps.tasks.pricing_tasks import pricing_channel
+from core.business_logic.proposal_state import proposal_channel, FINAL_STATUSES
+from .models import Proposal, QuoteRequest
+import json
+
+FINAL_STATES = ("SUCCESS", "FAILURE")
+
+
+@sync_to_async
+def _authenticate(request):
+    """
+    Autentica o token JWT do header Authorization ou do parâmetro ?token=
+    (EventSource no navegador não permite enviar headers).
+    """
+    authentication = JWTAuthentication()
+    raw_token = request.GET.get("token")
+    if not raw_token:
+        header = authentication.get_header(request)
+        raw_token = authentication.get_raw_token(header) if header else None
+    if not raw_token:
+        return None
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+@sync_to_async
+def _can_view_proposal(user, proposal_id) -> bool:
+    # Mesma regra de ProposalViewSet.get_queryset
+    if user.is_staff or user.groups.filter(name__in=['Manager', 'Admin']).exists():
+        return Proposal.objects.filter(id=proposal_id).exists()
+    return Proposal.objects.filter(id=proposal_id, quote_request__user=user).exists()
+
+
+@sync_to_async
+def _can_view_quote_request(user, quote_request_id) -> bool:
+    # Mesma regra de acesso de ProposalViewSet.get_queryset, aplicada à cotação
+    if user.is_staff or user.groups.filter(name__in=['Manager', 'Admin']).exists():
+        return QuoteRequest.objects.filter(id=quote_request_id).exists()
+    return QuoteRequest.objects.filter(id=quote_request_id, user=user).exists()
+
+
+async def _event_stream(channel: str, final_key: str = "state", final_values=FINAL_STATES):
+    async for event in subscribe_events(channel, timeout=settings.EVENT_STREAM_TIMEOUT):
+        if event is None:
+            yield ": keep-alive\n\n"
+            continue
+        yield f"data: {json.dumps(event, default=str)}\n\n"
+        if event.get(final_key) in final_values:
+            break
+
+
+def _sse_response(stream):
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def pricing_events(request, pk):
+    """
+    Fluxo Server-Sent Events com o progresso da tarifação da cotação.
+    Requer que a aplicação seja servida pelo ASGI (config.asgi).
+    """
+    user = await _authenticate(request)
+    if user is None or not user.is_active:
+        return JsonResponse({"detail": "Credenciais de autenticação inválidas ou ausentes."}, status=401)
+    if not await _can_view_quote_request(user, pk):
+        return JsonResponse({"detail": "Não encontrado."}, status=404)
+
+    return _sse_response(_event_stream(pricing_channel(pk)))
+
+
+async def proposal_events(request, pk):
+    """
+    Fluxo Server-Sent Events com as mudanças de status da proposta, publicadas
+    pelas transições e tarefas via Redis pub/sub. Encerra ao receber um status
+    final. Requer que a aplicação seja servida pelo ASGI (config.asgi).
+    """
+    user = await _authenticate(request)
+    if user is None or not user.is_active:
+        return JsonResponse({"detail": "Credenciais de autenticação inválidas ou ausentes."}, status=401)
+    if not await _can_view_proposal(user, pk):
+        return JsonResponse({"detail": "Não encontrado."}, status=404)
+
+    return _sse_response(_event_stream(proposal_channel(pk), "status", FINAL_STATUSES))
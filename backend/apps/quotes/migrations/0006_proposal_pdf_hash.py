@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0005_add_configuration_models'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposal',
+            name='pdf_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0006_proposal_pdf_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposal',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='quoterequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
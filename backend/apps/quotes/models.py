@@ -10,6 +10,9 @@ class QuoteRequest(models.Model):
     ]
     user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True)
     request_date = models.DateTimeField(auto_now_add=True, db_index=True)
+    # QuerySet.update/bulk_update devem informar updated_at (auto_now só vale no save); a agregação
+    # incremental dos relatórios depende dele
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING", db_index=True)
     # Dados do Cliente
     client_name = models.CharField(max_length=255)
@@ -82,6 +85,8 @@ class Proposal(models.Model):
     quote_request = models.ForeignKey(QuoteRequest, on_delete=models.CASCADE)
     quote_result = models.ForeignKey(QuoteResult, on_delete=models.CASCADE)
     proposal_date = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Como em QuoteRequest: QuerySet.update/bulk_update devem informar updated_at
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING", db_index=True)
     valid_until = models.DateField()
     
@@ -94,6 +99,8 @@ class Proposal(models.Model):
     
     # Arquivo PDF gerado
     pdf_file = models.CharField(max_length=255, blank=True, null=True)
+    # Hash SHA-256 do conteúdo do PDF (nome do arquivo no storage de propostas)
+    pdf_hash = models.CharField(max_length=64, blank=True, null=True)
     # Campo para armazenar o ID da tarefa Celery
     celery_task_id = models.CharField(max_length=255, blank=True, null=True)
 
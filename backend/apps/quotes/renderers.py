@@ -0,0 +1,15 @@
+from rest_framework.renderers import BaseRenderer
+
+
+class PDFRenderer(BaseRenderer):
+    """
+    Permite negociar 'Accept: application/pdf' em ações que devolvem o arquivo
+    diretamente (HttpResponse/FileResponse); o conteúdo não passa pelo renderer.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data if isinstance(data, bytes) else b''
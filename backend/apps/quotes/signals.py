@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from core.business_logic.rating_snapshot import RATING_MODELS, invalidate_rating_snapshot
+from core.business_logic.pdf_template import PDF_TEMPLATE_MODELS, invalidate_pdf_template
+from core.business_logic.email_templates import invalidate_email_templates
+from core.business_logic.dashboard_counters import (
+    QUOTE_REQUEST, PROPOSAL, remember_status, counted_status, record_status_changes
+)
+from core.business_logic.report_rollups import mark_rollup_days_dirty
+from django.utils import timezone
+from .models import EmailTemplate, QuoteRequest, Proposal
+
+
+def invalidate_rating_snapshot_on_change(sender, **kwargs):
+    """
+    Invalida o snapshot de tarifação quando qualquer tabela usada no cálculo
+    do prêmio é alterada. A nova versão só é publicada após o commit, para que
+    outros processos não recarreguem dados ainda não confirmados.
+    """
+    transaction.on_commit(invalidate_rating_snapshot)
+
+
+for rating_model in RATING_MODELS:
+    post_save.connect(invalidate_rating_snapshot_on_change, sender=rating_model,
+                      dispatch_uid=f"rating_snapshot_save_{rating_model.__name__}")
+    post_delete.connect(invalidate_rating_snapshot_on_change, sender=rating_model,
+                        dispatch_uid=f"rating_snapshot_delete_{rating_model.__name__}")
+
+
+def invalidate_pdf_template_on_change(sender, **kwargs):
+    """
+    Invalida o template de PDF de propostas quando as configurações da empresa,
+    da proposta ou de franquias mudam.
+    """
+    transaction.on_commit(invalidate_pdf_template)
+
+
+for pdf_model in PDF_TEMPLATE_MODELS:
+    post_save.connect(invalidate_pdf_template_on_change, sender=pdf_model,
+                      dispatch_uid=f"pdf_template_save_{pdf_model.__name__}")
+    post_delete.connect(invalidate_pdf_template_on_change, sender=pdf_model,
+                        dispatch_uid=f"pdf_template_delete_{pdf_model.__name__}")
+
+
+def invalidate_email_templates_on_change(sender, **kwargs):
+    """
+    Invalida os templates de e-mail compilados quando um EmailTemplate muda.
+    """
+    transaction.on_commit(invalidate_email_templates)
+
+
+post_save.connect(invalidate_email_templates_on_change, sender=EmailTemplate, dispatch_uid="email_templates_save")
+post_delete.connect(invalidate_email_templates_on_change, sender=EmailTemplate, dispatch_uid="email_templates_delete")
+
+
+COUNTER_MODELS = {QuoteRequest: QUOTE_REQUEST, Proposal: PROPOSAL}
+
+
+def remember_status_on_init(sender, instance, **kwargs):
+    remember_status(instance)
+
+
+def update_counters_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Atualiza os contadores do dashboard na mesma transação do save(). Alterações
+    via QuerySet.update/bulk_create não disparam sinais e registram a mudança
+    explicitamente (ver proposal_state e batch_quotation).
+    """
+    if raw or (update_fields is not None and 'status' not in update_fields):
+        return
+    old_status = None if created else counted_status(instance)
+    if not created and old_status is None:
+        return  # Status não carregado (campo adiado): a reconciliação corrige
+    record_status_changes(COUNTER_MODELS[sender], [(instance, old_status, instance.status)])
+
+
+def update_counters_on_delete(sender, instance, **kwargs):
+    record_status_changes(COUNTER_MODELS[sender], [(instance, counted_status(instance) or instance.status, None)])
+
+
+for counter_model in COUNTER_MODELS:
+    post_init.connect(remember_status_on_init, sender=counter_model,
+                      dispatch_uid=f"dashboard_counters_init_{counter_model.__name__}")
+    post_save.connect(update_counters_on_save, sender=counter_model,
+                      dispatch_uid=f"dashboard_counters_save_{counter_model.__name__}")
+    post_delete.connect(update_counters_on_delete, sender=counter_model,
+                        dispatch_uid=f"dashboard_counters_delete_{counter_model.__name__}")
+
+
+ROLLUP_DATE_FIELDS = {QuoteRequest: 'request_date', Proposal: 'proposal_date'}
+
+
+def mark_rollup_day_on_delete(sender, instance, **kwargs):
+    """
+    Exclusões não aparecem em updated_at: o dia do registro é marcado para ser
+    reagregado na próxima atualização dos relatórios.
+    """
+    recorded_at = getattr(instance, ROLLUP_DATE_FIELDS[sender])
+    if recorded_at is not None:
+        mark_rollup_days_dirty(COUNTER_MODELS[sender], [timezone.localdate(recorded_at)])
+
+
+for rollup_model in ROLLUP_DATE_FIELDS:
+    post_delete.connect(mark_rollup_day_on_delete, sender=rollup_model,
+                        dispatch_uid=f"report_rollups_delete_{rollup_model.__name__}")
@@ -0,0 +1,1173 @@
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import timedelta
+from unittest import mock
+import os
+import random
+import tempfile
+import time
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import storages
+from rest_framework.test import APIClient
+from django.core import mail
+from django.core.cache import cache
+from django.utils import timezone
+from apps.insurers.models import Insurer, MerchandiseType, InsurerBusinessRule
+from apps.quotes.models import (
+    QuoteRequest, QuoteResult, QuoteItem, Proposal, ProposalConfiguration, CompanyConfiguration, EmailTemplate, RiskCity, SpecialCondition, SystemParameter, RiskMultiplierConfiguration
+)
+from core.business_logic.batch_quotation import price_quote_batch
+from core.business_logic.pdf_template import get_pdf_template
+from core.business_logic.email_templates import get_compiled_email_template, render_email, invalidate_email_templates
+from apps.tasks.approval_tasks import approval_email_task, approval_pdf_task, build_approval_context
+from apps.tasks.email_tasks import send_rejection_email_task
+from apps.tasks.notification_tasks import build_rejection_context, send_notifications
+from apps.tasks.pdf_tasks import generate_proposal_pdf, generate_pdf_batch_task, render_proposal_pdf, get_proposal_storage
+from core.business_logic.item_import import import_quote_items, iter_lines
+from core.business_logic.proposal_logic import create_proposal, ProposalGenerationError
+from core.business_logic.proposal_state import bulk_transition, proposal_channel, transition
+from apps.tasks.events import get_last_event
+from apps.tasks.pricing_tasks import import_quote_items_task, price_quote_request_task, pricing_channel
+from core.business_logic import quotation_logic
+from core.business_logic.quotation_logic import (
+    IncompletePricingError, calculate_premium, calculate_premium_for_insurer, calculate_premium_concurrent
+)
+from core.business_logic.quote_cache import calculate_premium_cached, get_quote_cache_stats, pricing_cache_key
+from core.business_logic.route_matcher import RouteMatcher
+from core.business_logic.rating_snapshot import RatingSnapshot, get_rating_snapshot, invalidate_rating_snapshot
+from core.business_logic.vectorized_pricing import (
+    RatingMatrix, price_matrix, reprice_open_quotes, to_fixed, MONEY_SCALE, RATE_SCALE
+)
+
+User = get_user_model()
+
+
+class QuotationTestMixin:
+    """
+    Dados básicos de tarifação compartilhados pelas suítes de cotação.
+    """
+    def create_rating_data(self):
+        self.user = User.objects.create_user(username='broker', email='broker@example.com', password='StrongPassword123')
+        self.merchandise = MerchandiseType.objects.create(name='Eletrônicos', risk_level='HIGH')
+        self.insurer_a = Insurer.objects.create(name='Seguradora A', minimum_premium=Decimal('100.00'))
+        self.insurer_b = Insurer.objects.create(name='Seguradora B', minimum_premium=Decimal('5000.00'))
+        InsurerBusinessRule.objects.create(
+            insurer=self.insurer_a, merchandise_type=self.merchandise,
+            rctr_c_rate=Decimal('0.1500'), rc_dc_rate=Decimal('0.0800'),
+            high_risk_multiplier=Decimal('1.50'),
+            volume_discount_threshold=Decimal('500000.00'), volume_discount_rate=Decimal('5.00'),
+        )
+        InsurerBusinessRule.objects.create(
+            insurer=self.insurer_b, merchandise_type=self.merchandise,
+            rctr_c_rate=Decimal('0.1200'), rc_dc_rate=Decimal('0.0500'),
+        )
+        RiskCity.objects.create(name='Rio de Janeiro')
+        SpecialCondition.objects.create(code='HIGH_RISK_OPERATION', description='Operação de alto risco')
+        SystemParameter.objects.create(key='PREMIUM_CLIENT_MONTHLY_REVENUE_THRESHOLD', value='1000000')
+        invalidate_rating_snapshot()
+
+    def failing_rule_for_insurer_b(self):
+        """
+        get_rule que falha para a seguradora B, simulando um erro dentro do cálculo.
+        """
+        original = RatingSnapshot.get_rule
+
+        def get_rule(snapshot, insurer, merchandise_type):
+            if insurer == self.insurer_b:
+                raise RuntimeError('Falha na seguradora B')
+            return original(snapshot, insurer, merchandise_type)
+        return get_rule
+
+    def create_quote_request(self, **overrides):
+        data = {
+            'user': self.user,
+            'client_name': 'Transportadora Exemplo',
+            'client_document': '12.345.678/0001-90',
+            'cargo_type': 'Eletrônicos',
+            'cargo_value': Decimal('50000.00'),
+            'origin': 'Rio de Janeiro - RJ',
+            'destination': 'Curitiba - PR',
+            'monthly_revenue': Decimal('800000.00'),
+            'general_lmg': Decimal('400000.00'),
+        }
+        data.update(overrides)
+        return QuoteRequest.objects.create(**data)
+
+
+class RatingSnapshotTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para o snapshot de tarifação em memória.
+    """
+    def setUp(self):
+        self.create_rating_data()
+        self.quote_request = self.create_quote_request()
+
+    def test_calculate_premium_without_queries(self):
+        """
+        Testa se, com o snapshot carregado, a tarifação contra todas as seguradoras não consulta o banco.
+        """
+        get_rating_snapshot()
+        with self.assertNumQueries(0):
+            results = calculate_premium(self.quote_request)
+
+        self.assertEqual([r.insurer for r in results], [self.insurer_a, self.insurer_b])
+        result_a = results[0]
+        # Multiplicador de alto risco (1.5) e desconto por volume (5%): 0,21375 arredondado a 4 casas
+        self.assertEqual(result_a.rctr_c_rate, Decimal('0.2138'))
+        self.assertEqual(result_a.premium_value, Decimal('2622.0000000'))
+        self.assertEqual(result_a.rctr_c_limit, Decimal('400000.00'))
+        self.assertIn('Operação de alto risco', result_a.observations)
+        # Prêmio mínimo da seguradora B
+        self.assertEqual(results[1].premium_value, Decimal('5000.00'))
+
+    def test_snapshot_reloaded_after_rule_change(self):
+        """
+        Testa se o snapshot é recarregado quando uma regra de negócio é alterada.
+        """
+        first = get_rating_snapshot()
+        self.assertIs(get_rating_snapshot(), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            InsurerBusinessRule.objects.filter(insurer=self.insurer_b).update(rctr_c_rate=Decimal('0.5000'))
+            rule = InsurerBusinessRule.objects.get(insurer=self.insurer_b)
+            rule.save()
+
+        second = get_rating_snapshot()
+        self.assertIsNot(second, first)
+        self.assertEqual(second.get_rule(self.insurer_b, self.merchandise).rctr_c_rate, Decimal('0.5000'))
+
+
+@override_settings(QUOTATION_RATING_MAX_WORKERS=2)
+class ConcurrentRatingTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para a tarifação paralela por seguradora.
+    """
+    def setUp(self):
+        self.create_rating_data()
+        self.quote_request = self.create_quote_request()
+
+    def test_concurrent_matches_sequential(self):
+        """
+        Testa se o modo paralelo produz os mesmos resultados, na mesma ordem.
+        """
+        snapshot = get_rating_snapshot()
+        with override_settings(QUOTATION_RATING_MAX_WORKERS=0):
+            sequential = calculate_premium(self.quote_request, snapshot)
+        concurrent = calculate_premium(self.quote_request, snapshot)
+
+        self.assertEqual(
+            [(r.insurer_id, r.premium_value, r.observations) for r in concurrent],
+            [(r.insurer_id, r.premium_value, r.observations) for r in sequential]
+        )
+
+    def test_slow_insurer_returns_partial_results(self):
+        """
+        Testa se uma seguradora lenta é ignorada após o prazo e o conjunto é marcado como incompleto.
+        """
+        original = quotation_logic.calculate_premium_for_insurer
+
+        def slow_for_insurer_b(quote_request, insurer, *args):
+            if insurer == self.insurer_b:
+                time.sleep(0.5)
+            return original(quote_request, insurer, *args)
+
+        with mock.patch.object(quotation_logic, 'calculate_premium_for_insurer', side_effect=slow_for_insurer_b):
+            results, complete = calculate_premium_concurrent(self.quote_request, deadline=0.1)
+
+        self.assertEqual([r.insurer for r in results], [self.insurer_a])
+        self.assertFalse(complete)
+
+
+class PricingTaskTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para a tarifação assíncrona de uma cotação.
+    """
+    def setUp(self):
+        self.create_rating_data()
+        self.quote_request = self.create_quote_request()
+
+    def test_price_quote_request_task(self):
+        """
+        Testa se a tarefa grava os resultados, publica o progresso e não duplica resultados existentes.
+        """
+        outcome = price_quote_request_task.apply(args=[self.quote_request.id]).get()
+
+        self.assertEqual(outcome, {'quote_request_id': self.quote_request.id, 'created': 2, 'total': 2})
+        self.assertEqual(QuoteResult.objects.filter(quote_request=self.quote_request).count(), 2)
+        self.assertEqual(get_last_event(pricing_channel(self.quote_request.id))['state'], 'SUCCESS')
+
+        outcome = price_quote_request_task.apply(args=[self.quote_request.id]).get()
+        self.assertEqual(outcome['created'], 0)
+        self.assertEqual(QuoteResult.objects.filter(quote_request=self.quote_request).count(), 2)
+
+    def test_task_reuses_cached_results(self):
+        """
+        Testa se a tarefa grava, sem tarifar, os resultados em cache de uma versão com os mesmos dados de preço.
+        """
+        cache.clear()
+        price_quote_request_task.apply(args=[self.quote_request.id]).get()
+        new_version = self.create_quote_request(client_name='Outro nome')
+
+        with mock.patch.object(quotation_logic, 'calculate_premium_for_insurer') as rate:
+            outcome = price_quote_request_task.apply(args=[new_version.id]).get()
+
+        rate.assert_not_called()
+        self.assertEqual(outcome['created'], 2)
+        self.assertEqual(
+            sorted(QuoteResult.objects.filter(quote_request=new_version).values_list('insurer_id', 'premium_value')),
+            sorted(QuoteResult.objects.filter(quote_request=self.quote_request).values_list('insurer_id', 'premium_value'))
+        )
+        self.assertEqual(get_quote_cache_stats()['hits'], 1)
+
+    def test_partial_failure_is_not_done_or_cached(self):
+        """
+        Testa se uma falha no cálculo de uma seguradora marca a tarefa como falha, não memoriza o
+        conjunto parcial e se a nova execução tarifa apenas a seguradora que faltou.
+        """
+        cache.clear()
+        with mock.patch.object(RatingSnapshot, 'get_rule', self.failing_rule_for_insurer_b()):
+            result = price_quote_request_task.apply(args=[self.quote_request.id])
+
+        self.assertTrue(result.failed())
+        self.assertIsInstance(result.result, IncompletePricingError)
+        event = get_last_event(pricing_channel(self.quote_request.id))
+        self.assertEqual((event['state'], event['failed']), ('FAILURE', [self.insurer_b.name]))
+        self.assertEqual(
+            list(QuoteResult.objects.filter(quote_request=self.quote_request).values_list('insurer_id', flat=True)),
+            [self.insurer_a.id]
+        )
+        self.assertIsNone(cache.get(pricing_cache_key(self.quote_request, get_rating_snapshot())))
+
+        outcome = price_quote_request_task.apply(args=[self.quote_request.id]).get()
+        self.assertEqual(outcome['created'], 1)
+
+    def test_new_version_is_priced_after_commit(self):
+        """
+        Testa se a nova versão da cotação é tarifada pela tarefa, enfileirada após o commit, e não na requisição.
+        """
+        self.user.groups.add(Group.objects.get_or_create(name='Broker')[0])
+        client = APIClient()
+        client.force_authenticate(self.user)
+        payload = {
+            'client_name': 'Outro nome', 'client_document': self.quote_request.client_document,
+            'cargo_type': self.quote_request.cargo_type, 'cargo_value': '50000.00',
+            'origin': self.quote_request.origin, 'destination': self.quote_request.destination,
+            'monthly_revenue': '800000.00', 'general_lmg': '400000.00',
+        }
+        with mock.patch('apps.quotes.views.price_quote_request_task.apply_async') as enqueue, \
+                mock.patch.object(quotation_logic, 'calculate_premium_for_insurer') as rate:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                response = client.put(f'/api/v1/quotes/requests/{self.quote_request.id}/', payload, format='json')
+            enqueue.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        self.assertEqual(response.status_code, 200)
+        rate.assert_not_called()
+        enqueue.assert_called_once_with((response.data['id'],), task_id=response.data['task_id'])
+
+    def test_task_status_checks_task_owner(self):
+        """
+        Testa se o status só é consultado para tarefas iniciadas para a própria cotação e se a
+        falha é informada sem o detalhe da exceção.
+        """
+        self.user.groups.add(Group.objects.get_or_create(name='Broker')[0])
+        client = APIClient()
+        client.force_authenticate(self.user)
+        other_quote = self.create_quote_request()
+        with mock.patch('apps.quotes.views.price_quote_request_task.apply_async'):
+            task_id = client.post(f'/api/v1/quotes/requests/{self.quote_request.id}/price/').data['task_id']
+            other_task_id = client.post(f'/api/v1/quotes/requests/{other_quote.id}/price/').data['task_id']
+
+        status_url = f'/api/v1/quotes/requests/{self.quote_request.id}/pricing_status/'
+        self.assertEqual(client.get(status_url, {'task_id': other_task_id}).status_code, 404)
+        self.assertEqual(client.get(status_url, {'task_id': 'desconhecida'}).status_code, 404)
+
+        failed = mock.Mock(state='FAILURE', info=RuntimeError('senha do banco'), failed=lambda: True)
+        with mock.patch('apps.quotes.views.AsyncResult', return_value=failed):
+            response = client.get(status_url, {'task_id': task_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['state'], 'FAILURE')
+        self.assertNotIn('senha', response.data['error'])
+
+        with mock.patch('core.business_logic.rating_snapshot.get_rating_snapshot', side_effect=RuntimeError('senha do banco')):
+            self.assertTrue(price_quote_request_task.apply(args=[self.quote_request.id]).failed())
+        self.assertNotIn('senha', get_last_event(pricing_channel(self.quote_request.id))['error'])
+
+    def test_pricing_events_require_access(self):
+        """
+        Testa se o fluxo de progresso da tarifação retorna 404 para cotações de outro corretor.
+        """
+        from asgiref.sync import async_to_sync
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        other = User.objects.create_user(username='other', email='other@example.com', password='StrongPassword123')
+        url = f'/api/v1/quotes/requests/{self.quote_request.id}/pricing_events/'
+        response = async_to_sync(self.async_client.get)(url, {'token': str(AccessToken.for_user(other))})
+        self.assertEqual(response.status_code, 404)
+        response = async_to_sync(self.async_client.get)(url)
+        self.assertEqual(response.status_code, 401)
+
+
+class ProposalGenerationTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para a geração de propostas a partir dos resultados calculados.
+    """
+    def setUp(self):
+        self.create_rating_data()
+        self.quote_request = self.create_quote_request()
+
+    def test_generate_cheapest_and_reuse(self):
+        """
+        Testa se a proposta usa o menor prêmio calculado e se uma nova chamada reaproveita a proposta pendente.
+        """
+        ProposalConfiguration.objects.create(validity_days=15)
+        proposal, created = create_proposal(self.quote_request.id)
+
+        self.assertTrue(created)
+        self.assertEqual(QuoteResult.objects.filter(quote_request=self.quote_request).count(), 2)
+        self.assertEqual(proposal.quote_result.insurer, self.insurer_a)
+        self.assertEqual(proposal.total_premium, proposal.quote_result.premium_value)
+        self.assertEqual(proposal.rctr_c_rate, proposal.quote_result.rctr_c_rate)
+        self.assertEqual((proposal.valid_until - timezone.localdate()).days, 15)
+
+        again, created = create_proposal(self.quote_request.id)
+        self.assertFalse(created)
+        self.assertEqual(again.id, proposal.id)
+        self.assertEqual(Proposal.objects.count(), 1)
+        self.assertEqual(QuoteResult.objects.filter(quote_request=self.quote_request).count(), 2)
+
+    def test_generate_for_chosen_insurer(self):
+        """
+        Testa se é possível escolher a seguradora e se uma seguradora sem resultado é rejeitada.
+        """
+        proposal, _ = create_proposal(self.quote_request.id, insurer_id=self.insurer_b.id)
+        self.assertEqual(proposal.quote_result.insurer, self.insurer_b)
+        self.assertEqual(proposal.total_premium, Decimal('5000.00'))
+
+        with self.assertRaises(ProposalGenerationError):
+            create_proposal(self.quote_request.id, insurer_id=999999)
+
+
+class ProposalPdfTemplateTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para o template de PDF de propostas em cache.
+    """
+    def setUp(self):
+        self.create_rating_data()
+        self.company = CompanyConfiguration.objects.create(company_name='Corretora Exemplo')
+        ProposalConfiguration.objects.create(validity_days=20)
+        self.proposal, _ = create_proposal(self.create_quote_request().id)
+
+    def test_template_is_reused_until_config_changes(self):
+        """
+        Testa se PDFs seguintes não consultam as configurações e se uma alteração invalida o template.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            template = get_pdf_template()
+        self.assertIs(get_pdf_template(), template)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'proposta.pdf')
+            with self.assertNumQueries(0):
+                generate_proposal_pdf(self.proposal, path)
+            with open(path, 'rb') as pdf_file:
+                self.assertTrue(pdf_file.read().startswith(b'%PDF'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company.company_name = 'Nova Corretora'
+            self.company.save()
+        reloaded = get_pdf_template()
+        self.assertIsNot(reloaded, template)
+        self.assertEqual(reloaded.header()[0].text, 'Nova Corretora')
+
+
+class EmailTemplateCacheTest(TestCase):
+    """
+    Suite de testes para o cache de templates de e-mail compilados.
+    """
+    def setUp(self):
+        invalidate_email_templates()
+        self.template = EmailTemplate.objects.create(
+            template_type='REJECTION', subject='Proposta de {{client_name}}', body_html='<p>Olá {{client_name}}</p>'
+        )
+
+    def test_compiled_template_reused_until_saved(self):
+        """
+        Testa se e-mails seguintes não consultam o banco nem recompilam, e se salvar o template o invalida.
+        """
+        compiled = get_compiled_email_template('REJECTION')
+        with self.assertNumQueries(0), mock.patch('core.business_logic.email_templates.Template') as template_class:
+            subject, body, text = render_email('REJECTION', {'client_name': 'Maria'})
+        template_class.assert_not_called()
+        self.assertEqual(subject, 'Proposta de Maria')
+        self.assertEqual(body, '<p>Olá Maria</p>')
+        self.assertIsNone(text)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.template.subject = 'Atualização para {{client_name}}'
+            self.template.save()
+        self.assertIsNot(get_compiled_email_template('REJECTION'), compiled)
+        self.assertEqual(render_email('REJECTION', {'client_name': 'Maria'})[0], 'Atualização para Maria')
+
+    def test_missing_template_uses_default(self):
+        """
+        Testa se o template padrão é gravado quando não há um template ativo do tipo.
+        """
+        subject, _, _ = render_email('APPROVAL', {'client_name': 'João'})
+        self.assertIn('João', subject)
+        self.assertTrue(EmailTemplate.objects.filter(template_type='APPROVAL', is_active=True).exists())
+
+
+class BatchPdfGenerationTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para a geração de PDFs de propostas em lote.
+    """
+    def setUp(self):
+        self.create_rating_data()
+        self.proposals = [
+            create_proposal(self.create_quote_request(client_name=f'Cliente {i}').id)[0] for i in range(3)
+        ]
+        # Como no endpoint de geração em lote, que enfileira as propostas já em PROCESSING
+        bulk_transition([proposal.id for proposal in self.proposals], "generate_pdf")
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        get_pdf_template()
+
+    def test_batch_renders_all_with_constant_queries(self):
+        """
+        Testa se o lote carrega as propostas em uma consulta, gera todos os PDFs e atualiza em bloco.
+        """
+        ids = [proposal.id for proposal in self.proposals] + [999999]
+        with override_settings(MEDIA_ROOT=self.media_root.name), \
+                mock.patch('apps.tasks.notification_tasks.send_notification_batch_task.delay') as send_batch:
+            with CaptureQueriesContext(connection) as queries:
+                outcome = generate_pdf_batch_task.apply(args=[ids]).get()
+        # Carga do lote, UPDATE em bloco dos PDFs e a transição "complete" (bloqueio,
+        # UPDATE e leitura do status publicado), além dos contadores do dashboard
+        self.assertEqual(len([q for q in queries if '"quotes_proposal"' in q['sql']]), 5)
+
+        self.assertEqual(outcome['generated'], ids[:3])
+        self.assertEqual(outcome['missing'], [999999])
+        send_batch.assert_called_once()
+        self.assertEqual([context['proposal_id'] for context in send_batch.call_args.args[0]], ids[:3])
+        for proposal in Proposal.objects.filter(id__in=ids[:3]):
+            self.assertEqual(proposal.status, 'COMPLETED')
+            self.assertEqual(proposal.pdf_file, f'proposals/{proposal.pdf_hash}.pdf')
+            self.assertTrue(os.path.exists(os.path.join(self.media_root.name, proposal.pdf_file)))
+
+    def test_batch_completes_only_processing_proposals(self):
+        """
+        Testa se o lote não conclui nem notifica propostas que saíram de PROCESSING.
+        """
+        ids = [proposal.id for proposal in self.proposals]
+        Proposal.objects.filter(id=ids[0]).update(status='REJECTED')
+        with override_settings(MEDIA_ROOT=self.media_root.name), \
+                mock.patch('apps.tasks.notification_tasks.send_notification_batch_task.delay') as send_batch:
+            outcome = generate_pdf_batch_task.apply(args=[ids]).get()
+
+        self.assertEqual(outcome['generated'], ids[1:])
+        self.assertEqual(outcome['skipped'], ids[:1])
+        self.assertEqual([context['proposal_id'] for context in send_batch.call_args.args[0]], ids[1:])
+        self.assertEqual(Proposal.objects.get(id=ids[0]).status, 'REJECTED')
+
+    def test_identical_render_is_stored_once(self):
+        """
+        Testa se o PDF é endereçado pelo conteúdo e se uma nova geração idêntica não grava outro arquivo.
+        """
+        proposal = self.proposals[0]
+        with override_settings(MEDIA_ROOT=self.media_root.name):
+            first = render_proposal_pdf(proposal)
+            with mock.patch.object(get_proposal_storage(), 'save') as save:
+                second = render_proposal_pdf(proposal)
+
+        self.assertEqual(first, second)
+        save.assert_not_called()
+        self.assertEqual(os.listdir(os.path.join(self.media_root.name, 'proposals')), [f'{proposal.pdf_hash}.pdf'])
+
+
+class ApprovalPipelineTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para o pipeline de aprovação (PDF + e-mail) encadeado.
+    """
+    def setUp(self):
+        cache.clear()
+        self.create_rating_data()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media_root.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.proposal, _ = create_proposal(self.create_quote_request().id)
+        self.manager = User.objects.create_user(username='manager', email='manager@example.com', password='StrongPassword123')
+        self.manager.groups.add(Group.objects.get_or_create(name='Manager')[0])
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_approve_runs_pipeline_once(self):
+        """
+        Testa se a aprovação gera o PDF, envia o e-mail com anexo e se a repetição da etapa não reenvia o e-mail.
+        """
+        with mock.patch('apps.tasks.approval_tasks.approval_email_task.run', wraps=approval_email_task.run) as email_stage:
+            response = self.client.post(f'/api/v1/quotes/proposals/{self.proposal.id}/approve/')
+
+        self.assertEqual(response.status_code, 200)
+        self.proposal.refresh_from_db()
+        self.assertEqual(self.proposal.status, 'COMPLETED')
+        self.assertEqual(self.proposal.celery_task_id, response.data['task_id'])
+        self.assertEqual(self.proposal.pdf_file, f'proposals/{self.proposal.pdf_hash}.pdf')
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+        self.assertEqual(mail.outbox[0].attachments[0][0], f'proposta_{self.proposal.id}.pdf')
+        context = email_stage.call_args.args[0]
+        self.assertEqual(context['client_name'], 'Transportadora Exemplo')
+
+        approval_email_task.apply(args=[context]).get()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_repeated_pdf_stage_publishes_status(self):
+        """
+        Testa se a etapa de PDF repetida para uma proposta já concluída publica o status com o PDF gravado.
+        """
+        Proposal.objects.filter(id=self.proposal.id).update(status='COMPLETED')
+        with self.captureOnCommitCallbacks(execute=True):
+            approval_pdf_task.apply(args=[self.proposal.id]).get()
+
+        self.proposal.refresh_from_db()
+        event = get_last_event(proposal_channel(self.proposal.id))
+        self.assertEqual(event['status'], 'COMPLETED')
+        self.assertEqual(event['pdf_file'], f'proposals/{self.proposal.pdf_hash}.pdf')
+
+
+class ProposalStateTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para as transições de status da proposta.
+    """
+    def setUp(self):
+        self.create_rating_data()
+        self.proposal, _ = create_proposal(self.create_quote_request().id)
+        self.manager = User.objects.create_user(username='manager', email='manager@example.com', password='StrongPassword123')
+        self.manager.groups.add(Group.objects.get_or_create(name='Manager')[0])
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def test_transition_is_conditional_update(self):
+        """
+        Testa se a transição é um único UPDATE e se uma instância desatualizada perde a disputa.
+        """
+        stale = Proposal.objects.get(id=self.proposal.id)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(transition(self.proposal, 'approve'))
+        self.assertEqual([q['sql'][:6] for q in queries if '"quotes_proposal"' in q['sql']], ['UPDATE'])
+        self.assertEqual(self.proposal.status, 'PROCESSING')
+
+        self.assertFalse(transition(stale, 'reject'))
+        self.assertEqual(stale.status, 'PROCESSING')
+        self.assertEqual(Proposal.objects.get(id=self.proposal.id).status, 'PROCESSING')
+
+    def test_transitions_refresh_updated_at(self):
+        """
+        Testa se as transições, individuais e em lote, informam updated_at (usado pelos relatórios incrementais).
+        """
+        old = timezone.now() - timedelta(days=1)
+        Proposal.objects.filter(id=self.proposal.id).update(updated_at=old)
+        self.assertTrue(transition(self.proposal, 'approve'))
+        self.assertGreater(Proposal.objects.get(id=self.proposal.id).updated_at, old)
+
+        Proposal.objects.filter(id=self.proposal.id).update(updated_at=old)
+        self.assertEqual(bulk_transition([self.proposal.id], 'complete'), [self.proposal.id])
+        self.assertGreater(Proposal.objects.get(id=self.proposal.id).updated_at, old)
+
+    def test_repeated_approval_enqueues_once(self):
+        """
+        Testa se apenas a primeira aprovação enfileira o pipeline.
+        """
+        url = f'/api/v1/quotes/proposals/{self.proposal.id}/approve/'
+        with mock.patch('apps.quotes.views.start_approval_pipeline') as pipeline:
+            pipeline.side_effect = lambda proposal_id, task_id: mock.Mock(id=task_id)
+            first = self.client.post(url)
+            second = self.client.post(url)
+            rejection = self.client.post(f'/api/v1/quotes/proposals/{self.proposal.id}/reject/')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 400)
+        self.assertEqual(rejection.status_code, 400)
+        pipeline.assert_called_once()
+        self.proposal.refresh_from_db()
+        self.assertEqual(self.proposal.status, 'PROCESSING')
+        self.assertEqual(self.proposal.celery_task_id, pipeline.call_args.kwargs['task_id'])
+
+
+class ProposalStatusCacheTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para a consulta de status da proposta a partir do cache.
+    """
+    def setUp(self):
+        cache.clear()
+        self.create_rating_data()
+        self.proposal, _ = create_proposal(self.create_quote_request().id)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/v1/quotes/proposals/{self.proposal.id}/status/'
+
+    def test_owner_polls_without_queries(self):
+        """
+        Testa se o dono lê o status do cache e recebe o status publicado pela transição.
+        """
+        self.assertEqual(self.client.get(self.url).data['status'], 'PENDING')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).data['status'], 'PENDING')
+
+        manager = User.objects.create_user(username='manager', email='manager@example.com', password='StrongPassword123')
+        manager.groups.add(Group.objects.get_or_create(name='Manager')[0])
+        manager_client = APIClient()
+        manager_client.force_authenticate(manager)
+        with mock.patch('apps.quotes.views.start_approval_pipeline') as pipeline, \
+                self.captureOnCommitCallbacks(execute=True):
+            pipeline.side_effect = lambda proposal_id, task_id: mock.Mock(id=task_id)
+            task_id = manager_client.post(f'/api/v1/quotes/proposals/{self.proposal.id}/approve/').data['task_id']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['status'], 'PROCESSING')
+        self.assertEqual(response.data['celery_task_id'], task_id)
+
+    def test_other_user_is_checked_against_database(self):
+        """
+        Testa se um usuário que não é o dono não recebe o status em cache.
+        """
+        self.client.get(self.url)
+        other = User.objects.create_user(username='other', email='other@example.com', password='StrongPassword123')
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        self.assertEqual(other_client.get(self.url).status_code, 404)
+
+
+class CeleryRoutingTest(SimpleTestCase):
+    """
+    Suite de testes para o roteamento das tarefas entre as filas do Celery.
+    """
+    def route(self, task_name):
+        from config.celery import app
+        return app.amqp.router.route({}, task_name)
+
+    def test_interactive_and_bulk_tasks_use_separate_queues(self):
+        """
+        Testa se aprovações individuais têm prioridade máxima e lotes vão para a fila bulk.
+        """
+        approval = self.route('apps.tasks.approval_tasks.approval_pdf_task')
+        self.assertEqual(approval['queue'].name, 'pdf')
+        self.assertEqual(approval['priority'], 0)
+        self.assertEqual(self.route('apps.tasks.pdf_tasks.generate_pdf_batch_task')['queue'].name, 'bulk')
+        batch_email = self.route('apps.tasks.notification_tasks.send_notification_batch_task')
+        self.assertEqual(batch_email['queue'].name, 'email')
+        self.assertGreater(batch_email['priority'], approval['priority'])
+
+
+class NotificationBatchTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para o envio de e-mails de propostas em lote.
+    """
+    def setUp(self):
+        cache.clear()
+        self.create_rating_data()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media_root.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.approved = [
+            create_proposal(self.create_quote_request(client_name=f'Cliente {i}').id)[0] for i in range(2)
+        ]
+        for proposal in self.approved:
+            render_proposal_pdf(proposal)
+            proposal.save()
+        self.rejected, _ = create_proposal(self.create_quote_request(client_name='Cliente Rejeitado').id)
+        Proposal.objects.filter(id=self.rejected.id).update(status='REJECTING')
+        self.notifications = [build_approval_context(proposal, 'Corretora') for proposal in self.approved]
+        self.notifications.append(build_rejection_context(self.rejected, 'Corretora'))
+
+    def test_batch_uses_single_connection(self):
+        """
+        Testa se o lote abre uma única conexão, envia aprovações e rejeições e não reenvia na repetição.
+        """
+        from django.core.mail import get_connection
+        with mock.patch('apps.tasks.notification_tasks.get_connection', wraps=get_connection) as connect:
+            outcome = send_notifications(self.notifications)
+
+        connect.assert_called_once()
+        self.assertEqual(outcome['sent'], [n['proposal_id'] for n in self.notifications])
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(len(mail.outbox[0].attachments), 1)
+        self.assertEqual(mail.outbox[2].attachments, [])
+        self.rejected.refresh_from_db()
+        self.assertEqual(self.rejected.status, 'REJECTED')
+
+        outcome = send_notifications(self.notifications)
+        self.assertEqual(len(outcome['skipped']), 3)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_already_sent_rejection_is_confirmed(self):
+        """
+        Testa se a rejeição cujo e-mail já foi enviado, mas não confirmada (falha após o envio), é
+        confirmada quando a tarefa é repetida, sem reenviar o e-mail.
+        """
+        with mock.patch('core.business_logic.proposal_state.bulk_transition'):
+            send_notifications(self.notifications[2:])
+        self.rejected.refresh_from_db()
+        self.assertEqual(self.rejected.status, 'REJECTING')
+
+        self.assertTrue(send_rejection_email_task.apply(args=[self.rejected.id]).get())
+        self.rejected.refresh_from_db()
+        self.assertEqual(self.rejected.status, 'REJECTED')
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_transient_build_error_is_propagated(self):
+        """
+        Testa se uma falha transitória ao ler o PDF é propagada (para repetição) e libera os locks.
+        """
+        with mock.patch('apps.tasks.notification_tasks.build_notification_message', side_effect=ConnectionResetError):
+            with self.assertRaises(OSError):
+                send_notifications(self.notifications[:1])
+        self.assertEqual(len(mail.outbox), 0)
+
+        outcome = send_notifications(self.notifications[:1])
+        self.assertEqual(outcome['sent'], [self.notifications[0]['proposal_id']])
+
+    @override_settings(EMAIL_PROVIDER_RATE_LIMITS={'default': 2}, EMAIL_RATE_LIMIT_WINDOW=60)
+    def test_rate_limit_per_provider(self):
+        """
+        Testa se o envio aguarda a próxima janela ao atingir o limite do provedor.
+        """
+        with mock.patch('apps.tasks.notification_tasks.time.sleep') as sleep:
+            send_notifications(self.notifications)
+
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class ProposalPdfDownloadTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para o download do PDF da proposta.
+    """
+    def setUp(self):
+        self.create_rating_data()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media_root.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.proposal, _ = create_proposal(self.create_quote_request().id)
+        render_proposal_pdf(self.proposal)
+        self.proposal.save()
+        with get_proposal_storage().open(self.proposal.pdf_file, 'rb') as pdf_file:
+            self.content = pdf_file.read()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/v1/quotes/proposals/{self.proposal.id}/download_pdf/'
+        self.etag = f'"{self.proposal.pdf_hash}"'
+
+    def test_download_with_etag(self):
+        """
+        Testa se o download retorna o arquivo com ETag forte e 304 para clientes com a mesma versão.
+        """
+        response = self.client.get(self.url, HTTP_ACCEPT='application/pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        """
+        Testa se requisições Range retornam 206 com o trecho pedido e 416 quando o intervalo é inválido.
+        """
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-5:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"outro"')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+
+    @override_settings(PROPOSAL_PDF_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_accel_redirect(self):
+        """
+        Testa se, atrás do nginx, o envio do arquivo é delegado via X-Accel-Redirect.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.proposal.pdf_file}')
+        self.assertEqual(response.content, b'')
+
+
+class QuoteItemImportTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para a importação de itens de cotação via CSV.
+    """
+    CSV_CONTENT = (
+        '\ufeffitem_description;item_value;item_quantity\r\n'
+        'Notebook;4500.50;2\r\n'
+        'Câmera;abc;1\r\n'
+        '"Monitor; 27""";1299,90;3\r\n'
+        'Cabo;10.00\r\n'
+        'Teclado;-5;1\r\n'
+    ).encode('utf-8')
+
+    def setUp(self):
+        self.create_rating_data()
+        self.user.groups.add(Group.objects.get_or_create(name='Broker')[0])
+        self.quote_request = self.create_quote_request()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/v1/quotes/requests/{self.quote_request.id}/import_items_from_csv/'
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_override = override_settings(MEDIA_ROOT=media_root.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.import_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.import_root.cleanup)
+        import_location = mock.patch.object(storages['imports'], 'location', self.import_root.name)
+        import_location.start()
+        self.addCleanup(import_location.stop)
+
+    def test_iter_lines_across_chunks(self):
+        """
+        Testa se a decodificação incremental reconstrói linhas e caracteres multibyte divididos entre blocos.
+        """
+        data = 'a;ç\nb;ã\n'.encode('utf-8')
+        chunks = [data[i:i + 1] for i in range(len(data))]
+        self.assertEqual(list(iter_lines(chunks)), ['a;ç\n', 'b;ã\n'])
+
+    def test_import_reports_row_errors(self):
+        """
+        Testa se as linhas válidas são gravadas em lote e as inválidas reportadas com o número da linha.
+        """
+        upload = SimpleUploadedFile('itens.csv', self.CSV_CONTENT, content_type='text/csv')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['error_count'], 3)
+        self.assertEqual([error.split(':')[0] for error in response.data['errors']], ['Linha 3', 'Linha 5', 'Linha 6'])
+        items = QuoteItem.objects.filter(quote_request=self.quote_request).order_by('id')
+        self.assertEqual(
+            [(item.item_description, item.item_value, item.item_quantity) for item in items],
+            [('Notebook', Decimal('4500.50'), 2), ('Monitor; 27"', Decimal('1299.90'), 3)]
+        )
+
+    @override_settings(QUOTE_ITEM_IMPORT_ASYNC_THRESHOLD=10)
+    def test_large_file_is_imported_by_task(self):
+        """
+        Testa se arquivos acima do limite são importados em segundo plano com status consultável.
+        """
+        upload = SimpleUploadedFile('itens.csv', self.CSV_CONTENT, content_type='text/csv')
+        with mock.patch('apps.tasks.pricing_tasks.import_quote_items_task.apply_async') as enqueue:
+            response = self.client.post(self.url, {'file': upload}, format='multipart')
+        # O arquivo fica no armazenamento compartilhado "imports", lido pelo worker
+        file_path = enqueue.call_args.args[0][1]
+        self.assertTrue(os.path.exists(os.path.join(self.import_root.name, file_path)))
+        import_quote_items_task.apply(args=enqueue.call_args.args[0])
+        self.assertFalse(storages['imports'].exists(file_path))
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(QuoteItem.objects.filter(quote_request=self.quote_request).count(), 2)
+        status_url = f'/api/v1/quotes/requests/{self.quote_request.id}/import_items_status/'
+        status_response = self.client.get(status_url)
+        self.assertEqual(status_response.data['state'], 'SUCCESS')
+        self.assertEqual(status_response.data['created'], 2)
+
+    def test_import_is_atomic(self):
+        """
+        Testa se uma falha no meio da importação desfaz os lotes já gravados.
+        """
+        def failing_progress(processed):
+            raise RuntimeError('falha')
+
+        content = b'h;h;h\n' + b'Item;1.00;1\n' * 5
+        with self.assertRaises(RuntimeError):
+            import_quote_items(self.quote_request, [content], batch_size=2, progress=failing_progress)
+        self.assertFalse(QuoteItem.objects.filter(quote_request=self.quote_request).exists())
+
+
+class BatchQuotationTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para a tarifação de cotações em lote.
+    """
+    def setUp(self):
+        self.create_rating_data()
+
+    def build_payload(self, **overrides):
+        payload = {
+            'client_name': 'Cliente Lote',
+            'client_document': '98.765.432/0001-10',
+            'cargo_type': 'Eletrônicos',
+            'cargo_value': '10000.00',
+            'origin': 'Curitiba - PR',
+            'destination': 'Porto Alegre - RS',
+            'monthly_revenue': '800000.00',
+            'general_lmg': '200000.00',
+        }
+        payload.update(overrides)
+        return payload
+
+    def test_price_quote_batch(self):
+        """
+        Testa se o lote grava cotações e resultados em bloco e reporta erros por linha.
+        """
+        payloads = [self.build_payload(), self.build_payload(client_name=''), self.build_payload()]
+        rows = list(price_quote_batch(payloads, self.user, chunk_size=2))
+
+        self.assertEqual(rows[-1], {'summary': {'received': 3, 'created': 2, 'errors': 1}})
+        self.assertEqual(rows[0]['index'], 1)
+        self.assertIn('client_name', rows[0]['errors'])
+        priced = [row for row in rows if 'quote_request_id' in row]
+        self.assertEqual([row['index'] for row in priced], [0, 2])
+        self.assertEqual(priced[0]['results'], [[self.insurer_a.id, '2622.00'], [self.insurer_b.id, '5000.00']])
+        self.assertEqual(QuoteRequest.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(QuoteResult.objects.count(), 4)
+
+
+class QuoteCacheTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes para a memoização de resultados de cotação.
+    """
+    def setUp(self):
+        cache.clear()
+        self.create_rating_data()
+
+    def test_cosmetic_change_hits_cache(self):
+        """
+        Testa se uma nova versão que só altera dados cosméticos reaproveita os resultados sem tarifar.
+        """
+        original = self.create_quote_request()
+        first = calculate_premium_cached(original)
+        new_version = self.create_quote_request(client_contact='Novo contato', client_name='Outro nome')
+        snapshot = get_rating_snapshot()
+
+        with self.assertNumQueries(0):
+            second = calculate_premium_cached(new_version, snapshot)
+
+        self.assertEqual(
+            [(r.insurer_id, r.premium_value, r.observations) for r in second],
+            [(r.insurer_id, r.premium_value, r.observations) for r in first]
+        )
+        self.assertTrue(all(r.quote_request is new_version for r in second))
+        self.assertEqual(get_quote_cache_stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_pricing_change_misses_cache(self):
+        """
+        Testa se mudanças de faturamento, rota de risco ou configuração geram novo cálculo.
+        """
+        calculate_premium_cached(self.create_quote_request())
+        calculate_premium_cached(self.create_quote_request(monthly_revenue=Decimal('900000.00')))
+        calculate_premium_cached(self.create_quote_request(origin='Curitiba - PR'))
+        invalidate_rating_snapshot()
+        calculate_premium_cached(self.create_quote_request())
+
+        self.assertEqual(get_quote_cache_stats()['misses'], 4)
+
+    def test_incomplete_results_not_cached(self):
+        """
+        Testa se um conjunto parcial (falha de uma seguradora) não é armazenado no cache.
+        """
+        quote_request = self.create_quote_request()
+        snapshot = get_rating_snapshot()
+        with mock.patch.object(RatingSnapshot, 'get_rule', self.failing_rule_for_insurer_b()):
+            partial = calculate_premium_cached(quote_request)
+        self.assertEqual([r.insurer for r in partial], [self.insurer_a])
+        self.assertIsNone(cache.get(pricing_cache_key(quote_request, snapshot)))
+
+        complete = calculate_premium_cached(self.create_quote_request())
+        self.assertEqual({r.insurer for r in complete}, {self.insurer_a, self.insurer_b})
+        self.assertEqual(get_quote_cache_stats()['misses'], 2)
+
+    def test_stats_with_cache_unavailable(self):
+        """
+        Testa se as métricas retornam zeradas quando o cache está indisponível.
+        """
+        with mock.patch('core.business_logic.quote_cache.cache.get_many', side_effect=ConnectionError):
+            self.assertEqual(get_quote_cache_stats(), {'hits': 0, 'misses': 0, 'hit_ratio': 0.0})
+
+
+class VectorizedPricingTest(QuotationTestMixin, TestCase):
+    """
+    Suite de testes de equivalência entre o motor vetorizado e o cálculo Decimal.
+    """
+    def setUp(self):
+        self.create_rating_data()
+        rng = random.Random(42)
+        RiskMultiplierConfiguration.objects.create(risk_level='MODERATE', multiplier=Decimal('1.15'))
+        RiskMultiplierConfiguration.objects.create(risk_level='EXTREME', multiplier=Decimal('2.35'))
+        merchandise_types = [self.merchandise] + [
+            MerchandiseType.objects.create(name=f'Mercadoria {level}', risk_level=level)
+            for level in ['LOW', 'MODERATE', 'HIGH', 'EXTREME']
+        ]
+        insurers = [self.insurer_a, self.insurer_b] + [
+            Insurer.objects.create(
+                name=f'Seguradora {n}',
+                minimum_premium=Decimal(rng.randint(1, 500000)) / 100,
+                max_rctr_c_limit=Decimal(rng.randint(1, 10 ** 9)) / 100,
+                max_rc_dc_limit=Decimal(rng.randint(1, 10 ** 9)) / 100,
+            )
+            for n in range(6)
+        ]
+        for insurer in insurers[2:]:
+            for merchandise_type in merchandise_types:
+                if rng.random() < 0.2:
+                    continue
+                InsurerBusinessRule.objects.create(
+                    insurer=insurer, merchandise_type=merchandise_type,
+                    rctr_c_rate=Decimal(rng.randint(1, 999999)) / 10000,
+                    rc_dc_rate=Decimal(rng.randint(1, 999999)) / 10000,
+                    high_risk_multiplier=Decimal(rng.randint(100, 999)) / 100,
+                    volume_discount_threshold=Decimal(rng.choice([0, rng.randint(1, 10 ** 10)])) / 100,
+                    volume_discount_rate=Decimal(rng.randint(0, 5000)) / 100,
+                )
+        invalidate_rating_snapshot()
+        self.quote_requests = [
+            self.create_quote_request(
+                cargo_type=rng.choice([m.name for m in merchandise_types] + ['Desconhecida']),
+                monthly_revenue=Decimal(rng.randint(1, 10 ** 12)) / 100,
+                general_lmg=Decimal(rng.randint(1, 10 ** 10)) / 100,
+            )
+            for _ in range(60)
+        ]
+        # Prêmio exatamente em meio centavo (1234,50 x 1% = 12,345)
+        self.half_cent_insurer = Insurer.objects.create(name='Seguradora Meio Centavo', minimum_premium=Decimal('0.01'))
+        InsurerBusinessRule.objects.create(
+            insurer=self.half_cent_insurer, merchandise_type=merchandise_types[1],
+            rctr_c_rate=Decimal('0.5000'), rc_dc_rate=Decimal('0.5000'), volume_discount_threshold=Decimal('0'),
+        )
+        invalidate_rating_snapshot()
+        self.half_cent_quote = self.create_quote_request(
+            cargo_type=merchandise_types[1].name, monthly_revenue=Decimal('1234.50'), general_lmg=Decimal('1000.00')
+        )
+        self.quote_requests.append(self.half_cent_quote)
+
+    def test_matches_decimal_path(self):
+        """
+        Testa se prêmio, taxas e limites vetorizados coincidem com calculate_premium_for_insurer.
+        """
+        snapshot = get_rating_snapshot()
+        matrix = RatingMatrix(snapshot)
+        priced = price_matrix(
+            matrix,
+            [to_fixed(qr.monthly_revenue, MONEY_SCALE) for qr in self.quote_requests],
+            [to_fixed(qr.general_lmg, MONEY_SCALE) for qr in self.quote_requests],
+            matrix.merchandise_indexes([qr.cargo_type for qr in self.quote_requests]),
+        )
+
+        for q, quote_request in enumerate(self.quote_requests):
+            for i, insurer in enumerate(matrix.insurers):
+                expected = calculate_premium_for_insurer(quote_request, insurer, snapshot)
+                self.assertEqual(bool(priced['valid'][q, i]), expected is not None)
+                if expected is None:
+                    continue
+                self.assertEqual(int(priced['premium'][q, i]), to_fixed(expected.premium_value, MONEY_SCALE))
+                self.assertEqual(int(priced['rctr_c_rate'][q, i]), to_fixed(expected.rctr_c_rate, RATE_SCALE))
+                self.assertEqual(int(priced['rc_dc_rate'][q, i]), to_fixed(expected.rc_dc_rate, RATE_SCALE))
+                self.assertEqual(int(priced['rctr_c_limit'][q, i]), to_fixed(expected.rctr_c_limit, MONEY_SCALE))
+                self.assertEqual(int(priced['rc_dc_limit'][q, i]), to_fixed(expected.rc_dc_limit, MONEY_SCALE))
+
+    def test_half_cent_rounds_half_up(self):
+        """
+        Testa se o meio centavo é arredondado para cima nos dois caminhos, inclusive após gravar o resultado.
+        """
+        snapshot = get_rating_snapshot()
+        matrix = RatingMatrix(snapshot)
+        priced = price_matrix(
+            matrix, [to_fixed(self.half_cent_quote.monthly_revenue, MONEY_SCALE)],
+            [to_fixed(self.half_cent_quote.general_lmg, MONEY_SCALE)],
+            matrix.merchandise_indexes([self.half_cent_quote.cargo_type]),
+        )
+        i = matrix.insurers.index(self.half_cent_insurer)
+        self.assertEqual(int(priced['premium'][0, i]), 1235)
+
+        result = calculate_premium_for_insurer(self.half_cent_quote, self.half_cent_insurer, snapshot)
+        self.assertEqual(result.premium_value, Decimal('12.35'))
+        result.save()
+        self.assertEqual(QuoteResult.objects.get(pk=result.pk).premium_value, Decimal('12.35'))
+
+    def test_reprice_open_quotes(self):
+        """
+        Testa se o repricing atualiza os resultados existentes das cotações em aberto.
+        """
+        quote_request = self.create_quote_request()
+        QuoteResult.objects.bulk_create([
+            calculate_premium_for_insurer(quote_request, insurer) for insurer in [self.insurer_a, self.insurer_b]
+        ])
+        QuoteResult.objects.filter(quote_request=quote_request).update(premium_value=Decimal('1.00'))
+
+        updated = reprice_open_quotes([self.insurer_a.id])
+
+        self.assertEqual(updated, 1)
+        expected = calculate_premium_for_insurer(quote_request, self.insurer_a)
+        result = QuoteResult.objects.get(quote_request=quote_request, insurer=self.insurer_a)
+        self.assertEqual(result.premium_value, expected.premium_value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+        self.assertEqual(QuoteResult.objects.get(quote_request=quote_request, insurer=self.insurer_b).premium_value, Decimal('1.00'))
+
+    def test_reprice_refreshes_observations_and_drops_invalid(self):
+        """
+        Testa se o repricing atualiza as observações e exclui os resultados de regras que deixaram de
+        se aplicar, mantendo os já usados em propostas.
+        """
+        quote_request = self.create_quote_request()
+        chosen = self.create_quote_request()
+        for quote in (quote_request, chosen):
+            QuoteResult.objects.bulk_create([
+                calculate_premium_for_insurer(quote, insurer) for insurer in [self.insurer_a, self.insurer_b]
+            ])
+        create_proposal(chosen.id, self.insurer_b.id)
+        InsurerBusinessRule.objects.filter(insurer=self.insurer_a).update(observations='Exige rastreador')
+        InsurerBusinessRule.objects.filter(insurer=self.insurer_b).update(volume_discount_threshold=None)
+        invalidate_rating_snapshot()
+
+        self.assertEqual(reprice_open_quotes(), 2)
+
+        result = QuoteResult.objects.get(quote_request=quote_request, insurer=self.insurer_a)
+        self.assertEqual(result.observations, calculate_premium_for_insurer(quote_request, self.insurer_a).observations)
+        self.assertTrue(result.observations.startswith('Exige rastreador'))
+        self.assertFalse(QuoteResult.objects.filter(quote_request=quote_request, insurer=self.insurer_b).exists())
+        self.assertTrue(QuoteResult.objects.filter(quote_request=chosen, insurer=self.insurer_b).exists())
+
+
+class RouteMatcherTest(SimpleTestCase):
+    """
+    Suite de testes para o matcher de cidades de risco.
+    """
+    def setUp(self):
+        self.matcher = RouteMatcher(['RJ', 'São Paulo', 'Rio de Janeiro', 'Duque de Caxias'])
+
+    def test_matches_whole_words_ignoring_accents(self):
+        """
+        Testa se cidades são encontradas sem acento, em qualquer caixa e como palavras inteiras.
+        """
+        self.assertTrue(self.matcher.matches('Niterói - RJ'))
+        self.assertTrue(self.matcher.matches('SAO PAULO/SP'))
+        self.assertTrue(self.matcher.matches('Centro, rio de janeiro'))
+        self.assertTrue(self.matcher.matches('Distrito de Duque de Caxias'))
+
+    def test_does_not_match_inside_other_words(self):
+        """
+        Testa se siglas e nomes parciais não casam dentro de palavras ou cidades diferentes.
+        """
+        self.assertFalse(self.matcher.matches('Forja Industrial - Curitiba'))
+        self.assertFalse(self.matcher.matches('Rio Grande - RS'))
+        self.assertFalse(self.matcher.matches('Paulo Afonso - BA'))
+        self.assertFalse(self.matcher.matches(''))
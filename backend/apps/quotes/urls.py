@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import QuoteRequestViewSet, QuoteResultViewSet, ProposalViewSet
+from .events_views import pricing_events, proposal_events
 
 router = DefaultRouter()
 router.register(r"requests", QuoteRequestViewSet)
@@ -11,5 +12,8 @@ urlpatterns = [
     path("", include(router.urls)),
     path("requests/<int:pk>/generate_proposal/", QuoteRequestViewSet.as_view({"post": "generate_proposal"}), name="quoterequest-generate-proposal"),
     path("requests/<int:pk>/import_items_from_csv/", QuoteRequestViewSet.as_view({"post": "import_items_from_csv"}), name="quoterequest-import-items-csv"),
+    path("requests/<int:pk>/pricing_events/", pricing_events, name="quoterequest-pricing-events"),
+    path("proposals/<int:pk>/events/", proposal_events, name="proposal-events"),
+    path("requests/bulk_quote/", QuoteRequestViewSet.as_view({"post": "bulk_quote"}), name="quoterequest-bulk-quote"),
     path("requests/download_csv_template/", QuoteRequestViewSet.as_view({"get": "download_csv_template"}), name="quoterequest-download-csv-template"),
 ]
\ No newline at end of file
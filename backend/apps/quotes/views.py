@@ -1,22 +1,36 @@
-from apps.insurers.models import Insurer
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.renderers import JSONRenderer
 from django.db import transaction
 from .models import QuoteRequest, QuoteResult, Proposal
 from .serializers import QuoteRequestSerializer, QuoteResultSerializer, ProposalSerializer
-from apps.tasks.pdf_tasks import generate_pdf_task
+from .renderers import PDFRenderer
+from .downloads import proposal_pdf_response
+from apps.tasks.pdf_tasks import generate_pdf_batch_task
+from apps.tasks.approval_tasks import start_approval_pipeline
 from apps.tasks.email_tasks import send_rejection_email_task # Importar a nova tarefa
+from apps.tasks.pricing_tasks import (
+    price_quote_request_task, pricing_channel, import_quote_items_task, item_import_channel
+)
+from apps.tasks.events import get_last_event, register_task, task_belongs_to
+from celery.result import AsyncResult
 from apps.users.permissions import IsBroker, IsManager, IsAdmin # Permissões customizadas
 from rest_framework.permissions import IsAuthenticated
-from datetime import datetime, timedelta # Importar datetime
-from apps.audits.models import AuditLog # Importar AuditLog
+from core.business_logic.activity_feed import record_activity
 import logging
 import csv
-import io
-from django.core.files.base import ContentFile
-from django.http import HttpResponse
-from .models import QuoteItem
+from django.core.files.storage import storages
+from django.http import HttpResponse, StreamingHttpResponse
+from django.conf import settings
+from core.business_logic.batch_quotation import price_quote_batch
+from core.business_logic.quote_cache import get_quote_cache_stats
+from core.business_logic.proposal_logic import create_proposal, ProposalGenerationError
+from core.business_logic.proposal_state import TRANSITIONS, transition, bulk_transition, cache_status, get_cached_status
+from core.business_logic.item_import import import_quote_items
+import json
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +41,9 @@ class QuoteRequestViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsBroker]
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user, version=1, is_current_version=True)
+        quote_request = serializer.save(user=self.request.user, version=1, is_current_version=True)
+        record_activity(self.request.user, 'QUOTE_REQUEST_CREATED',
+                        f'Nova cotação para {quote_request.client_name}', quote_request)
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -37,36 +53,42 @@ class QuoteRequestViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Não é possível editar uma cotação aprovada. Crie uma nova versão."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # Marcar a versão atual como não sendo a mais recente
-        instance.is_current_version = False
-        instance.save()
-
-        # Criar uma nova instância com os dados atualizados
-        # e vincular à versão anterior
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        new_instance = serializer.save(
-            user=request.user,
-            version=instance.version + 1,
-            previous_version=instance,
-            is_current_version=True,
-            status="PENDING" # Nova versão sempre começa como pendente
-        )
+        with transaction.atomic():
+            # Marcar a versão atual como não sendo a mais recente
+            instance.is_current_version = False
+            instance.save()
+
+            # Criar uma nova instância com os dados atualizados
+            # e vincular à versão anterior
+            new_instance = serializer.save(
+                user=request.user,
+                version=instance.version + 1,
+                previous_version=instance,
+                is_current_version=True,
+                status="PENDING" # Nova versão sempre começa como pendente
+            )
+            # Tarifação da nova versão fora da requisição, após o commit (com cache, ver price_quote_request_task)
+            task_id = uuid.uuid4().hex
+            register_task(pricing_channel(new_instance.id), task_id)
+            transaction.on_commit(lambda: price_quote_request_task.apply_async((new_instance.id,), task_id=task_id))
 
         # Opcional: Criar um registro de auditoria para a nova versão
-        AuditLog.objects.create(
-            user=request.user,
-            action='QUOTE_REQUEST_NEW_VERSION',
-            description=f'Nova versão {new_instance.id} criada para a cotação {instance.id}.',
-            content_object=new_instance
-        )
+        record_activity(request.user, 'QUOTE_REQUEST_NEW_VERSION',
+                        f'Nova versão {new_instance.id} criada para a cotação {instance.id}.', new_instance)
 
-        return Response(self.get_serializer(new_instance).data)
+        return Response({**self.get_serializer(new_instance).data, "task_id": task_id})
 
 
-    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsBroker])
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsBroker])
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsBroker],
+            parser_classes=[MultiPartParser, FormParser])
     def import_items_from_csv(self, request, pk=None):
+        """
+        Importa itens da cotação a partir de um CSV (separado por ';').
+        Arquivos acima de QUOTE_ITEM_IMPORT_ASYNC_THRESHOLD são importados em segundo
+        plano; o progresso pode ser consultado em import_items_status.
+        """
         quote_request = self.get_object()
         if 'file' not in request.FILES:
             return Response({'error': 'Nenhum arquivo CSV fornecido.'}, status=status.HTTP_400_BAD_REQUEST)
@@ -75,42 +97,78 @@ class QuoteRequestViewSet(viewsets.ModelViewSet):
         if not csv_file.name.endswith('.csv'):
             return Response({'error': 'O arquivo deve ser um CSV.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        data_set = csv_file.read().decode('UTF-8')
-        io_string = io.StringIO(data_set)
-        reader = csv.reader(io_string, delimiter=';')
-        header = next(reader)  # Pula o cabeçalho
-
-        created_items = []
-        errors = []
-        for i, row in enumerate(reader):
-            if len(row) != 3: # item_description, item_value, item_quantity
-                errors.append(f'Linha {i+2}: Formato inválido. Esperado 3 colunas, encontrado {len(row)}.')
-                continue
-            try:
-                item_description = row[0]
-                item_value = float(row[1])
-                item_quantity = int(row[2])
-
-                if item_value <= 0 or item_quantity <= 0:
-                    errors.append(f'Linha {i+2}: Valor ou quantidade inválidos (devem ser maiores que zero).')
-                    continue
-
-                item = QuoteItem.objects.create(
-                    quote_request=quote_request,
-                    item_description=item_description,
-                    item_value=item_value,
-                    item_quantity=item_quantity
-                )
-                created_items.append(item)
-            except ValueError as e:
-                errors.append(f'Linha {i+2}: Erro de conversão de dados - {e}.')
-            except Exception as e:
-                errors.append(f'Linha {i+2}: Erro inesperado - {e}.')
-        
-        if errors:
-            return Response({'message': 'Importação concluída com erros.', 'errors': errors}, status=status.HTTP_207_MULTI_STATUS)
-        
-        return Response({'message': f'Importação concluída com sucesso. {len(created_items)} itens adicionados.'}, status=status.HTTP_200_OK)
+        if csv_file.size > settings.QUOTE_ITEM_IMPORT_ASYNC_THRESHOLD:
+            # O arquivo é lido pelo worker: o armazenamento "imports" é compartilhado entre os contêineres
+            file_path = storages['imports'].save(f'quote_items/{uuid.uuid4().hex}.csv', csv_file)
+            task_id = uuid.uuid4().hex
+            register_task(item_import_channel(quote_request.id), task_id)
+            import_quote_items_task.apply_async((quote_request.id, file_path), task_id=task_id)
+            return Response({'message': 'Importação iniciada.', 'task_id': task_id}, status=status.HTTP_202_ACCEPTED)
+
+        try:
+            summary = import_quote_items(quote_request, csv_file.chunks())
+        except UnicodeDecodeError:
+            return Response({'error': 'O arquivo deve estar codificado em UTF-8.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if summary['error_count']:
+            return Response({'message': 'Importação concluída com erros.', **summary}, status=status.HTTP_207_MULTI_STATUS)
+
+        return Response({'message': f'Importação concluída com sucesso. {summary["created"]} itens adicionados.', **summary},
+                        status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated, IsBroker])
+    def import_items_status(self, request, pk=None):
+        return self._task_status(pk, request.query_params.get('task_id'), item_import_channel(pk))
+
+    def _task_status(self, pk, task_id, channel):
+        if not task_id:
+            # Último evento publicado pela tarefa, lido do cache
+            event = get_last_event(channel)
+            return Response(event or {"state": "UNKNOWN", "quote_request_id": int(pk)})
+
+        # Só tarefas iniciadas para esta cotação (ver register_task) são consultadas
+        if not task_belongs_to(channel, task_id):
+            return Response({"detail": "Tarefa não pertence a esta cotação."}, status=status.HTTP_404_NOT_FOUND)
+        result = AsyncResult(task_id)
+        info = result.info if isinstance(result.info, dict) else {}
+        data = {"state": result.state, "quote_request_id": int(pk), **info}
+        if result.failed():
+            # O detalhe da exceção fica apenas no log do worker
+            data["error"] = "Não foi possível concluir a tarefa."
+        return Response(data)
+
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsBroker])
+    def price(self, request, pk=None):
+        """
+        Enfileira a tarifação da cotação contra todas as seguradoras ativas.
+        O progresso pode ser consultado em pricing_status ou assinado em pricing_events.
+        """
+        quote_request = self.get_object()
+        task_id = uuid.uuid4().hex
+        register_task(pricing_channel(quote_request.id), task_id)
+        price_quote_request_task.apply_async((quote_request.id,), task_id=task_id)
+        return Response({"status": "Pricing started", "task_id": task_id}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated, IsBroker])
+    def pricing_status(self, request, pk=None):
+        return self._task_status(pk, request.query_params.get('task_id'), pricing_channel(pk))
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated, IsBroker])
+    def bulk_quote(self, request):
+        """
+        Cria e tarifa um lote de cotações em uma única chamada.
+        Aceita uma lista de payloads (ou {"quotes": [...]}) e devolve um fluxo NDJSON
+        com uma linha compacta por cotação e uma linha final de resumo.
+        """
+        payloads = request.data.get('quotes') if isinstance(request.data, dict) else request.data
+        if not isinstance(payloads, list) or not payloads:
+            return Response({'error': 'Envie uma lista de cotações.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(payloads) > settings.QUOTE_BATCH_MAX_SIZE:
+            return Response({'error': f'O lote deve ter no máximo {settings.QUOTE_BATCH_MAX_SIZE} cotações.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        lines = (json.dumps(row, separators=(',', ':')) + '\n' for row in price_quote_batch(payloads, request.user))
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def download_csv_template(self, request):
@@ -126,55 +184,34 @@ class QuoteRequestViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsBroker])
     def generate_proposal(self, request, pk=None):
+        """
+        Gera a proposta a partir dos resultados calculados da cotação.
+        Por padrão escolhe o menor prêmio; "insurer_id" seleciona uma seguradora específica.
+        """
         quote_request = self.get_object()
+        insurer_id = request.data.get('insurer_id') or request.query_params.get('insurer_id')
         try:
-            # Importar o modelo Insurer
-
-            
-            # Buscar ou criar uma seguradora padrão
-            default_insurer, created = Insurer.objects.get_or_create(
-                name="Seguradora Padrão",
-                defaults={
-                    'is_active': True,
-                    'contact_email': 'contato@seguradorapadrao.com.br',
-                    'contact_phone': '(11) 1234-5678'
-                }
-            )
-            
-            # Primeiro, criar um QuoteResult se não existir
-            quote_result, created = QuoteResult.objects.get_or_create(
-                quote_request=quote_request,
-                defaults={
-                    'insurer': default_insurer,
-                    'rctr_c_rate': 0.005,
-                    'rc_dc_rate': 0.003,
-                    'rctr_c_limit': float(quote_request.general_lmg),
-                    'rc_dc_limit': float(quote_request.general_lmg),
-                    'premium_value': float(quote_request.cargo_value) * 0.01,
-                    'observations': 'Proposta gerada automaticamente'
-                }
-            )
-            
-            proposal = Proposal.objects.create(
-                quote_request=quote_request,
-                quote_result=quote_result,
-                total_premium=float(quote_request.cargo_value) * 0.01,
-                rctr_c_rate=0.005,
-                rc_dc_rate=0.003,
-                rctr_c_limit=float(quote_request.general_lmg),
-                rc_dc_limit=float(quote_request.general_lmg),
-                valid_until=datetime.now().date() + timedelta(days=30),
-                status="PENDING"
-            )
-            return Response(ProposalSerializer(proposal).data, status=status.HTTP_201_CREATED)
+            proposal, created = create_proposal(quote_request.id, insurer_id)
+        except ProposalGenerationError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
+            logger.error(f"Erro ao gerar proposta para a cotação {quote_request.id}: {e}")
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if created:
+            record_activity(request.user, 'PROPOSAL_CREATED',
+                            f'Proposta {proposal.id} gerada para {quote_request.client_name}', proposal)
+        return Response(ProposalSerializer(proposal).data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 class QuoteResultViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = QuoteResult.objects.all()
     serializer_class = QuoteResultSerializer
     permission_classes = [IsAuthenticated]
 
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated, IsAdmin])
+    def cache_stats(self, request):
+        return Response(get_quote_cache_stats())
+
 class ProposalViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
@@ -188,58 +225,94 @@ class ProposalViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsManager])
     def approve(self, request, pk=None):
         proposal = self.get_object()
-        if proposal.status == "PENDING":
-            try:
-                with transaction.atomic():
-                    proposal.status = "APPROVED"
-                    proposal.save()
-                    # Criar um registro de auditoria para a aprovação
-                    AuditLog.objects.create(
-                        user=request.user,
-                        action='PROPOSAL_APPROVED',
-                        description=f'Proposta {proposal.id} aprovada.',
-                        content_object=proposal
-                    )
-
-
-                # Enfileira a tarefa de geração de PDF e envio de e-mail
-                task = generate_pdf_task.delay(proposal.id)
-                proposal.celery_task_id = task.id
-                proposal.status = "PROCESSING" # Define o status como processando PDF/Email
-                proposal.save()
-                return Response({"status": "proposal approved and PDF generation/email task started", "task_id": task.id})
-            except Exception as e:
-                logger.error(f"Erro ao aprovar proposta {proposal.id}: {e}")
-                return Response({"error": "Erro interno ao aprovar a proposta."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        return Response({"status": f"Proposal cannot be approved from current status: {proposal.status}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                # Apenas a requisição que vence a transição PENDING -> PROCESSING enfileira o pipeline.
+                # O ID da tarefa é gravado no mesmo UPDATE da transição.
+                task_id = uuid.uuid4().hex
+                if not transition(proposal, "approve", celery_task_id=task_id):
+                    return Response({"status": f"Proposal cannot be approved from current status: {proposal.status}"}, status=status.HTTP_400_BAD_REQUEST)
+                # Criar um registro de auditoria para a aprovação
+                record_activity(request.user, 'PROPOSAL_APPROVED', f'Proposta {proposal.id} aprovada.', proposal)
+
+            # Enfileira o pipeline de geração de PDF e envio de e-mail
+            task = start_approval_pipeline(proposal.id, task_id=task_id)
+            return Response({"status": "proposal approved and PDF generation/email task started", "task_id": task.id})
+        except Exception as e:
+            logger.error(f"Erro ao aprovar proposta {proposal.id}: {e}")
+            return Response({"error": "Erro interno ao aprovar a proposta."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsManager])
     def reject(self, request, pk=None):
         proposal = self.get_object()
-        if proposal.status == "PENDING":
-            proposal.status = "REJECTING"
-            proposal.save()
+        task_id = uuid.uuid4().hex
+        if transition(proposal, "reject", celery_task_id=task_id):
+            record_activity(request.user, 'PROPOSAL_REJECTED', f'Proposta {proposal.id} rejeitada.', proposal)
             # Enfileira a tarefa de envio de e-mail de rejeição
-            task = send_rejection_email_task.delay(proposal.id)
-            proposal.celery_task_id = task.id
-            proposal.save()
+            task = send_rejection_email_task.apply_async((proposal.id,), task_id=task_id)
             return Response({"status": "Proposal rejection started", "proposal_status": "REJECTING", "task_id": task.id})
         return Response({"status": f"Proposal cannot be rejected from current status: {proposal.status}"}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def generate_pdf(self, request, pk=None):
         proposal = self.get_object()
-        if proposal.status not in ["PROCESSING", "COMPLETED"]:
-            proposal.status = "PROCESSING"
-            proposal.save()
-            task = generate_pdf_task.delay(proposal.id)
-            proposal.celery_task_id = task.id
-            proposal.save()
+        task_id = uuid.uuid4().hex
+        if transition(proposal, "generate_pdf", celery_task_id=task_id):
+            task = start_approval_pipeline(proposal.id, task_id=task_id)
             return Response({"status": "PDF generation started", "proposal_status": "PROCESSING", "task_id": task.id})
         return Response({"status": "PDF generation already in progress or completed", "proposal_status": proposal.status}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated, IsManager])
+    def bulk_generate_pdf(self, request):
+        """
+        Gera os PDFs de várias propostas ({"ids": [...]}) em tarefas de lote de até
+        PDF_BATCH_SIZE propostas. Propostas já em processamento ou concluídas são ignoradas.
+        """
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({"error": "Envie a lista de IDs das propostas."}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            proposal_ids = list(
+                self.get_queryset().select_for_update()
+                .filter(id__in=ids, status__in=TRANSITIONS["generate_pdf"][0])
+                .order_by('id').values_list('id', flat=True)
+            )
+            # Status e ID da tarefa do lote gravados no mesmo UPDATE
+            batches = []
+            for start in range(0, len(proposal_ids), settings.PDF_BATCH_SIZE):
+                batch = proposal_ids[start:start + settings.PDF_BATCH_SIZE]
+                task_id = uuid.uuid4().hex
+                bulk_transition(batch, "generate_pdf", celery_task_id=task_id)
+                batches.append((batch, task_id))
+
+        task_ids = [generate_pdf_batch_task.apply_async((batch,), task_id=task_id).id for batch, task_id in batches]
+        return Response({"status": "PDF generation started", "proposal_ids": proposal_ids, "task_ids": task_ids})
+
+    @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated],
+            renderer_classes=[JSONRenderer, PDFRenderer])
+    def download_pdf(self, request, pk=None):
+        """
+        Baixa o PDF da proposta com ETag (hash do conteúdo), 304 e suporte a Range.
+        """
+        proposal = self.get_object()
+        if not proposal.pdf_file:
+            return Response({"detail": "PDF ainda não gerado para esta proposta."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            return proposal_pdf_response(request, proposal)
+        except FileNotFoundError:
+            return Response({"detail": "Arquivo PDF não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
     @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
     def status(self, request, pk=None):
+        """
+        Status da proposta. Para o dono da proposta, lido do cache (último status
+        publicado pelas transições e tarefas); nos demais casos, lido do banco com
+        a verificação de permissão, e o cache é preenchido. Atualizações em tempo
+        real estão disponíveis no fluxo SSE proposals/<id>/events/.
+        """
+        cached = get_cached_status(pk)
+        if cached is not None and cached[1] == request.user.id:
+            return Response(cached[0])
         proposal = self.get_object()
-        return Response({"status": proposal.status, "pdf_file": proposal.pdf_file, "celery_task_id": proposal.celery_task_id})
\ No newline at end of file
+        return Response(cache_status(proposal))
\ No newline at end of file
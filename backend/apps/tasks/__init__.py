@@ -1,5 +1,10 @@
 
 from .pdf_tasks import *
 from .email_tasks import *
+from .pricing_tasks import *
 
 
+from .approval_tasks import *
+from .notification_tasks import *
+from .report_tasks import *
+from .audit_tasks import *
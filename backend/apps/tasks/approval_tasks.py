@@ -0,0 +1,96 @@
+from celery import shared_task, chain
+import logging
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_PREFIX = "idempotency"
+IDEMPOTENCY_TIMEOUT = 60 * 60 * 24 * 7
+EMAIL_LOCK_TIMEOUT = 60 * 5
+
+# Falhas transitórias (storage, SMTP, rede) são repetidas com backoff exponencial
+RETRY_OPTIONS = {
+    "autoretry_for": (OSError,),
+    "retry_backoff": True,
+    "retry_backoff_max": 300,
+    "retry_jitter": True,
+    "max_retries": 5,
+}
+
+
+def approval_idempotency_key(proposal_id, pdf_hash) -> str:
+    return f"approval:{proposal_id}:{pdf_hash}"
+
+
+def build_approval_context(proposal, company_name: str) -> dict:
+    """
+    Contexto compacto repassado entre as etapas do pipeline de aprovação:
+    referência ao PDF armazenado, dados do cliente e da empresa. As etapas
+    seguintes não precisam recarregar a proposta.
+    """
+    quote_request = proposal.quote_request
+    return {
+        "template_type": "APPROVAL",
+        "proposal_id": proposal.id,
+        "idempotency_key": approval_idempotency_key(proposal.id, proposal.pdf_hash),
+        "pdf_name": proposal.pdf_file,
+        "recipient": quote_request.user.email,
+        "client_name": quote_request.client_name,
+        "proposal_date": proposal.proposal_date.strftime("%d/%m/%Y"),
+        "total_premium": f"R$ {float(proposal.total_premium):,.2f}",
+        "company_name": company_name,
+    }
+
+
+@shared_task(bind=True, **RETRY_OPTIONS)
+def approval_pdf_task(self, proposal_id):
+    """
+    Etapa 1: gera e armazena o PDF (endereçado pelo conteúdo, portanto
+    idempotente) e marca a proposta como concluída. Retorna o contexto da etapa de e-mail.
+    """
+    from apps.quotes.models import Proposal
+    from apps.tasks.pdf_tasks import render_proposal_pdf
+    from core.business_logic.pdf_template import get_pdf_template
+    from core.business_logic.proposal_state import publish_statuses, transition
+    from django.utils import timezone
+
+    proposal = Proposal.objects.select_related('quote_request__user', 'quote_result__insurer').get(id=proposal_id)
+    render_proposal_pdf(proposal)
+    pdf_fields = {'pdf_file': proposal.pdf_file, 'pdf_hash': proposal.pdf_hash}
+    if not transition(proposal, "complete", **pdf_fields):
+        # Entrega repetida ou proposta já concluída: gravar apenas o PDF e publicar o status com ele
+        Proposal.objects.filter(id=proposal_id).update(updated_at=timezone.now(), **pdf_fields)
+        publish_statuses(Proposal.objects.filter(id=proposal_id))
+    logger.info(f"PDF da proposta {proposal_id} gerado no pipeline de aprovação: {proposal.pdf_file}")
+    return build_approval_context(proposal, get_pdf_template().company_name)
+
+
+@shared_task(bind=True, **RETRY_OPTIONS)
+def approval_email_task(self, context):
+    """
+    Etapa 2: envia o e-mail de aprovação com o PDF anexado, usando apenas o
+    contexto recebido, pelo mesmo envio em lote das notificações. Erros
+    transitórios (OSError de conexão ou leitura do PDF) são propagados e a
+    tarefa é repetida (RETRY_OPTIONS). A chave de idempotência impede
+    reenvios quando a tarefa é repetida ou entregue mais de uma vez.
+    """
+    from apps.tasks.notification_tasks import send_notifications
+
+    outcome = send_notifications([context])
+    if context['proposal_id'] in outcome['skipped']:
+        logger.info(f"E-mail de aprovação da proposta {context['proposal_id']} já enviado ou em envio; ignorando.")
+        return context
+    if context['proposal_id'] in outcome['failed']:
+        # Falha definitiva (destinatário recusado, template ou PDF inexistente): não repetir
+        logger.error(f"Falha ao enviar o e-mail de aprovação da proposta {context['proposal_id']}.")
+        return context
+
+    logger.info(f"E-mail de aprovação enviado para a proposta {context['proposal_id']} com PDF anexado.")
+    return context
+
+
+def start_approval_pipeline(proposal_id, task_id=None):
+    """
+    Encadeia geração do PDF e envio do e-mail de aprovação. Retorna o
+    AsyncResult da última etapa (com o `task_id` informado, se houver).
+    """
+    return chain(approval_pdf_task.s(proposal_id), approval_email_task.s()).apply_async(task_id=task_id)
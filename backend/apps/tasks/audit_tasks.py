@@ -0,0 +1,27 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_audit_events_task():
+    """
+    Tarefa periódica (celery beat): grava em lote os eventos de auditoria do stream Redis.
+    """
+    from core.business_logic.audit_sink import flush_audit_events
+
+    return flush_audit_events()
+
+
+@shared_task
+def maintain_audit_partitions_task():
+    """
+    Tarefa periódica (celery beat): cria as próximas partições mensais do
+    AuditLog e arquiva as partições fora do período de retenção.
+    """
+    from core.business_logic.audit_partitions import ensure_audit_partitions, archive_audit_partitions
+
+    created = ensure_audit_partitions()
+    archived = archive_audit_partitions()
+    return {"created": created, "archived": archived}
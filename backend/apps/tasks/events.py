@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from asgiref.sync import sync_to_async
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+LAST_EVENT_KEY_PREFIX = "events:last"
+LAST_EVENT_TIMEOUT = 60 * 60
+TASK_CHANNEL_KEY_PREFIX = "events:task"
+TASK_CHANNEL_TIMEOUT = 24 * 60 * 60
+
+
+def _last_event_key(channel: str) -> str:
+    return f"{LAST_EVENT_KEY_PREFIX}:{channel}"
+
+
+def publish_event(channel: str, payload: dict):
+    """
+    Publica um evento no canal Redis (pub/sub) e guarda o último estado no cache,
+    para que clientes que assinarem ou consultarem depois recebam o estado atual.
+    Falhas de publicação são apenas registradas: o evento é informativo.
+    """
+    try:
+        cache.set(_last_event_key(channel), payload, timeout=LAST_EVENT_TIMEOUT)
+        get_redis_connection("default").publish(channel, json.dumps(payload, default=str))
+    except Exception as e:
+        logger.warning(f"Não foi possível publicar evento no canal {channel}: {e}")
+
+
+def set_last_event(channel: str, payload: dict):
+    """
+    Guarda o estado atual no cache sem publicá-lo (estado lido do banco).
+    """
+    try:
+        cache.set(_last_event_key(channel), payload, timeout=LAST_EVENT_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar o último evento do canal {channel}: {e}")
+
+
+def get_last_event(channel: str):
+    try:
+        return cache.get(_last_event_key(channel))
+    except Exception as e:
+        logger.warning(f"Não foi possível ler o último evento do canal {channel}: {e}")
+        return None
+
+
+def register_task(channel: str, task_id: str):
+    """
+    Associa a tarefa ao canal de eventos do registro que a iniciou, para que
+    consultas de status por task_id confirmem a quem a tarefa pertence.
+    """
+    try:
+        cache.set(f"{TASK_CHANNEL_KEY_PREFIX}:{task_id}", channel, timeout=TASK_CHANNEL_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Não foi possível registrar a tarefa {task_id} do canal {channel}: {e}")
+
+
+def task_belongs_to(channel: str, task_id: str) -> bool:
+    try:
+        return cache.get(f"{TASK_CHANNEL_KEY_PREFIX}:{task_id}") == channel
+    except Exception as e:
+        logger.warning(f"Não foi possível ler o canal da tarefa {task_id}: {e}")
+        return False
+
+
+async def subscribe_events(channel: str, timeout: float, heartbeat: float = 15):
+    """
+    Gerador assíncrono que assina o canal Redis e produz os eventos recebidos.
+    O primeiro item é o último estado conhecido (se houver). Produz None a cada
+    `heartbeat` segundos sem mensagens e termina após `timeout` segundos.
+    """
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(settings.CACHES["default"]["LOCATION"])
+    pubsub = client.pubsub()
+    # Assinar antes de ler o último estado, para não perder eventos no intervalo
+    await pubsub.subscribe(channel)
+    try:
+        last_event = await sync_to_async(get_last_event)(channel)
+        if last_event is not None:
+            yield last_event
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(heartbeat, remaining))
+            if message is None:
+                yield None
+                continue
+            yield json.loads(message["data"])
+    finally:
+        await pubsub.unsubscribe(channel)
+        await pubsub.close()
+        await client.close()
@@ -0,0 +1,180 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from apps.tasks.approval_tasks import IDEMPOTENCY_KEY_PREFIX, IDEMPOTENCY_TIMEOUT, EMAIL_LOCK_TIMEOUT, RETRY_OPTIONS
+import smtplib
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+EMAIL_RATE_KEY_PREFIX = "email_rate"
+
+
+def build_rejection_context(proposal, company_name: str) -> dict:
+    """
+    Contexto do e-mail de rejeição, no mesmo formato do contexto de aprovação.
+    """
+    quote_request = proposal.quote_request
+    return {
+        "template_type": "REJECTION",
+        "proposal_id": proposal.id,
+        "idempotency_key": f"rejection:{proposal.id}",
+        "recipient": quote_request.user.email,
+        "client_name": quote_request.client_name,
+        "proposal_date": proposal.proposal_date.strftime("%d/%m/%Y"),
+        "company_name": company_name,
+    }
+
+
+def email_provider(recipient: str) -> str:
+    """
+    Provedor do destinatário (domínio do e-mail), usado para o limite de envio.
+    """
+    return recipient.rsplit('@', 1)[-1].lower()
+
+
+def wait_for_rate_limit(provider: str):
+    """
+    Limita os envios por provedor em janelas fixas de EMAIL_RATE_LIMIT_WINDOW
+    segundos, com o contador no cache (compartilhado entre os workers). Ao
+    atingir o limite, aguarda o início da janela seguinte.
+    """
+    limits = settings.EMAIL_PROVIDER_RATE_LIMITS
+    limit = limits.get(provider, limits.get("default"))
+    if not limit:
+        return
+
+    window_size = settings.EMAIL_RATE_LIMIT_WINDOW
+    now = time.time()
+    window = int(now // window_size)
+    while True:
+        key = f"{EMAIL_RATE_KEY_PREFIX}:{provider}:{window}"
+        cache.add(key, 0, timeout=window_size * 2)
+        if cache.incr(key) <= limit:
+            return
+        wait = (window + 1) * window_size - now
+        logger.info(f"Limite de envio para {provider} atingido; aguardando {wait:.1f}s.")
+        time.sleep(max(wait, 0))
+        window += 1
+        now = window * window_size
+
+
+def build_notification_message(notification: dict, connection) -> EmailMessage:
+    """
+    Renderiza o e-mail de aprovação ou rejeição a partir do contexto (template
+    já compilado) e anexa o PDF da proposta aprovada.
+    """
+    from core.business_logic.email_templates import render_email
+    from django.core.files.storage import storages
+
+    template_type = notification.get("template_type", "APPROVAL")
+    subject, body, _ = render_email(template_type, {
+        'client_name': notification['client_name'],
+        'proposal_date': notification['proposal_date'],
+        'total_premium': notification.get('total_premium', ''),
+        'company_name': notification['company_name'],
+    })
+    message = EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [notification['recipient']], connection=connection)
+    message.content_subtype = "html"
+    if template_type == "APPROVAL":
+        with storages["proposals"].open(notification['pdf_name'], 'rb') as pdf_file:
+            message.attach(f"proposta_{notification['proposal_id']}.pdf", pdf_file.read(), 'application/pdf')
+    return message
+
+
+def _sent_key(notification: dict) -> str:
+    return f"{IDEMPOTENCY_KEY_PREFIX}:{notification['idempotency_key']}:email"
+
+
+def send_notifications(notifications: list) -> dict:
+    """
+    Envia um lote de e-mails de aprovação/rejeição por uma única conexão SMTP
+    (get_connection), respeitando o limite por provedor. Cada e-mail tem sua
+    chave de idempotência: e-mails já enviados ou em envio por outro worker
+    são ignorados, de modo que o lote pode ser repetido com segurança. Falhas
+    de um destinatário não interrompem o lote; erros de conexão e de leitura
+    do PDF são propagados (após liberar os locks) para que a tarefa seja repetida.
+    Retorna os IDs das propostas enviadas, ignoradas e com falha.
+    """
+    from core.business_logic.proposal_state import bulk_transition
+
+    sent_flags = cache.get_many([_sent_key(notification) for notification in notifications])
+    pending = []
+    skipped = []
+    already_sent = []
+    for notification in notifications:
+        key = _sent_key(notification)
+        if sent_flags.get(key):
+            already_sent.append(notification)
+            skipped.append(notification['proposal_id'])
+            continue
+        if not cache.add(f"{key}:lock", 1, timeout=EMAIL_LOCK_TIMEOUT):
+            # Em envio por outro worker, que confirma a rejeição
+            skipped.append(notification['proposal_id'])
+            continue
+        pending.append(notification)
+
+    sent = []
+    failed = []
+    try:
+        if pending:
+            with get_connection() as connection:
+                for notification in pending:
+                    try:
+                        message = build_notification_message(notification, connection)
+                    except OSError as e:
+                        if not isinstance(e, FileNotFoundError):
+                            # Falha transitória ao ler o PDF: propagar para que a tarefa seja repetida
+                            raise
+                        logger.error(f"PDF da proposta {notification['proposal_id']} não encontrado: {e}")
+                        failed.append(notification)
+                        continue
+                    except Exception as e:
+                        logger.error(f"Erro ao montar o e-mail da proposta {notification['proposal_id']}: {e}")
+                        failed.append(notification)
+                        continue
+                    wait_for_rate_limit(email_provider(notification['recipient']))
+                    try:
+                        connection.send_messages([message])
+                    except smtplib.SMTPRecipientsRefused as e:
+                        logger.error(f"Destinatário recusado para a proposta {notification['proposal_id']}: {e}")
+                        failed.append(notification)
+                        continue
+                    cache.set(_sent_key(notification), 1, timeout=IDEMPOTENCY_TIMEOUT)
+                    sent.append(notification)
+    finally:
+        cache.delete_many([f"{_sent_key(notification)}:lock" for notification in pending])
+
+    # Rejeições concluídas (inclusive as já enviadas em uma execução anterior, que pode ter
+    # falhado antes de confirmá-las) ou com falha: uma única atualização para cada grupo
+    rejected = [n['proposal_id'] for n in sent + already_sent if n.get("template_type") == "REJECTION"]
+    not_rejected = [n['proposal_id'] for n in failed if n.get("template_type") == "REJECTION"]
+    if rejected:
+        bulk_transition(rejected, "confirm_rejection")
+    if not_rejected:
+        bulk_transition(not_rejected, "revert_rejection")
+
+    logger.info(f"Lote de e-mails: {len(sent)} enviados, {len(skipped)} ignorados, {len(failed)} com falha.")
+    return {
+        "sent": [n['proposal_id'] for n in sent],
+        "skipped": skipped,
+        "failed": [n['proposal_id'] for n in failed],
+    }
+
+
+@shared_task(bind=True, **RETRY_OPTIONS)
+def send_notification_batch_task(self, notifications):
+    return send_notifications(notifications)
+
+
+def dispatch_notifications(notifications: list) -> list:
+    """
+    Agrupa os contextos de e-mail em lotes de até EMAIL_BATCH_SIZE e enfileira
+    uma tarefa por lote. Retorna os AsyncResult das tarefas.
+    """
+    return [
+        send_notification_batch_task.delay(notifications[start:start + settings.EMAIL_BATCH_SIZE])
+        for start in range(0, len(notifications), settings.EMAIL_BATCH_SIZE)
+    ]
@@ -0,0 +1,141 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def reprice_open_quotes_task(insurer_ids=None):
+    from core.business_logic.vectorized_pricing import reprice_open_quotes
+
+    try:
+        updated = reprice_open_quotes(insurer_ids)
+        logger.info(f"Repricing das cotações em aberto concluído para seguradoras {insurer_ids}: {updated} resultados.")
+        return updated
+    except Exception as e:
+        logger.error(f"Erro no repricing das cotações em aberto para seguradoras {insurer_ids}: {e}")
+        raise
+
+
+def pricing_channel(quote_request_id) -> str:
+    return f"quote-pricing:{quote_request_id}"
+
+
+@shared_task(bind=True)
+def price_quote_request_task(self, quote_request_id):
+    from apps.quotes.models import QuoteRequest, QuoteResult
+    from apps.tasks.events import publish_event
+    from core.business_logic.quotation_logic import IncompletePricingError, calculate_premium_for_insurer, is_high_risk_route
+    from core.business_logic.quote_cache import cache_premium, get_cached_premium
+    from core.business_logic.rating_snapshot import get_rating_snapshot
+    from django.db import transaction
+
+    channel = pricing_channel(quote_request_id)
+
+    def report(state, **meta):
+        meta["quote_request_id"] = quote_request_id
+        if state == "PROGRESS":
+            self.update_state(state=state, meta=meta)
+        publish_event(channel, {"state": state, **meta})
+
+    failed = []
+    try:
+        snapshot = get_rating_snapshot()
+        with transaction.atomic():
+            # O lock na cotação impede que duas tarefas gravem resultados duplicados
+            quote_request = QuoteRequest.objects.select_for_update().get(id=quote_request_id)
+            existing = set(QuoteResult.objects.filter(quote_request=quote_request).values_list('insurer_id', flat=True))
+            insurers = [insurer for insurer in snapshot.insurers if insurer.id not in existing]
+            high_risk_route = is_high_risk_route(quote_request.origin, quote_request.destination, snapshot)
+
+            total = len(insurers)
+            report("PROGRESS", done=0, total=total)
+            # Conjunto já tarifado para os mesmos dados de preço (ver quote_cache)
+            cached = get_cached_premium(quote_request, snapshot) if insurers else None
+            if cached is not None:
+                results = [result for result in cached if result.insurer_id not in existing]
+                report("PROGRESS", done=total, total=total)
+            else:
+                results = []
+                for done, insurer in enumerate(insurers, start=1):
+                    try:
+                        result = calculate_premium_for_insurer(quote_request, insurer, snapshot, high_risk_route)
+                    except Exception as e:
+                        logger.error(f"Erro ao calcular prêmio para {insurer.name}: {e}")
+                        result = None
+                        failed.append(insurer.name)
+                    if result:
+                        results.append(result)
+                    report("PROGRESS", done=done, total=total, insurer=insurer.name, priced=result is not None)
+                # Conjuntos parciais não são reaproveitados
+                if not failed and not existing:
+                    cache_premium(quote_request, results, snapshot)
+
+            QuoteResult.objects.bulk_create(results)
+
+        summary = {"created": len(results), "total": total}
+        if failed:
+            # Os resultados obtidos ficam gravados; uma nova execução tarifa apenas as seguradoras que faltam
+            report("FAILURE", error=f"Não foi possível tarifar {len(failed)} seguradora(s).", failed=failed, **summary)
+            raise IncompletePricingError(f"Falha ao tarifar a cotação {quote_request_id} para: {', '.join(failed)}")
+        report("SUCCESS", **summary)
+        logger.info(f"Tarifação da cotação {quote_request_id} concluída: {len(results)} resultados criados.")
+        return {"quote_request_id": quote_request_id, **summary}
+
+    except QuoteRequest.DoesNotExist:
+        logger.error(f"Cotação com ID {quote_request_id} não encontrada.")
+        report("FAILURE", error="Cotação não encontrada.")
+        raise
+    except IncompletePricingError as e:
+        logger.error(str(e))
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao tarifar a cotação {quote_request_id}: {e}")
+        # Os eventos chegam ao cliente: o detalhe da exceção fica apenas no log
+        report("FAILURE", error="Erro inesperado ao tarifar a cotação.")
+        raise
+
+
+def item_import_channel(quote_request_id) -> str:
+    return f"quote-items-import:{quote_request_id}"
+
+
+@shared_task(bind=True)
+def import_quote_items_task(self, quote_request_id, file_path):
+    from apps.quotes.models import QuoteRequest
+    from apps.tasks.events import publish_event
+    from core.business_logic.item_import import import_quote_items
+    from django.core.files.storage import storages
+
+    channel = item_import_channel(quote_request_id)
+
+    def report(state, **meta):
+        meta["quote_request_id"] = quote_request_id
+        if state == "PROGRESS":
+            self.update_state(state=state, meta=meta)
+        publish_event(channel, {"state": state, **meta})
+
+    try:
+        quote_request = QuoteRequest.objects.get(id=quote_request_id)
+        report("PROGRESS", processed=0)
+        with storages['imports'].open(file_path, 'rb') as csv_file:
+            summary = import_quote_items(
+                quote_request, csv_file.chunks(),
+                progress=lambda processed: report("PROGRESS", processed=processed)
+            )
+        report("SUCCESS", **summary)
+        return {"quote_request_id": quote_request_id, **summary}
+
+    except QuoteRequest.DoesNotExist:
+        logger.error(f"Cotação com ID {quote_request_id} não encontrada.")
+        report("FAILURE", error="Cotação não encontrada.")
+        raise
+    except UnicodeDecodeError:
+        logger.error(f"Arquivo de itens da cotação {quote_request_id} não está em UTF-8.")
+        report("FAILURE", error="O arquivo deve estar codificado em UTF-8.")
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao importar itens da cotação {quote_request_id}: {e}")
+        report("FAILURE", error="Erro inesperado ao importar os itens.")
+        raise
+    finally:
+        storages['imports'].delete(file_path)
@@ -0,0 +1,26 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def reconcile_dashboard_counters_task():
+    """
+    Tarefa periódica (celery beat): corrige divergências dos contadores do dashboard.
+    """
+    from core.business_logic.dashboard_counters import reconcile_counters
+
+    drift = reconcile_counters()
+    logger.info(f"Reconciliação dos contadores do dashboard concluída: {len(drift)} divergências corrigidas.")
+    return drift
+
+
+@shared_task
+def refresh_report_rollups_task(full=False):
+    """
+    Tarefa periódica (celery beat): reagrega nas tabelas dos relatórios os dias alterados.
+    """
+    from core.business_logic.report_rollups import refresh_report_rollups
+
+    return refresh_report_rollups(full=full)
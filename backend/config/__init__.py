@@ -1,4 +1,8 @@
 
 # This file makes the 'config' directory a Python package.
 
+# Load the Celery app whenever Django starts, so that shared_task
+# .delay() calls from web processes use the configured broker.
+from .celery import app as celery_app
 
+__all__ = ("celery_app",)
@@ -135,6 +135,70 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "UTC"
 
+# Task queues: "pdf" (CPU-bound ReportLab rendering), "email" (SMTP I/O), "pricing"
+# (interactive pricing and item imports) and "bulk" (month-end batches, repricing).
+# Each queue runs on its own worker (see docker-compose.yml), so bulk runs never
+# starve an individual approval. Within a queue, priority 0 is consumed first.
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_TASK_ROUTES = {
+    "apps.tasks.approval_tasks.approval_pdf_task": {"queue": "pdf", "priority": 0},
+    "apps.tasks.approval_tasks.approval_email_task": {"queue": "email", "priority": 0},
+    "apps.tasks.email_tasks.send_rejection_email_task": {"queue": "email", "priority": 0},
+    "apps.tasks.notification_tasks.send_notification_batch_task": {"queue": "email", "priority": 9},
+    "apps.tasks.pricing_tasks.price_quote_request_task": {"queue": "pricing", "priority": 0},
+    "apps.tasks.pricing_tasks.import_quote_items_task": {"queue": "pricing", "priority": 5},
+    "apps.tasks.pdf_tasks.generate_pdf_batch_task": {"queue": "bulk", "priority": 9},
+    "apps.tasks.pricing_tasks.reprice_open_quotes_task": {"queue": "bulk", "priority": 9},
+    "apps.tasks.report_tasks.*": {"queue": "bulk", "priority": 9},
+    "apps.tasks.audit_tasks.maintain_audit_partitions_task": {"queue": "bulk", "priority": 9},
+}
+# Periodic tasks (synced into django_celery_beat's DatabaseScheduler)
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-dashboard-counters": {
+        "task": "apps.tasks.report_tasks.reconcile_dashboard_counters_task",
+        "schedule": int(os.environ.get("DASHBOARD_RECONCILE_INTERVAL", 60 * 60)),
+    },
+    # Report screens read daily rollups; only days changed since the last run are re-aggregated
+    "refresh-report-rollups": {
+        "task": "apps.tasks.report_tasks.refresh_report_rollups_task",
+        "schedule": int(os.environ.get("REPORT_ROLLUP_INTERVAL", 15 * 60)),
+    },
+    # Audit events buffered in the Redis stream are written in batches
+    "flush-audit-events": {
+        "task": "apps.tasks.audit_tasks.flush_audit_events_task",
+        "schedule": int(os.environ.get("AUDIT_FLUSH_INTERVAL", 5)),
+        "options": {"expires": int(os.environ.get("AUDIT_FLUSH_INTERVAL", 5))},
+    },
+    # Monthly AuditLog partitions (PostgreSQL): create upcoming months, archive expired ones
+    "maintain-audit-partitions": {
+        "task": "apps.tasks.audit_tasks.maintain_audit_partitions_task",
+        "schedule": 24 * 60 * 60,
+    },
+    # Daily full rebuild as a safety net for changes the incremental run cannot see
+    "rebuild-report-rollups": {
+        "task": "apps.tasks.report_tasks.refresh_report_rollups_task",
+        "schedule": 24 * 60 * 60,
+        "kwargs": {"full": True},
+    },
+}
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    # Redis emulates priorities with one list per step
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+    # Unacknowledged tasks are redelivered after this many seconds. The unacked index in Redis is
+    # shared by all queues and every worker restores messages older than its own timeout, so this
+    # single value must exceed the longest task on ANY queue (bulk batches) and be the same everywhere
+    "visibility_timeout": int(os.environ.get("CELERY_VISIBILITY_TIMEOUT", 6 * 60 * 60)),
+}
+# Tasks are idempotent (content-addressed PDFs, email idempotency keys, conditional
+# status transitions), so they are acknowledged only after running and redelivered
+# if the worker dies mid-task
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.environ.get("CELERY_WORKER_PREFETCH_MULTIPLIER", 1))
+
 # Caching
 CACHES = {
     "default": {
@@ -246,7 +310,109 @@ DEFAULT_FROM_EMAIL = 'webmaster@localhost'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# File storages. Proposal PDFs use the "proposals" alias: the local filesystem by default,
+# or an S3-compatible bucket (e.g. MinIO) so every worker node can reach them:
+#   PROPOSAL_STORAGE_BACKEND=storages.backends.s3.S3Storage (requires django-storages and boto3)
+PROPOSAL_STORAGE_BACKEND = os.environ.get("PROPOSAL_STORAGE_BACKEND", "django.core.files.storage.FileSystemStorage")
+PROPOSAL_STORAGE_OPTIONS = {}
+if PROPOSAL_STORAGE_BACKEND == "storages.backends.s3.S3Storage":
+    PROPOSAL_STORAGE_OPTIONS = {
+        "bucket_name": os.environ.get("PROPOSAL_STORAGE_BUCKET", "proposals"),
+        "endpoint_url": os.environ.get("PROPOSAL_STORAGE_ENDPOINT_URL"),
+        "access_key": os.environ.get("PROPOSAL_STORAGE_ACCESS_KEY"),
+        "secret_key": os.environ.get("PROPOSAL_STORAGE_SECRET_KEY"),
+        "file_overwrite": False,
+    }
+
+# Expired audit log partitions are exported as gzip-compressed JSONL to the "audit_archive" alias
+AUDIT_ARCHIVE_STORAGE_BACKEND = os.environ.get("AUDIT_ARCHIVE_STORAGE_BACKEND", "django.core.files.storage.FileSystemStorage")
+AUDIT_ARCHIVE_STORAGE_OPTIONS = {"location": os.path.join(MEDIA_ROOT, "audit_archive")}
+if AUDIT_ARCHIVE_STORAGE_BACKEND == "storages.backends.s3.S3Storage":
+    AUDIT_ARCHIVE_STORAGE_OPTIONS = {
+        "bucket_name": os.environ.get("AUDIT_ARCHIVE_STORAGE_BUCKET", "audit-archive"),
+        "endpoint_url": os.environ.get("PROPOSAL_STORAGE_ENDPOINT_URL"),
+        "access_key": os.environ.get("PROPOSAL_STORAGE_ACCESS_KEY"),
+        "secret_key": os.environ.get("PROPOSAL_STORAGE_SECRET_KEY"),
+        "file_overwrite": False,
+    }
+
+# Large quote item CSVs are handed from the web container to the worker through the "imports"
+# alias, so it must be shared between them: a volume mounted at IMPORT_STORAGE_LOCATION in every
+# container, or an S3-compatible bucket (IMPORT_STORAGE_BACKEND=storages.backends.s3.S3Storage)
+IMPORT_STORAGE_BACKEND = os.environ.get("IMPORT_STORAGE_BACKEND", "django.core.files.storage.FileSystemStorage")
+IMPORT_STORAGE_OPTIONS = {"location": os.environ.get("IMPORT_STORAGE_LOCATION", os.path.join(MEDIA_ROOT, "imports"))}
+if IMPORT_STORAGE_BACKEND == "storages.backends.s3.S3Storage":
+    IMPORT_STORAGE_OPTIONS = {
+        "bucket_name": os.environ.get("IMPORT_STORAGE_BUCKET", "imports"),
+        "endpoint_url": os.environ.get("PROPOSAL_STORAGE_ENDPOINT_URL"),
+        "access_key": os.environ.get("PROPOSAL_STORAGE_ACCESS_KEY"),
+        "secret_key": os.environ.get("PROPOSAL_STORAGE_SECRET_KEY"),
+        "file_overwrite": False,
+    }
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    "proposals": {"BACKEND": PROPOSAL_STORAGE_BACKEND, "OPTIONS": PROPOSAL_STORAGE_OPTIONS},
+    "audit_archive": {"BACKEND": AUDIT_ARCHIVE_STORAGE_BACKEND, "OPTIONS": AUDIT_ARCHIVE_STORAGE_OPTIONS},
+    "imports": {"BACKEND": IMPORT_STORAGE_BACKEND, "OPTIONS": IMPORT_STORAGE_OPTIONS},
+}
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
+# Keyset cursor of the activity feed's next page
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor"]
+
+# Insurer rating: QUOTATION_RATING_MAX_WORKERS > 0 rates insurers concurrently
+QUOTATION_RATING_MAX_WORKERS = int(os.environ.get("QUOTATION_RATING_MAX_WORKERS", 0))
+# Total deadline (seconds) for rating all insurers concurrently; insurers still running are
+# left out of the result (the partial result set is not cached)
+QUOTATION_RATING_DEADLINE = float(os.environ.get("QUOTATION_RATING_DEADLINE", os.environ.get("QUOTATION_RATING_TIMEOUT", 5)))
+
+# Server-Sent Events streams (served through config.asgi)
+EVENT_STREAM_TIMEOUT = int(os.environ.get("EVENT_STREAM_TIMEOUT", 300))
+
+# Batch quoting
+QUOTE_BATCH_CHUNK_SIZE = int(os.environ.get("QUOTE_BATCH_CHUNK_SIZE", 1000))
+QUOTE_BATCH_MAX_SIZE = int(os.environ.get("QUOTE_BATCH_MAX_SIZE", 10000))
+
+# Quote result cache (keys already carry the rating config version)
+QUOTE_RESULT_CACHE_TIMEOUT = int(os.environ.get("QUOTE_RESULT_CACHE_TIMEOUT", 60 * 60 * 24))
+
+# Quote item CSV import: uploads above the threshold (bytes) are imported by a Celery task
+QUOTE_ITEM_IMPORT_BATCH_SIZE = int(os.environ.get("QUOTE_ITEM_IMPORT_BATCH_SIZE", 5000))
+QUOTE_ITEM_IMPORT_ASYNC_THRESHOLD = int(os.environ.get("QUOTE_ITEM_IMPORT_ASYNC_THRESHOLD", 2 * 1024 * 1024))
+
+# Proposal PDFs: number of proposals rendered per batch task
+PDF_BATCH_SIZE = int(os.environ.get("PDF_BATCH_SIZE", 50))
+
+# Proposal PDF downloads: when set (e.g. "/protected-media/"), nginx serves the file through
+# X-Accel-Redirect from an internal location mapped to the proposals storage
+PROPOSAL_PDF_ACCEL_REDIRECT_PREFIX = os.environ.get("PROPOSAL_PDF_ACCEL_REDIRECT_PREFIX", "")
+
+# Compiled email templates kept per process (LRU keyed by template type and content hash)
+EMAIL_TEMPLATE_CACHE_SIZE = int(os.environ.get("EMAIL_TEMPLATE_CACHE_SIZE", 128))
+
+# Batched notification emails: messages per SMTP connection and per-provider (recipient domain)
+# send limits per window of EMAIL_RATE_LIMIT_WINDOW seconds ("default" applies to unlisted domains)
+EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE", 200))
+EMAIL_RATE_LIMIT_WINDOW = int(os.environ.get("EMAIL_RATE_LIMIT_WINDOW", 60))
+EMAIL_PROVIDER_RATE_LIMITS = {
+    "default": int(os.environ.get("EMAIL_RATE_LIMIT_DEFAULT", 600)),
+    "gmail.com": int(os.environ.get("EMAIL_RATE_LIMIT_GMAIL", 300)),
+}
 
-
+# Audit sink: "stream" buffers audit events in a Redis stream flushed by a beat task;
+# "sync" writes them inside the request. Durable audit calls always write synchronously.
+AUDIT_SINK = os.environ.get("AUDIT_SINK", "stream")
+AUDIT_STREAM_KEY = os.environ.get("AUDIT_STREAM_KEY", "audit:events")
+# Events that cannot be written (even one at a time) are moved here for inspection
+AUDIT_DEAD_LETTER_KEY = os.environ.get("AUDIT_DEAD_LETTER_KEY", f"{AUDIT_STREAM_KEY}:dead")
+AUDIT_FLUSH_BATCH_SIZE = int(os.environ.get("AUDIT_FLUSH_BATCH_SIZE", 500))
+
+# Audit log partitions (PostgreSQL): months created ahead, months kept before archiving, and
+# the time window auditors may query at once (bounded so queries prune partitions)
+AUDIT_PARTITION_MONTHS_AHEAD = int(os.environ.get("AUDIT_PARTITION_MONTHS_AHEAD", 3))
+AUDIT_RETENTION_MONTHS = int(os.environ.get("AUDIT_RETENTION_MONTHS", 24))
+AUDIT_QUERY_DEFAULT_DAYS = int(os.environ.get("AUDIT_QUERY_DEFAULT_DAYS", 30))
+AUDIT_QUERY_MAX_DAYS = int(os.environ.get("AUDIT_QUERY_MAX_DAYS", 366))
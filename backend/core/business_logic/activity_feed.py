@@ -0,0 +1,133 @@
+from apps.audits.models import AuditLog
+from core.business_logic.config_version import get_config_version, bump_config_version
+from core.business_logic.audit_sink import audit_event, emit_audit_events
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+import base64
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_FEED_SCOPE = "activity_feed"
+ACTIVITY_CACHE_PREFIX = "activity_feed"
+# A primeira página é a consulta mais frequente (feita logo após o login)
+ACTIVITY_CACHE_TIMEOUT = 30
+ACTIVITY_DEFAULT_LIMIT = 5
+ACTIVITY_MAX_LIMIT = 100
+
+ACTIVITY_FIELDS = ('id', 'action', 'timestamp', 'details', 'object_id')
+
+
+def audit_entry(user, action: str, description: str, content_object=None, **details) -> dict:
+    """
+    Monta o evento de auditoria com a descrição exibida no feed de atividades.
+    """
+    return audit_event(user, action, {'description': description, **details}, content_object)
+
+
+def invalidate_activity_feed():
+    """
+    Descarta as primeiras páginas em cache do feed após o commit da transação atual.
+    """
+    transaction.on_commit(lambda: bump_config_version(ACTIVITY_FEED_SCOPE))
+
+
+def record_activity(user, action: str, description: str, content_object=None, durable: bool = False, **details):
+    """
+    Registra a atividade pelo destino de auditoria (ver audit_sink). Com
+    durable=True, o AuditLog é gravado na transação atual e retornado; caso
+    contrário é gravado em lote pelo consumidor e o retorno é None.
+    """
+    logs = emit_audit_events([audit_entry(user, action, description, content_object, **details)], durable)
+    return logs[0] if logs else None
+
+
+def record_activities(entries: list, durable: bool = False) -> list:
+    """
+    Registra várias atividades (audit_entry) de uma vez.
+    """
+    return emit_audit_events(entries, durable)
+
+
+def activity_type(action: str) -> str:
+    for prefix in ("QUOTE_REQUEST", "PROPOSAL"):
+        if action.startswith(prefix):
+            return prefix
+    return action
+
+
+def serialize_activity(row: dict) -> dict:
+    """
+    Item do feed no formato já usado pelo frontend (id do objeto, tipo, descrição e data).
+    """
+    details = row['details'] or {}
+    return {
+        "id": row['object_id'],
+        "log_id": row['id'],
+        "action": row['action'],
+        "action_type": activity_type(row['action']),
+        "details": details.get('description', row['action']),
+        "timestamp": row['timestamp'],
+    }
+
+
+def encode_cursor(timestamp, pk) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{pk}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Retorna (timestamp, id) do último item da página anterior. ValueError se inválido.
+    """
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        timestamp = parse_datetime(timestamp)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor inválido.")
+    if timestamp is None:
+        raise ValueError("Cursor inválido.")
+    return timestamp, pk
+
+
+def get_activity_page(user_id=None, limit: int = ACTIVITY_DEFAULT_LIMIT, cursor: str = None) -> tuple:
+    """
+    Página do feed em uma única consulta, ordenada por (timestamp, id)
+    decrescentes. A paginação é por chave (WHERE (timestamp, id) < cursor),
+    que usa o índice composto sem percorrer as páginas anteriores como o
+    OFFSET. user_id None retorna as atividades de todos os usuários.
+    Retorna (itens, cursor da próxima página ou None).
+    """
+    queryset = AuditLog.objects.all()
+    if user_id is not None:
+        queryset = queryset.filter(user_id=user_id)
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+
+    rows = list(queryset.order_by('-timestamp', '-id').values(*ACTIVITY_FIELDS)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['timestamp'], rows[-1]['id'])
+    return [serialize_activity(row) for row in rows], next_cursor
+
+
+def get_recent_activity(user_id=None, limit: int = ACTIVITY_DEFAULT_LIMIT, cursor: str = None) -> tuple:
+    """
+    get_activity_page com a primeira página em cache por ACTIVITY_CACHE_TIMEOUT
+    segundos. A chave inclui a versão do feed, renovada a cada gravação de
+    auditoria, de modo que novas atividades aparecem imediatamente.
+    """
+    version = get_config_version(ACTIVITY_FEED_SCOPE)
+    if cursor or version is None:
+        return get_activity_page(user_id, limit, cursor)
+
+    key = f"{ACTIVITY_CACHE_PREFIX}:{version}:{user_id or 'all'}:{limit}"
+    page = cache.get(key)
+    if page is None:
+        page = get_activity_page(user_id, limit)
+        cache.set(key, page, timeout=ACTIVITY_CACHE_TIMEOUT)
+    return page
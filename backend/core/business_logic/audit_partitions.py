@@ -0,0 +1,182 @@
+from apps.audits.models import AuditLog
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db import connection, transaction
+from django.utils import timezone
+from datetime import date
+import gzip
+import re
+import tempfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Em PostgreSQL, o AuditLog é particionado por mês de timestamp (migração
+# 0007_partition_auditlog): uma partição <tabela>_yAAAAmMM por mês e uma
+# partição padrão para horários fora das partições criadas.
+AUDIT_TABLE = AuditLog._meta.db_table
+DEFAULT_PARTITION = f"{AUDIT_TABLE}_default"
+PARTITION_PATTERN = re.compile(rf"^{AUDIT_TABLE}_y(\d{{4}})m(\d{{2}})$")
+EXPORT_CHUNK_SIZE = 2000
+
+
+def partitioning_enabled() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{AUDIT_TABLE}_y{month.year}m{month.month:02d}"
+
+
+def partition_month(name: str):
+    match = PARTITION_PATTERN.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def _qn(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def _list_partitions(cursor) -> tuple:
+    """
+    Retorna (partições mensais anexadas, partições mensais já desanexadas).
+    """
+    cursor.execute(
+        "SELECT c.relname, c.relispartition FROM pg_class c "
+        "WHERE c.relkind = 'r' AND c.relname LIKE %s",
+        [f"{AUDIT_TABLE}\\_y%"],
+    )
+    attached, detached = [], []
+    for name, is_partition in cursor.fetchall():
+        if partition_month(name):
+            (attached if is_partition else detached).append(name)
+    return sorted(attached), sorted(detached)
+
+
+def _default_partition_months(cursor) -> list:
+    """
+    Meses (UTC) com registros gravados na partição padrão.
+    """
+    cursor.execute(
+        f"SELECT DISTINCT date_trunc('month', \"timestamp\" AT TIME ZONE 'UTC')::date FROM {_qn(DEFAULT_PARTITION)}"
+    )
+    return sorted(row[0] for row in cursor.fetchall())
+
+
+def _create_partition(cursor, month: date, move_default_rows: bool):
+    """
+    Cria a partição do mês. Se a partição padrão já tiver registros do mês, o
+    PostgreSQL recusaria a criação: a padrão é desanexada, a partição criada,
+    os registros do mês movidos para ela e a padrão anexada novamente, tudo na
+    mesma transação.
+    """
+    name = partition_name(month)
+    start, end = f"{month.isoformat()} 00:00:00+00", f"{add_months(month, 1).isoformat()} 00:00:00+00"
+    with transaction.atomic():
+        if move_default_rows:
+            cursor.execute(f"ALTER TABLE {_qn(AUDIT_TABLE)} DETACH PARTITION {_qn(DEFAULT_PARTITION)}")
+        cursor.execute(
+            f"CREATE TABLE {_qn(name)} PARTITION OF {_qn(AUDIT_TABLE)} FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+        if move_default_rows:
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {_qn(DEFAULT_PARTITION)} "
+                f"WHERE \"timestamp\" >= %s AND \"timestamp\" < %s RETURNING *) "
+                f"INSERT INTO {_qn(AUDIT_TABLE)} SELECT * FROM moved",
+                [start, end],
+            )
+            logger.warning(f"{cursor.rowcount} registros de auditoria movidos da partição padrão para {name}.")
+            cursor.execute(f"ALTER TABLE {_qn(AUDIT_TABLE)} ATTACH PARTITION {_qn(DEFAULT_PARTITION)} DEFAULT")
+
+
+def ensure_audit_partitions(months_ahead: int = None) -> list:
+    """
+    Cria as partições do mês atual e dos próximos months_ahead meses (UTC),
+    antes que recebam registros. Meses com registros na partição padrão (ex.:
+    execução atrasada ou horários fora das partições) também ganham a sua
+    partição, com os registros movidos, para que entrem na política de
+    retenção. Retorna as partições criadas.
+    """
+    if not partitioning_enabled():
+        return []
+    months_ahead = settings.AUDIT_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    current = timezone.now().date().replace(day=1)
+
+    created = []
+    with connection.cursor() as cursor:
+        attached, _ = _list_partitions(cursor)
+        default_months = set(_default_partition_months(cursor))
+        months = default_months | {add_months(current, offset) for offset in range(months_ahead + 1)}
+        for month in sorted(months):
+            name = partition_name(month)
+            if name in attached:
+                continue
+            try:
+                _create_partition(cursor, month, month in default_months)
+            except Exception as e:
+                logger.error(f"Não foi possível criar a partição de auditoria {name}: {e}")
+                continue
+            created.append(name)
+    if created:
+        logger.info(f"Partições de auditoria criadas: {created}")
+    return created
+
+
+def export_audit_rows(rows, file_name: str) -> str:
+    """
+    Grava as linhas (JSON, uma por linha) em um arquivo JSONL compactado com
+    gzip no storage 'audit_archive'. Retorna o nome do arquivo gravado.
+    """
+    with tempfile.TemporaryFile() as buffer:
+        with gzip.GzipFile(fileobj=buffer, mode="wb") as archive:
+            for row in rows:
+                archive.write(row.encode("utf-8"))
+                archive.write(b"\n")
+        buffer.seek(0)
+        return storages["audit_archive"].save(f"{file_name}.jsonl.gz", File(buffer))
+
+
+def _partition_rows(name: str):
+    with transaction.atomic(), connection.chunked_cursor() as cursor:
+        cursor.execute(f"SELECT row_to_json(t)::text FROM {_qn(name)} t ORDER BY t.id")
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            for (row,) in rows:
+                yield row
+
+
+def archive_audit_partitions(retention_months: int = None) -> list:
+    """
+    Política de retenção: desanexa as partições mensais anteriores aos
+    últimos retention_months meses, exporta cada uma para JSONL compactado
+    (export_audit_rows) e só então a exclui. Partições desanexadas em uma
+    execução interrompida são exportadas na seguinte. Retorna os arquivos gerados.
+    """
+    if not partitioning_enabled():
+        return []
+    retention_months = settings.AUDIT_RETENTION_MONTHS if retention_months is None else retention_months
+    cutoff = add_months(timezone.now().date().replace(day=1), -retention_months)
+
+    with connection.cursor() as cursor:
+        attached, detached = _list_partitions(cursor)
+        for name in attached:
+            if add_months(partition_month(name), 1) <= cutoff:
+                cursor.execute(f"ALTER TABLE {_qn(AUDIT_TABLE)} DETACH PARTITION {_qn(name)}")
+                detached.append(name)
+
+    archived = []
+    for name in sorted(detached):
+        file_name = export_audit_rows(_partition_rows(name), name)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {_qn(name)}")
+        logger.info(f"Partição de auditoria {name} exportada para {file_name} e removida.")
+        archived.append(file_name)
+    return archived
@@ -0,0 +1,186 @@
+from apps.audits.models import AuditLog
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError, InterfaceError, OperationalError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+import json
+import os
+import socket
+import logging
+
+logger = logging.getLogger(__name__)
+
+AUDIT_CONSUMER_GROUP = "audit-writers"
+# Eventos lidos por um consumidor que parou sem confirmá-los são reprocessados após este tempo
+AUDIT_CLAIM_IDLE_MS = 60 * 1000
+
+
+def audit_event(user, action: str, details: dict, content_object=None) -> dict:
+    """
+    Evento de auditoria serializável (campos do AuditLog), com o horário da
+    ação e o ContentType já resolvido (get_for_model usa o cache do processo).
+    """
+    content_type_id = object_id = None
+    if content_object is not None:
+        content_type_id = ContentType.objects.get_for_model(content_object).id
+        object_id = content_object.pk
+    return {
+        "user_id": getattr(user, "pk", user),
+        "action": action,
+        "details": details,
+        "content_type_id": content_type_id,
+        "object_id": object_id,
+        "timestamp": timezone.now().isoformat(),
+    }
+
+
+def event_to_log(event: dict) -> AuditLog:
+    return AuditLog(
+        user_id=event["user_id"],
+        action=event["action"],
+        details=event["details"],
+        content_type_id=event["content_type_id"],
+        object_id=event["object_id"],
+        timestamp=parse_datetime(event["timestamp"]),
+    )
+
+
+def store_audit_events(events: list) -> list:
+    """
+    Grava os eventos no AuditLog em um único bulk_create.
+    """
+    return AuditLog.objects.bulk_create([event_to_log(event) for event in events], batch_size=settings.AUDIT_FLUSH_BATCH_SIZE)
+
+
+def _append_to_stream(events: list):
+    """
+    Acrescenta os eventos ao stream Redis. Se o Redis estiver indisponível, os
+    eventos são gravados diretamente no banco para não serem perdidos.
+    """
+    try:
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        for event in events:
+            pipeline.xadd(settings.AUDIT_STREAM_KEY, {"event": json.dumps(event, default=str)})
+        pipeline.execute()
+    except Exception as e:
+        logger.warning(f"Stream de auditoria indisponível ({e}); gravando {len(events)} eventos diretamente.")
+        store_audit_events(events)
+        _invalidate_feed()
+
+
+def _invalidate_feed():
+    from core.business_logic.activity_feed import invalidate_activity_feed
+    invalidate_activity_feed()
+
+
+def emit_audit_events(events: list, durable: bool = False):
+    """
+    Envia eventos de auditoria ao destino configurado em AUDIT_SINK:
+    - "stream": acrescentados ao stream Redis após o commit da transação atual
+      (ações revertidas não são auditadas) e gravados em lote pelo consumidor
+      (flush_audit_events), fora da requisição;
+    - "sync": gravados imediatamente na transação atual.
+    Com durable=True, os eventos são sempre gravados na transação atual: a
+    auditoria é confirmada junto com a ação ou não é confirmada.
+    Retorna os AuditLog gravados (lista vazia no modo assíncrono).
+    """
+    if not events:
+        return []
+    if durable or settings.AUDIT_SINK == "sync":
+        logs = store_audit_events(events)
+        _invalidate_feed()
+        return logs
+    transaction.on_commit(lambda: _append_to_stream(events))
+    return []
+
+
+def _consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _ensure_consumer_group(connection):
+    try:
+        connection.xgroup_create(settings.AUDIT_STREAM_KEY, AUDIT_CONSUMER_GROUP, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _store_entries(connection, entries: list) -> int:
+    """
+    Grava as entradas lidas do stream em um único lote. Se o lote falhar por
+    causa de um evento inválido, grava evento a evento; os que ainda falham
+    são copiados para AUDIT_DEAD_LETTER_KEY com o erro, para não bloquear o
+    consumo. Falhas de conexão com o banco são propagadas: as entradas ficam
+    pendentes e são reprocessadas. Retorna o número de eventos gravados.
+    """
+    try:
+        with transaction.atomic():
+            store_audit_events([json.loads(fields[b"event"]) for _, fields in entries])
+        return len(entries)
+    except (OperationalError, InterfaceError):
+        raise
+    except (DatabaseError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Lote de auditoria com evento inválido ({e}); gravando os {len(entries)} eventos um a um.")
+
+    stored = 0
+    for entry_id, fields in entries:
+        try:
+            with transaction.atomic():
+                store_audit_events([json.loads(fields[b"event"])])
+        except (OperationalError, InterfaceError):
+            raise
+        except (DatabaseError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Evento de auditoria {entry_id} enviado para {settings.AUDIT_DEAD_LETTER_KEY}: {e}")
+            connection.xadd(settings.AUDIT_DEAD_LETTER_KEY, {**fields, b"entry_id": entry_id, b"error": str(e)})
+            continue
+        stored += 1
+    return stored
+
+
+def flush_audit_events(max_batches: int = 10) -> int:
+    """
+    Consumidor do stream de auditoria: lê até max_batches lotes de
+    AUDIT_FLUSH_BATCH_SIZE eventos pelo grupo de consumidores, grava cada lote
+    com bulk_create e só então confirma (XACK) e remove os eventos do stream.
+    Eventos que não podem ser gravados vão para o stream de descarte (ver
+    _store_entries) e também são confirmados.
+    Eventos de consumidores interrompidos são reassumidos (XAUTOCLAIM), de
+    modo que cada evento é gravado ao menos uma vez. Retorna o total gravado.
+    """
+    connection = get_redis_connection("default")
+    _ensure_consumer_group(connection)
+    consumer = _consumer_name()
+    batch_size = settings.AUDIT_FLUSH_BATCH_SIZE
+
+    stored = 0
+    for _ in range(max_batches):
+        _, entries, *_ = connection.xautoclaim(
+            settings.AUDIT_STREAM_KEY, AUDIT_CONSUMER_GROUP, consumer, AUDIT_CLAIM_IDLE_MS, count=batch_size
+        )
+        claimed = bool(entries)
+        if not claimed:
+            response = connection.xreadgroup(
+                AUDIT_CONSUMER_GROUP, consumer, {settings.AUDIT_STREAM_KEY: ">"}, count=batch_size
+            )
+            entries = response[0][1] if response else []
+        # Entradas já removidas do stream aparecem sem conteúdo
+        entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+        if not entries and not claimed:
+            break
+
+        if not entries:
+            continue
+        stored += _store_entries(connection, entries)
+        entry_ids = [entry_id for entry_id, _ in entries]
+        connection.xack(settings.AUDIT_STREAM_KEY, AUDIT_CONSUMER_GROUP, *entry_ids)
+        connection.xdel(settings.AUDIT_STREAM_KEY, *entry_ids)
+        if not claimed and len(entries) < batch_size:
+            break
+
+    if stored:
+        _invalidate_feed()
+        logger.info(f"{stored} eventos de auditoria gravados.")
+    return stored
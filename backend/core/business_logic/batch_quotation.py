@@ -0,0 +1,83 @@
+from apps.quotes.models import QuoteRequest, QuoteResult
+from apps.quotes.serializers import QuoteRequestSerializer
+from core.business_logic.dashboard_counters import QUOTE_REQUEST, record_status_changes
+from core.business_logic.activity_feed import audit_entry, record_activities
+from core.business_logic.quote_cache import calculate_premium_many
+from core.business_logic.rating_snapshot import get_rating_snapshot
+from django.conf import settings
+from django.db import transaction
+from decimal import Decimal
+import logging
+
+logger = logging.getLogger(__name__)
+
+CENTS = Decimal('0.01')
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+
+def price_quote_batch(payloads: list, user, chunk_size: int = None):
+    """
+    Cria e tarifa um lote de cotações contra todas as seguradoras ativas.
+
+    Os payloads são processados em blocos: cada bloco é validado, gravado com
+    bulk_create (QuoteRequest e QuoteResult) em uma única transação e tarifado
+    com o mesmo snapshot de regras, reaproveitando resultados em cache. É um
+    gerador que produz, para cada payload, um dicionário compacto com o
+    resultado, e ao final um resumo do lote.
+    """
+    chunk_size = chunk_size or settings.QUOTE_BATCH_CHUNK_SIZE
+    created_count = 0
+    error_count = 0
+
+    for offset, chunk in _chunks(payloads, chunk_size):
+        snapshot = get_rating_snapshot()
+        quote_requests = []
+        indexes = []
+
+        for position, payload in enumerate(chunk, start=offset):
+            serializer = QuoteRequestSerializer(data=payload)
+            if not serializer.is_valid():
+                error_count += 1
+                yield {"index": position, "errors": serializer.errors}
+                continue
+            quote_requests.append(QuoteRequest(
+                user=user,
+                version=1,
+                is_current_version=True,
+                **serializer.validated_data
+            ))
+            indexes.append(position)
+
+        if not quote_requests:
+            continue
+
+        with transaction.atomic():
+            QuoteRequest.objects.bulk_create(quote_requests, batch_size=chunk_size)
+            record_status_changes(QUOTE_REQUEST, [(q, None, q.status) for q in quote_requests])
+            record_activities([
+                audit_entry(user, 'QUOTE_REQUEST_CREATED', f'Nova cotação para {q.client_name}', q)
+                for q in quote_requests
+            ])
+            results_by_quote = calculate_premium_many(quote_requests, snapshot)
+            QuoteResult.objects.bulk_create(
+                [result for results in results_by_quote for result in results],
+                batch_size=chunk_size
+            )
+
+        created_count += len(quote_requests)
+        for position, quote_request, results in zip(indexes, quote_requests, results_by_quote):
+            yield {
+                "index": position,
+                "quote_request_id": quote_request.id,
+                "results": [
+                    [result.insurer_id, str(result.premium_value.quantize(CENTS))]
+                    for result in results
+                ],
+            }
+
+    logger.info(f"Lote de cotações processado: {created_count} criadas, {error_count} com erro.")
+    yield {"summary": {"received": len(payloads), "created": created_count, "errors": error_count}}
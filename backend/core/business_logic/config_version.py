@@ -0,0 +1,43 @@
+from django.core.cache import cache
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+CONFIG_VERSION_KEY_PREFIX = "config_version"
+
+
+def _version_key(scope: str) -> str:
+    return f"{CONFIG_VERSION_KEY_PREFIX}:{scope}"
+
+
+def get_config_version(scope: str):
+    """
+    Retorna o carimbo de versão atual de um grupo de configurações (ex.: 'rating').
+    O carimbo fica no cache compartilhado (Redis) para que todos os processos
+    enxerguem a mesma versão. Retorna None se o cache estiver indisponível.
+    """
+    key = _version_key(scope)
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            version = cache.get(key)
+        return version
+    except Exception as e:
+        logger.warning(f"Não foi possível ler a versão de configuração '{scope}': {e}")
+        return None
+
+
+def bump_config_version(scope: str):
+    """
+    Gera um novo carimbo de versão para o grupo de configurações, invalidando
+    os caches locais de todos os processos que dependem dele.
+    """
+    version = uuid.uuid4().hex
+    try:
+        cache.set(_version_key(scope), version, timeout=None)
+    except Exception as e:
+        logger.warning(f"Não foi possível atualizar a versão de configuração '{scope}': {e}")
+        return None
+    return version
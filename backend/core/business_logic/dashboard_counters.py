@@ -0,0 +1,190 @@
+from apps.audits.models import StatusCounter, DailyPremium
+from apps.quotes.models import QuoteRequest, Proposal
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUOTE_REQUEST = "quote_request"
+PROPOSAL = "proposal"
+COUNTED_MODELS = {QUOTE_REQUEST: QuoteRequest, PROPOSAL: Proposal}
+
+# Propostas neste status entram na receita do dashboard
+REVENUE_STATUS = "COMPLETED"
+REVENUE_WINDOW_DAYS = 30
+CENTS = Decimal('0.01')
+
+
+def adjust_status_counts(model_name: str, deltas: dict):
+    """
+    Soma os deltas ({status: delta}) aos contadores, com UPDATE ... SET count =
+    count + delta na transação atual. Contadores ausentes são criados. A ordem
+    fixa dos status evita deadlocks entre aplicações concorrentes.
+    """
+    for status, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        counter = StatusCounter.objects.filter(model_name=model_name, status=status)
+        if not counter.update(count=F('count') + delta):
+            StatusCounter.objects.bulk_create(
+                [StatusCounter(model_name=model_name, status=status)], ignore_conflicts=True
+            )
+            counter.update(count=F('count') + delta)
+
+
+def adjust_daily_premium(deltas: dict):
+    """
+    Soma os deltas ({data: (propostas, prêmio)}) aos totais diários de receita.
+    """
+    for date, (count_delta, premium_delta) in sorted(deltas.items()):
+        if not count_delta and not premium_delta:
+            continue
+        bucket = DailyPremium.objects.filter(date=date)
+        values = {'completed_count': F('completed_count') + count_delta, 'total_premium': F('total_premium') + premium_delta}
+        if not bucket.update(**values):
+            DailyPremium.objects.bulk_create([DailyPremium(date=date)], ignore_conflicts=True)
+            bucket.update(**values)
+
+
+def apply_counter_deltas(model_name: str, status_deltas: dict, premium_deltas: dict):
+    """
+    Aplica os deltas de contadores e de receita em uma transação curta própria.
+    """
+    with transaction.atomic():
+        adjust_status_counts(model_name, status_deltas)
+        if premium_deltas:
+            adjust_daily_premium(premium_deltas)
+
+
+def remember_status(instance):
+    """
+    Guarda o status com que a instância foi carregada (sinal post_init), para
+    calcular a mudança ao salvar sem consultar o banco.
+    """
+    instance._counted_status = instance.__dict__.get('status') if instance.pk is not None else None
+
+
+def counted_status(instance):
+    return getattr(instance, '_counted_status', None)
+
+
+def record_status_changes(model_name: str, changes):
+    """
+    Registra mudanças de status ([(registro, status anterior, novo status)]).
+    Status anterior None indica criação; novo status None, exclusão. Para
+    propostas, a entrada ou saída de REVENUE_STATUS atualiza a receita do dia
+    da proposta. O status registrado fica guardado na instância (ver counted_status).
+
+    Os deltas são aplicados depois do commit, para que as transações de escrita
+    não fiquem enfileiradas no bloqueio da linha compartilhada do contador
+    enquanto terminam seu trabalho. Deltas perdidos (queda do processo entre o
+    commit e a aplicação) são corrigidos por reconcile_counters.
+    """
+    deltas = Counter()
+    premium = defaultdict(lambda: [0, Decimal('0')])
+    for instance, old_status, new_status in changes:
+        instance._counted_status = new_status
+        if old_status == new_status:
+            continue
+        if old_status is not None:
+            deltas[old_status] -= 1
+        if new_status is not None:
+            deltas[new_status] += 1
+        if model_name == PROPOSAL and REVENUE_STATUS in (old_status, new_status):
+            sign = 1 if new_status == REVENUE_STATUS else -1
+            bucket = premium[timezone.localdate(instance.proposal_date or timezone.now())]
+            bucket[0] += sign
+            bucket[1] += sign * Decimal(instance.total_premium or 0)
+
+    status_deltas = {status: delta for status, delta in deltas.items() if delta}
+    premium_deltas = {date: tuple(values) for date, values in premium.items()}
+    if status_deltas or premium_deltas:
+        transaction.on_commit(lambda: apply_counter_deltas(model_name, status_deltas, premium_deltas))
+
+
+def get_dashboard_counters() -> dict:
+    """
+    Totais do dashboard lidos das tabelas de resumo (duas consultas, sem varrer
+    cotações ou propostas).
+    """
+    counts = defaultdict(dict)
+    for model_name, status, count in StatusCounter.objects.values_list('model_name', 'status', 'count'):
+        counts[model_name][status] = count
+
+    since = timezone.localdate() - timedelta(days=REVENUE_WINDOW_DAYS)
+    revenue = DailyPremium.objects.filter(date__gte=since).aggregate(total=Sum('total_premium'))['total'] or 0
+    return {
+        "totalQuotes": sum(counts[QUOTE_REQUEST].values()),
+        "pendingProposals": counts[PROPOSAL].get("PENDING", 0),
+        "completedProposals": counts[PROPOSAL].get(REVENUE_STATUS, 0),
+        "monthlyRevenue": revenue,
+    }
+
+
+def _counter_snapshot():
+    """
+    Lê os contadores gravados e os totais das tabelas de origem sem bloqueios.
+    No PostgreSQL, as leituras usam um único snapshot (REPEATABLE READ), de
+    modo que gravados e recalculados são comparáveis entre si.
+    """
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if outermost and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        stored_counts = {(name, status): count for name, status, count in
+                         StatusCounter.objects.values_list('model_name', 'status', 'count')}
+        actual_counts = {
+            model_name: dict(model.objects.values_list('status').annotate(total=Count('id')).order_by())
+            for model_name, model in COUNTED_MODELS.items()
+        }
+        stored_days = {day: (completed, premium) for day, completed, premium in
+                       DailyPremium.objects.values_list('date', 'completed_count', 'total_premium')}
+        actual_days = {
+            row['day']: (row['completed'], Decimal(row['premium'] or 0).quantize(CENTS)) for row in
+            Proposal.objects.filter(status=REVENUE_STATUS).annotate(day=TruncDate('proposal_date')).values('day')
+            .annotate(completed=Count('id'), premium=Sum('total_premium')).order_by()
+        }
+    return stored_counts, actual_counts, stored_days, actual_days
+
+
+def reconcile_counters() -> dict:
+    """
+    Recalcula os contadores e a receita diária a partir das tabelas de origem e
+    corrige divergências. O recálculo é feito sem bloqueios; as diferenças são
+    aplicadas depois como incrementos, em uma transação curta, preservando os
+    deltas gravados concorrentemente. Retorna as divergências encontradas.
+    """
+    stored_counts, actual_counts, stored_days, actual_days = _counter_snapshot()
+
+    drift = {}
+    for model_name, actual in actual_counts.items():
+        statuses = set(actual) | {status for name, status in stored_counts if name == model_name}
+        status_deltas = {}
+        for status in statuses:
+            difference = actual.get(status, 0) - stored_counts.get((model_name, status), 0)
+            if difference:
+                drift[f"{model_name}:{status}"] = difference
+                status_deltas[status] = difference
+        if status_deltas:
+            apply_counter_deltas(model_name, status_deltas, {})
+
+    premium_deltas = {}
+    for day in set(stored_days) | set(actual_days):
+        completed, premium = actual_days.get(day, (0, Decimal('0')))
+        stored_completed, stored_premium = stored_days.get(day, (0, Decimal('0')))
+        if completed != stored_completed or premium != stored_premium:
+            drift[f"premium:{day}"] = str(premium - stored_premium)
+            premium_deltas[day] = (completed - stored_completed, premium - stored_premium)
+    if premium_deltas:
+        apply_counter_deltas(PROPOSAL, {}, premium_deltas)
+
+    if drift:
+        logger.warning(f"Contadores do dashboard corrigidos: {drift}")
+    return drift
@@ -0,0 +1,168 @@
+from apps.quotes.models import EmailTemplate
+from core.business_logic.config_version import get_config_version, bump_config_version
+from django.conf import settings
+from django.template import Template, Context
+from collections import OrderedDict
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+EMAIL_TEMPLATE_CONFIG_SCOPE = "email_templates"
+
+# Templates padrão, gravados no banco na primeira utilização se não houver um ativo
+DEFAULT_EMAIL_TEMPLATES = {
+    'APPROVAL': {
+        'subject': 'Sua Proposta de Seguro foi Aprovada! - {{client_name}}',
+        'body_html': '''
+                <p>Prezado(a) {{client_name}},</p>
+                <p>Temos o prazer de informar que sua proposta de seguro, com base na cotação realizada em {{proposal_date}}, foi <strong>APROVADA</strong>!</p>
+                <p>O valor do prêmio total mensal é de <strong>{{total_premium}}</strong>.</p>
+                <p>O documento da sua proposta aprovada está anexado a este e-mail para sua referência.</p>
+                <p>Agradecemos a confiança em nossos serviços.</p>
+                <p>Atenciosamente,<br><strong>Equipe {{company_name}}</strong></p>
+                ''',
+    },
+    'REJECTION': {
+        'subject': 'Atualização sobre sua Proposta de Seguro - {{client_name}}',
+        'body_html': '''
+                <p>Prezado(a) {{client_name}},</p>
+                <p>Gostaríamos de informar que sua proposta de seguro, com base na cotação realizada em {{proposal_date}},
+                foi analisada e, no momento, não poderemos prosseguir com a emissão da apólice nos termos solicitados.</p>
+                <p>Agradecemos o seu interesse em nossos serviços e permanecemos à disposição para futuras cotações.</p>
+                <p>Atenciosamente,<br>Equipe {{company_name}}</p>
+                ''',
+    },
+}
+
+
+class CompiledEmailTemplate:
+    """
+    Assunto e corpos de um EmailTemplate já analisados pelo motor de templates do Django.
+    """
+
+    def __init__(self, template_type, subject, body_html, body_text=''):
+        self.template_type = template_type
+        self.subject = Template(subject)
+        self.body_html = Template(body_html)
+        self.body_text = Template(body_text) if body_text else None
+
+    def render(self, context: dict) -> tuple:
+        """
+        Retorna (assunto, corpo HTML, corpo texto ou None).
+        """
+        context = Context(context)
+        body_text = self.body_text.render(context) if self.body_text else None
+        return self.subject.render(context), self.body_html.render(context), body_text
+
+
+def content_hash(email_template) -> str:
+    content = '\0'.join([email_template.subject, email_template.body_html, email_template.body_text or ''])
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+_compiled = OrderedDict()   # (template_type, hash do conteúdo) -> CompiledEmailTemplate (LRU)
+_active = {}                # template_type -> CompiledEmailTemplate ativo na versão _active_version
+_active_version = None
+_lock = threading.Lock()
+
+
+def _compile(email_template) -> CompiledEmailTemplate:
+    """
+    Busca no LRU pelo tipo e hash do conteúdo; analisa o template apenas se ainda
+    não estiver compilado. Deve ser chamada com o lock adquirido.
+    """
+    key = (email_template.template_type, content_hash(email_template))
+    compiled = _compiled.get(key)
+    if compiled is not None:
+        _compiled.move_to_end(key)
+        return compiled
+
+    compiled = CompiledEmailTemplate(
+        email_template.template_type, email_template.subject, email_template.body_html, email_template.body_text
+    )
+    _compiled[key] = compiled
+    while len(_compiled) > settings.EMAIL_TEMPLATE_CACHE_SIZE:
+        _compiled.popitem(last=False)
+    return compiled
+
+
+def _load_active_template(template_type: str):
+    email_template = EmailTemplate.objects.filter(template_type=template_type, is_active=True).first()
+    if email_template:
+        return email_template
+
+    defaults = DEFAULT_EMAIL_TEMPLATES.get(template_type)
+    if defaults is None:
+        raise EmailTemplate.DoesNotExist(f"Nenhum template de e-mail ativo para {template_type}.")
+    logger.warning(f"Template de e-mail {template_type} não encontrado. Usando template padrão.")
+    email_template, _ = EmailTemplate.objects.get_or_create(
+        template_type=template_type, defaults={**defaults, 'is_active': True}
+    )
+    if not email_template.is_active:
+        # Template desativado pelo administrador: usar o padrão sem alterar o banco
+        email_template = EmailTemplate(template_type=template_type, **defaults)
+    return email_template
+
+
+def _sync_version():
+    """
+    Descarta o mapa de templates ativos quando a versão 'email_templates' mudou
+    (alteração feita por outro processo). O LRU é mantido: templates com o
+    mesmo conteúdo não são analisados novamente.
+    """
+    global _active_version
+    version = get_config_version(EMAIL_TEMPLATE_CONFIG_SCOPE)
+    if version is None or version != _active_version:
+        _active.clear()
+        _active_version = version
+
+
+def get_compiled_email_template(template_type: str) -> CompiledEmailTemplate:
+    """
+    Retorna o template ativo do tipo informado já compilado. Após o
+    aquecimento, não há consulta ao banco nem análise do template por e-mail.
+    """
+    with _lock:
+        _sync_version()
+        compiled = _active.get(template_type)
+        if compiled is not None:
+            return compiled
+
+    email_template = _load_active_template(template_type)
+    with _lock:
+        compiled = _compile(email_template)
+        _active[template_type] = compiled
+        return compiled
+
+
+def render_email(template_type: str, context: dict) -> tuple:
+    """
+    Renderiza o template ativo do tipo informado. Retorna (assunto, HTML, texto ou None).
+    """
+    return get_compiled_email_template(template_type).render(context)
+
+
+def precompile_email_templates() -> int:
+    """
+    Compila todos os templates ativos (usado na inicialização dos workers).
+    """
+    templates = list(EmailTemplate.objects.filter(is_active=True))
+    with _lock:
+        _sync_version()
+        for email_template in templates:
+            _active[email_template.template_type] = _compile(email_template)
+    logger.info(f"{len(templates)} templates de e-mail pré-compilados.")
+    return len(templates)
+
+
+def invalidate_email_templates():
+    """
+    Descarta os templates ativos do processo e publica uma nova versão para os demais.
+    """
+    global _active_version
+    with _lock:
+        _active.clear()
+        _active_version = None
+    return bump_config_version(EMAIL_TEMPLATE_CONFIG_SCOPE)
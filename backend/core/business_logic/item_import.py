@@ -0,0 +1,121 @@
+from apps.quotes.models import QuoteItem
+from django.conf import settings
+from django.db import transaction
+from decimal import Decimal, InvalidOperation
+import codecs
+import csv
+import logging
+
+logger = logging.getLogger(__name__)
+
+CSV_DELIMITER = ';'
+EXPECTED_COLUMNS = 3  # item_description, item_value, item_quantity
+MAX_REPORTED_ERRORS = 1000
+
+_item_value_field = QuoteItem._meta.get_field('item_value')
+_item_description_field = QuoteItem._meta.get_field('item_description')
+MAX_ITEM_VALUE = Decimal(10) ** (_item_value_field.max_digits - _item_value_field.decimal_places)
+VALUE_QUANTUM = Decimal(1).scaleb(-_item_value_field.decimal_places)
+
+
+def iter_lines(chunks):
+    """
+    Decodifica os blocos de bytes do upload de forma incremental (UTF-8, com ou
+    sem BOM) e produz linhas completas, sem carregar o arquivo inteiro na memória.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        # A última linha pode estar incompleta: aguardar o próximo bloco
+        pending = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        yield from lines
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def _parse_decimal(value: str) -> Decimal:
+    value = value.strip()
+    if ',' in value and '.' not in value:
+        value = value.replace(',', '.')  # Aceita vírgula como separador decimal
+    return Decimal(value)
+
+
+def parse_item_row(row: list):
+    """
+    Valida uma linha do CSV. Retorna (descrição, valor, quantidade) ou levanta
+    ValueError com a mensagem a ser reportada.
+    """
+    if len(row) != EXPECTED_COLUMNS:
+        raise ValueError(f'Formato inválido. Esperado {EXPECTED_COLUMNS} colunas, encontrado {len(row)}.')
+    description = row[0].strip()
+    if not description:
+        raise ValueError('Descrição do item em branco.')
+    if len(description) > _item_description_field.max_length:
+        raise ValueError(f'Descrição com mais de {_item_description_field.max_length} caracteres.')
+    try:
+        item_value = _parse_decimal(row[1])
+        if not item_value.is_finite():
+            raise ValueError(f"valor '{row[1]}' inválido")
+        item_value = item_value.quantize(VALUE_QUANTUM)
+        item_quantity = int(row[2].strip())
+    except (InvalidOperation, ValueError) as e:
+        raise ValueError(f'Erro de conversão de dados - {e}.')
+    if item_value <= 0 or item_quantity <= 0:
+        raise ValueError('Valor ou quantidade inválidos (devem ser maiores que zero).')
+    if item_value >= MAX_ITEM_VALUE:
+        raise ValueError('Valor do item excede o limite permitido.')
+    return description, item_value, item_quantity
+
+
+def import_quote_items(quote_request, chunks, batch_size: int = None, progress=None) -> dict:
+    """
+    Importa itens de um CSV (separado por ';', com cabeçalho) para a cotação.
+
+    O arquivo é lido em blocos, as linhas são validadas e gravadas em lotes com
+    bulk_create, tudo em uma única transação: ou todas as linhas válidas são
+    gravadas, ou nenhuma. Linhas inválidas são ignoradas e reportadas (até
+    MAX_REPORTED_ERRORS mensagens). `progress`, se informado, é chamado com o
+    número de linhas processadas após cada lote.
+    """
+    batch_size = batch_size or settings.QUOTE_ITEM_IMPORT_BATCH_SIZE
+    reader = csv.reader(iter_lines(chunks), delimiter=CSV_DELIMITER)
+    next(reader, None)  # Pula o cabeçalho
+
+    created = 0
+    error_count = 0
+    errors = []
+    processed = 0
+    batch = []
+
+    with transaction.atomic():
+        for processed, row in enumerate(reader, start=1):
+            if not any(field.strip() for field in row):
+                continue
+            try:
+                description, item_value, item_quantity = parse_item_row(row)
+            except ValueError as e:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f'Linha {reader.line_num}: {e}')
+                continue
+            batch.append(QuoteItem(
+                quote_request=quote_request,
+                item_description=description,
+                item_value=item_value,
+                item_quantity=item_quantity
+            ))
+            if len(batch) >= batch_size:
+                QuoteItem.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+                if progress:
+                    progress(processed)
+        if batch:
+            QuoteItem.objects.bulk_create(batch)
+            created += len(batch)
+
+    logger.info(f"Importação de itens da cotação {quote_request.id}: {created} criados, {error_count} linhas com erro.")
+    return {"processed": processed, "created": created, "error_count": error_count, "errors": errors}
@@ -0,0 +1,170 @@
+from apps.quotes.models import CompanyConfiguration, FranchiseConfiguration, ProposalConfiguration
+from core.business_logic.config_version import get_config_version, bump_config_version
+from reportlab.platypus import TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+import copy
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+PDF_TEMPLATE_CONFIG_SCOPE = "pdf_template"
+
+# Modelos cujas alterações invalidam o template de PDF
+PDF_TEMPLATE_MODELS = (CompanyConfiguration, ProposalConfiguration, FranchiseConfiguration)
+
+DEFAULT_FRANCHISE_TEXT = '10% com mínimo de R$ 1.000,00'
+
+
+def _label_table_style(label_font='Helvetica'):
+    # Tabelas de duas colunas: rótulo à esquerda, valor à direita
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), label_font),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('BACKGROUND', (1, 0), (1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
+
+def _header_table_style(align):
+    # Tabelas com linha de cabeçalho destacada
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), align),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
+
+class ProposalPdfTemplate:
+    """
+    Partes fixas do PDF de proposta: estilos, tabelas de estilo, parágrafos
+    estáticos (cabeçalho, títulos de seção, rodapé) e textos derivados das
+    configurações. Montado uma vez por processo; cada PDF só preenche as
+    tabelas com os dados da proposta.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        styles = getSampleStyleSheet()
+        self.title_style = ParagraphStyle(
+            'CustomTitle', parent=styles['Heading1'], fontSize=18, spaceAfter=30,
+            alignment=TA_CENTER, textColor=colors.darkblue
+        )
+        self.subtitle_style = ParagraphStyle(
+            'CustomSubtitle', parent=styles['Heading2'], fontSize=14, spaceAfter=20, textColor=colors.darkblue
+        )
+        self.normal_style = ParagraphStyle('CustomNormal', parent=styles['Normal'], fontSize=10, spaceAfter=12)
+
+        self.data_table_style = _label_table_style()
+        self.premium_table_style = _label_table_style('Helvetica-Bold')
+        self.coverage_table_style = _header_table_style('CENTER')
+        self.franchise_table_style = _header_table_style('LEFT')
+
+        self._sections = {}
+        self._header = []
+        self._footer = []
+        self.franchise_data = []
+        self.company_name = ''
+        self.payment_frequency = ''
+        self.policy_duration = ''
+
+    @classmethod
+    def load(cls, version=None) -> "ProposalPdfTemplate":
+        template = cls(version)
+        company_config = CompanyConfiguration.objects.filter(is_active=True).first()
+        if not company_config:
+            company_config = CompanyConfiguration.objects.create()
+
+        proposal_config = ProposalConfiguration.objects.filter(is_active=True).first()
+        if not proposal_config:
+            proposal_config = ProposalConfiguration.objects.create()
+
+        franchise_configs = {
+            'RCTR_C': FranchiseConfiguration.objects.filter(coverage_type__in=['RCTR_C', 'ALL'], is_active=True).first(),
+            'RC_DC': FranchiseConfiguration.objects.filter(coverage_type__in=['RC_DC', 'ALL'], is_active=True).first()
+        }
+
+        template._header = [
+            Paragraph(company_config.company_name, template.title_style),
+            Paragraph("Proposta de Seguro de Transporte de Carga", template.subtitle_style),
+            Spacer(1, 20),
+        ]
+        validity_text = f"Esta proposta tem validade de {proposal_config.validity_days} dias a partir da data de emissão."
+        template._footer = [
+            Paragraph(validity_text, template.normal_style),
+            Spacer(1, 20),
+            Paragraph(company_config.company_name, template.normal_style),
+            Paragraph(f"Contato: {company_config.contact_phone} | {company_config.contact_email}", template.normal_style),
+        ]
+        template.franchise_data = [
+            ['Tipo de Franquia:', 'Valor/Percentual'],
+            ['RCTR-C:', franchise_configs['RCTR_C'].get_formatted_text() if franchise_configs['RCTR_C'] else DEFAULT_FRANCHISE_TEXT],
+            ['RC-DC:', franchise_configs['RC_DC'].get_formatted_text() if franchise_configs['RC_DC'] else DEFAULT_FRANCHISE_TEXT]
+        ]
+        template.company_name = company_config.company_name
+        template.payment_frequency = proposal_config.payment_frequency
+        template.policy_duration = f'{proposal_config.policy_duration_months} meses'
+        logger.info(f"Template de PDF de proposta carregado (versão {version}).")
+        return template
+
+    def section(self, title: str) -> Paragraph:
+        """
+        Título de seção. Os parágrafos são analisados uma única vez e entregues
+        como cópias, pois o layout guarda estado no objeto durante o build.
+        """
+        paragraph = self._sections.get(title)
+        if paragraph is None:
+            paragraph = self._sections.setdefault(title, Paragraph(title, self.subtitle_style))
+        return copy.copy(paragraph)
+
+    def header(self) -> list:
+        return [copy.copy(flowable) for flowable in self._header]
+
+    def footer(self) -> list:
+        """
+        Validade da proposta e rodapé da empresa (sem a data de emissão).
+        """
+        return [copy.copy(flowable) for flowable in self._footer]
+
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def get_pdf_template() -> ProposalPdfTemplate:
+    """
+    Retorna o template de PDF do processo, recarregando-o apenas quando a
+    versão de configuração 'pdf_template' mudou.
+    """
+    global _template
+    version = get_config_version(PDF_TEMPLATE_CONFIG_SCOPE)
+    template = _template
+    if template is not None and version is not None and template.version == version:
+        return template
+
+    with _template_lock:
+        if _template is None or version is None or _template.version != version:
+            _template = ProposalPdfTemplate.load(version)
+        return _template
+
+
+def invalidate_pdf_template():
+    """
+    Descarta o template local e publica uma nova versão para os demais processos.
+    """
+    global _template
+    with _template_lock:
+        _template = None
+    return bump_config_version(PDF_TEMPLATE_CONFIG_SCOPE)
@@ -0,0 +1,84 @@
+from apps.quotes.models import QuoteRequest, QuoteResult, Proposal, ProposalConfiguration
+from core.business_logic.quote_cache import calculate_premium_cached
+from django.db import transaction
+from datetime import timedelta
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VALIDITY_DAYS = 30
+
+
+class ProposalGenerationError(Exception):
+    """
+    Erro de negócio ao gerar uma proposta (sem resultados, seguradora inválida etc.).
+    """
+    pass
+
+
+def ensure_quote_results(quote_request: QuoteRequest) -> list:
+    """
+    Retorna os QuoteResult da cotação, calculando-os (com cache) apenas se ainda
+    não existirem. Deve ser chamada com a cotação bloqueada (select_for_update).
+    """
+    results = list(QuoteResult.objects.filter(quote_request=quote_request).select_related('insurer'))
+    if results:
+        return results
+
+    computed = calculate_premium_cached(quote_request)
+    if not computed:
+        return []
+    QuoteResult.objects.bulk_create(computed)
+    # Recarregar para obter os valores já arredondados pelas colunas decimais
+    return list(QuoteResult.objects.filter(quote_request=quote_request).select_related('insurer'))
+
+
+def select_quote_result(results: list, insurer_id=None) -> QuoteResult:
+    """
+    Escolhe o resultado da seguradora informada ou, por padrão, o de menor prêmio.
+    """
+    if insurer_id is not None:
+        for result in results:
+            if str(result.insurer_id) == str(insurer_id):
+                return result
+        raise ProposalGenerationError("Não há resultado de cotação para a seguradora informada.")
+    return min(results, key=lambda result: (result.premium_value, result.insurer_id))
+
+
+def create_proposal(quote_request_id, insurer_id=None):
+    """
+    Gera a proposta a partir dos resultados já calculados da cotação, em uma
+    única transação com a cotação bloqueada. Cliques concorrentes são
+    serializados pelo lock: se já existir uma proposta pendente para o mesmo
+    resultado, ela é reaproveitada. Retorna (proposta, criada).
+    """
+    with transaction.atomic():
+        quote_request = QuoteRequest.objects.select_for_update().get(pk=quote_request_id)
+        results = ensure_quote_results(quote_request)
+        if not results:
+            raise ProposalGenerationError("Nenhuma seguradora ativa possui regras para esta cotação.")
+        quote_result = select_quote_result(results, insurer_id)
+
+        existing = Proposal.objects.filter(
+            quote_request=quote_request, quote_result=quote_result, status="PENDING"
+        ).first()
+        if existing:
+            return existing, False
+
+        proposal_config = ProposalConfiguration.objects.filter(is_active=True).first()
+        validity_days = proposal_config.validity_days if proposal_config else DEFAULT_VALIDITY_DAYS
+
+        proposal = Proposal.objects.create(
+            quote_request=quote_request,
+            quote_result=quote_result,
+            total_premium=quote_result.premium_value,
+            rctr_c_rate=quote_result.rctr_c_rate,
+            rc_dc_rate=quote_result.rc_dc_rate,
+            rctr_c_limit=quote_result.rctr_c_limit,
+            rc_dc_limit=quote_result.rc_dc_limit,
+            valid_until=timezone.localdate() + timedelta(days=validity_days),
+            status="PENDING"
+        )
+        logger.info(f"Proposta {proposal.id} gerada para a cotação {quote_request_id} com {quote_result.insurer.name}.")
+        return proposal, True
@@ -0,0 +1,134 @@
+from apps.quotes.models import Proposal
+from apps.tasks.events import publish_event, set_last_event, get_last_event, LAST_EVENT_TIMEOUT
+from core.business_logic.dashboard_counters import PROPOSAL, record_status_changes
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+ALL_STATUSES = tuple(status for status, _ in Proposal.STATUS_CHOICES)
+
+# Transições da proposta: nome -> (status de origem aceitos, status de destino)
+TRANSITIONS = {
+    "approve": (("PENDING",), "PROCESSING"),
+    "reject": (("PENDING",), "REJECTING"),
+    "confirm_rejection": (("REJECTING",), "REJECTED"),
+    "revert_rejection": (("REJECTING",), "PENDING"),
+    "generate_pdf": (tuple(s for s in ALL_STATUSES if s not in ("PROCESSING", "COMPLETED")), "PROCESSING"),
+    "complete": (("PROCESSING",), "COMPLETED"),
+}
+
+# Status finais: o fluxo de eventos da proposta é encerrado ao recebê-los
+FINAL_STATUSES = ("COMPLETED", "REJECTED")
+
+STATUS_FIELDS = ('id', 'status', 'pdf_file', 'celery_task_id')
+OWNER_KEY_PREFIX = "proposal-owner"
+
+
+def proposal_channel(proposal_id) -> str:
+    return f"proposal-status:{proposal_id}"
+
+
+def _owner_key(proposal_id) -> str:
+    return f"{OWNER_KEY_PREFIX}:{proposal_id}"
+
+
+def status_payload(proposal_id, status, pdf_file=None, celery_task_id=None) -> dict:
+    return {"proposal_id": int(proposal_id), "status": status, "pdf_file": pdf_file, "celery_task_id": celery_task_id}
+
+
+def publish_status(proposal_id, status, pdf_file=None, celery_task_id=None):
+    """
+    Publica o status no canal da proposta após o commit da transação atual,
+    para que assinantes e o cache nunca vejam um status revertido.
+    """
+    payload = status_payload(proposal_id, status, pdf_file, celery_task_id)
+    transaction.on_commit(lambda: publish_event(proposal_channel(proposal_id), payload))
+
+
+def publish_statuses(queryset):
+    """
+    Publica o status atual das propostas do queryset (uma consulta).
+    """
+    for row in queryset.values_list(*STATUS_FIELDS):
+        publish_status(*row)
+
+
+def cache_status(proposal: Proposal) -> dict:
+    """
+    Guarda no cache o status lido do banco e o dono da proposta, usados pela
+    consulta de status sem acesso ao banco.
+    """
+    payload = status_payload(proposal.id, proposal.status, proposal.pdf_file, proposal.celery_task_id)
+    set_last_event(proposal_channel(proposal.id), payload)
+    cache.set(_owner_key(proposal.id), proposal.quote_request.user_id, timeout=LAST_EVENT_TIMEOUT)
+    return payload
+
+
+def get_cached_status(proposal_id):
+    """
+    Retorna (último status publicado, ID do dono) ou None quando ausentes do cache.
+    """
+    payload = get_last_event(proposal_channel(proposal_id))
+    owner_id = cache.get(_owner_key(proposal_id))
+    if payload is None or owner_id is None:
+        return None
+    return payload, owner_id
+
+
+def transition(proposal: Proposal, name: str, **fields) -> bool:
+    """
+    Aplica a transição em um único UPDATE ... WHERE status = <status lido>,
+    junto com os campos extras informados, e atualiza os contadores do
+    dashboard na mesma transação. Retorna True se esta chamada venceu; só o
+    vencedor deve enfileirar trabalho e o novo status é publicado no canal da
+    proposta. A instância é atualizada com o novo status ou, se a transição
+    perdeu, com o status atual do banco.
+    """
+    sources, target = TRANSITIONS[name]
+    expected = proposal.status
+    fields.setdefault('updated_at', timezone.now())
+    with transaction.atomic():
+        won = expected in sources and Proposal.objects.filter(
+            pk=proposal.pk, status=expected
+        ).update(status=target, **fields) == 1
+        if won:
+            proposal.status = target
+            for field, value in fields.items():
+                setattr(proposal, field, value)
+            record_status_changes(PROPOSAL, [(proposal, expected, target)])
+            publish_status(proposal.pk, target, proposal.pdf_file, proposal.celery_task_id)
+    if not won:
+        current = Proposal.objects.filter(pk=proposal.pk).values_list('status', flat=True).first()
+        logger.info(f"Transição '{name}' da proposta {proposal.pk} ignorada (status atual: {current}).")
+        proposal.status = current
+    return won
+
+
+def bulk_transition(proposal_ids, name: str, **fields) -> list:
+    """
+    Aplica a transição a várias propostas: bloqueia as que estão em um dos
+    status de origem, altera todas em um único UPDATE, atualiza os contadores
+    do dashboard e publica o status das que mudaram. Propostas em outros
+    status não são tocadas. Retorna os IDs das propostas alteradas.
+    """
+    sources, target = TRANSITIONS[name]
+    fields.setdefault('updated_at', timezone.now())
+    with transaction.atomic():
+        # A receita do dashboard depende do prêmio e da data de cada proposta
+        proposals = list(
+            Proposal.objects.filter(id__in=list(proposal_ids), status__in=sources)
+            .select_for_update().only('id', 'status', 'proposal_date', 'total_premium')
+        )
+        changed = [proposal.id for proposal in proposals]
+        if changed:
+            Proposal.objects.filter(id__in=changed).update(status=target, **fields)
+            record_status_changes(PROPOSAL, [(proposal, proposal.status, target) for proposal in proposals])
+            publish_statuses(Proposal.objects.filter(id__in=changed))
+    return changed
+
+
+def can_transition(proposal: Proposal, name: str) -> bool:
+    return proposal.status in TRANSITIONS[name][0]
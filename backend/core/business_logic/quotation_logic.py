@@ -1,146 +1,237 @@
 
-from apps.quotes.models import (
-    QuoteRequest, QuoteResult, Proposal, RiskCity,
-    SystemParameter, SpecialCondition, RiskMultiplierConfiguration
-)
-from apps.insurers.models import InsurerBusinessRule, Insurer, MerchandiseType
-from decimal import Decimal
+from apps.quotes.models import QuoteRequest, QuoteResult
+from apps.insurers.models import InsurerBusinessRule, Insurer
+from core.business_logic.rating_snapshot import RatingSnapshot, get_rating_snapshot
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.db import connections
+from decimal import Decimal, ROUND_HALF_UP
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
-def calculate_premium(quote_request: QuoteRequest) -> list:
+
+
+class IncompletePricingError(Exception):
+    """
+    Uma ou mais seguradoras falharam na tarifação; os resultados das demais foram gravados.
+    """
+    pass
+
+
+_rating_executor = None
+_rating_executor_lock = threading.Lock()
+
+def calculate_premium(quote_request: QuoteRequest, snapshot: RatingSnapshot = None) -> list:
     """
     Lógica de negócio pura para calcular o prêmio do seguro para múltiplas seguradoras.
     Retorna uma lista de QuoteResult para comparação.
+    Todas as tabelas de tarifação são lidas do snapshot em memória, de modo que
+    o cálculo não executa consultas ao banco enquanto o snapshot estiver válido.
+    Com QUOTATION_RATING_MAX_WORKERS > 0 as seguradoras são tarifadas em paralelo.
+    """
+    return calculate_premium_with_status(quote_request, snapshot)[0]
+
+def calculate_premium_with_status(quote_request: QuoteRequest, snapshot: RatingSnapshot = None) -> tuple:
     """
+    Como calculate_premium, mas retorna (resultados, completo). completo é
+    False quando alguma seguradora falhou ou excedeu o prazo: o conjunto é
+    parcial e não deve ser reaproveitado (ver quote_cache).
+    """
+    snapshot = snapshot or get_rating_snapshot()
+    if settings.QUOTATION_RATING_MAX_WORKERS > 0 and len(snapshot.insurers) > 1:
+        return calculate_premium_concurrent(quote_request, snapshot)
+
     results = []
+    complete = True
+    # A rota é a mesma para todas as seguradoras: verificar o risco uma única vez
+    high_risk_route = is_high_risk_route(quote_request.origin, quote_request.destination, snapshot)
     
-    # Buscar todas as seguradoras ativas
-    insurers = Insurer.objects.filter(is_active=True)
-    
-    for insurer in insurers:
+    # Seguradoras ativas já carregadas no snapshot
+    for insurer in snapshot.insurers:
         try:
-            result = calculate_premium_for_insurer(quote_request, insurer)
+            result = calculate_premium_for_insurer(quote_request, insurer, snapshot, high_risk_route)
             if result:
                 results.append(result)
         except Exception as e:
             logger.error(f"Erro ao calcular prêmio para {insurer.name}: {e}")
+            complete = False
             continue
     
-    return results
+    return results, complete
 
-def calculate_premium_for_insurer(quote_request: QuoteRequest, insurer: Insurer) -> QuoteResult:
+def _get_rating_executor() -> ThreadPoolExecutor:
+    global _rating_executor
+    if _rating_executor is None:
+        with _rating_executor_lock:
+            if _rating_executor is None:
+                _rating_executor = ThreadPoolExecutor(
+                    max_workers=max(settings.QUOTATION_RATING_MAX_WORKERS, 1),
+                    thread_name_prefix="rating"
+                )
+    return _rating_executor
+
+def _rate_insurer(quote_request: QuoteRequest, insurer: Insurer, snapshot: RatingSnapshot, high_risk_route: bool) -> tuple:
     """
-    Calcula o prêmio para uma seguradora específica
+    Retorna (resultado ou None, sucesso).
     """
     try:
-        merchandise_type = MerchandiseType.objects.get(name=quote_request.cargo_type)
-        rule = InsurerBusinessRule.objects.get(
-            insurer=insurer,
-            merchandise_type=merchandise_type,
-            is_active=True
-        )
-        
-        # Taxas base das regras de negócio
-        rctr_c_rate = rule.rctr_c_rate
-        rc_dc_rate = rule.rc_dc_rate
-        
-        # Aplicar fatores de agravo/desconto baseados no nível de risco da mercadoria
-        try:
-            risk_multiplier_config = RiskMultiplierConfiguration.objects.get(
-                risk_level=merchandise_type.risk_level,
-                is_active=True
-            )
-            multiplier = risk_multiplier_config.multiplier
-        except RiskMultiplierConfiguration.DoesNotExist:
-            logger.warning(f"Configuração de multiplicador não encontrada para {merchandise_type.risk_level}. Usando multiplicador padrão.")
-            multiplier = rule.high_risk_multiplier if merchandise_type.risk_level in ['HIGH', 'EXTREME'] else Decimal('1.0')
-
-        if merchandise_type.risk_level != 'LOW':
-            rctr_c_rate *= multiplier
-            rc_dc_rate *= multiplier
-
-        # Aplicar desconto por volume, se aplicável
-        if quote_request.monthly_revenue >= rule.volume_discount_threshold and rule.volume_discount_threshold > 0:
-            rctr_c_rate *= (Decimal('1') - rule.volume_discount_rate / Decimal('100'))
-            rc_dc_rate *= (Decimal('1') - rule.volume_discount_rate / Decimal('100'))
-
-        # Calcular limites oferecidos (baseado nos limites solicitados e capacidade da seguradora)
-        # Usar os limites máximos da seguradora, se definidos
-        rctr_c_limit = min(quote_request.general_lmg, insurer.max_rctr_c_limit)
-        rc_dc_limit = min(quote_request.general_lmg, insurer.max_rc_dc_limit)
-        
-        # Calcular prêmio mensal
-        monthly_premium = (quote_request.monthly_revenue * rctr_c_rate / 100) + \
-                         (quote_request.monthly_revenue * rc_dc_rate / 100)
-        
-        # Aplicar prêmio mínimo da seguradora
-        if monthly_premium < insurer.minimum_premium:
-            monthly_premium = insurer.minimum_premium
-        
-        # Criar resultado da cotação
-        quote_result = QuoteResult(
-            quote_request=quote_request,
-            insurer=insurer,
-            rctr_c_rate=rctr_c_rate,
-            rc_dc_rate=rc_dc_rate,
-            rctr_c_limit=rctr_c_limit,
-            rc_dc_limit=rc_dc_limit,
-            premium_value=monthly_premium,
-            observations=get_special_conditions(insurer, quote_request, rule)
-        )
-        
-        return quote_result
-        
-    except (InsurerBusinessRule.DoesNotExist, MerchandiseType.DoesNotExist):
-        logger.warning(f"Regra de negócio ou tipo de mercadoria não encontrado para {insurer.name} - {quote_request.cargo_type}")
-        return None
+        return calculate_premium_for_insurer(quote_request, insurer, snapshot, high_risk_route), True
     except Exception as e:
-        logger.error(f"Erro no cálculo para {insurer.name}: {e}")
-        return None
+        logger.error(f"Erro ao calcular prêmio para {insurer.name}: {e}")
+        return None, False
+    finally:
+        # Conexões abertas por esta thread não devem ficar presas ao pool
+        connections.close_all()
+
+def calculate_premium_concurrent(quote_request: QuoteRequest, snapshot: RatingSnapshot = None, deadline: float = None) -> tuple:
+    """
+    Tarifa as seguradoras em paralelo em um pool limitado de threads
+    (QUOTATION_RATING_MAX_WORKERS), mantendo o isolamento de erros por seguradora.
+    `deadline` (QUOTATION_RATING_DEADLINE por padrão) é o prazo total, em
+    segundos, para todas as seguradoras. As que não terminarem no prazo ficam
+    de fora; as que ainda não começaram são canceladas, mas as que já estão em
+    execução continuam no pool até terminar e seu resultado é descartado.
+    Retorna (resultados na mesma ordem de calculate_premium, completo).
+    """
+    snapshot = snapshot or get_rating_snapshot()
+    deadline = settings.QUOTATION_RATING_DEADLINE if deadline is None else deadline
+    high_risk_route = is_high_risk_route(quote_request.origin, quote_request.destination, snapshot)
+
+    executor = _get_rating_executor()
+    futures = [
+        (insurer, executor.submit(_rate_insurer, quote_request, insurer, snapshot, high_risk_route))
+        for insurer in snapshot.insurers
+    ]
+    done, not_done = wait([future for _, future in futures], timeout=deadline)
+
+    results = []
+    complete = True
+    for insurer, future in futures:
+        if future in not_done:
+            future.cancel()
+            logger.warning(f"Prazo de {deadline}s excedido ao calcular prêmio para {insurer.name}. Seguradora ignorada.")
+            complete = False
+            continue
+        result, succeeded = future.result()
+        complete = complete and succeeded
+        if result:
+            results.append(result)
+    return results, complete
 
-def is_high_risk_route(origin: str, destination: str) -> bool:
+def calculate_premium_for_insurer(quote_request: QuoteRequest, insurer: Insurer, snapshot: RatingSnapshot = None,
+                                  high_risk_route: bool = None) -> QuoteResult:
     """
-    Verifica se a rota é considerada de alto risco (exemplo simplificado)
+    Calcula o prêmio para uma seguradora específica. Retorna None quando a
+    seguradora não se aplica (sem regra para o tipo de mercadoria ou regra
+    incompleta); erros no cálculo são propagados para que o chamador marque
+    o conjunto como incompleto (ver calculate_premium_with_status).
     """
-    high_risk_cities = RiskCity.objects.filter(is_active=True).values_list('name', flat=True)
+    snapshot = snapshot or get_rating_snapshot()
+    merchandise_type = snapshot.get_merchandise_type(quote_request.cargo_type)
+    rule = snapshot.get_rule(insurer, merchandise_type)
+    if rule is None:
+        logger.warning(f"Regra de negócio ou tipo de mercadoria não encontrado para {insurer.name} - {quote_request.cargo_type}")
+        return None
+    if rule.volume_discount_threshold is None:
+        logger.warning(f"Regra de {insurer.name} - {quote_request.cargo_type} sem limite de desconto por volume; ignorada.")
+        return None
+    
+    # Taxas base das regras de negócio
+    rctr_c_rate = rule.rctr_c_rate
+    rc_dc_rate = rule.rc_dc_rate
+    
+    # Aplicar fatores de agravo/desconto baseados no nível de risco da mercadoria
+    multiplier = snapshot.risk_multipliers.get(merchandise_type.risk_level)
+    if multiplier is None:
+        logger.warning(f"Configuração de multiplicador não encontrada para {merchandise_type.risk_level}. Usando multiplicador padrão.")
+        multiplier = rule.high_risk_multiplier if merchandise_type.risk_level in ['HIGH', 'EXTREME'] else Decimal('1.0')
+
+    if merchandise_type.risk_level != 'LOW':
+        rctr_c_rate *= multiplier
+        rc_dc_rate *= multiplier
+
+    # Aplicar desconto por volume, se aplicável
+    if quote_request.monthly_revenue >= rule.volume_discount_threshold and rule.volume_discount_threshold > 0:
+        rctr_c_rate *= (Decimal('1') - rule.volume_discount_rate / Decimal('100'))
+        rc_dc_rate *= (Decimal('1') - rule.volume_discount_rate / Decimal('100'))
+
+    # Calcular limites oferecidos (baseado nos limites solicitados e capacidade da seguradora)
+    # Usar os limites máximos da seguradora, se definidos
+    rctr_c_limit = min(quote_request.general_lmg, insurer.max_rctr_c_limit)
+    rc_dc_limit = min(quote_request.general_lmg, insurer.max_rc_dc_limit)
+    
+    # Calcular prêmio mensal
+    monthly_premium = (quote_request.monthly_revenue * rctr_c_rate / 100) + \
+                     (quote_request.monthly_revenue * rc_dc_rate / 100)
+    
+    # Aplicar prêmio mínimo da seguradora
+    if monthly_premium < insurer.minimum_premium:
+        monthly_premium = insurer.minimum_premium
+
+    # Arredondar nas casas das colunas com ROUND_HALF_UP, como o motor vetorizado,
+    # em vez de depender do arredondamento aplicado pelo banco ao gravar
+    monthly_premium = monthly_premium.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    rctr_c_rate = rctr_c_rate.quantize(Decimal('0.0001'), rounding=ROUND_HALF_UP)
+    rc_dc_rate = rc_dc_rate.quantize(Decimal('0.0001'), rounding=ROUND_HALF_UP)
     
-    for city in high_risk_cities:
-        if city.lower() in origin.lower() or city.lower() in destination.lower():
-            return True
+    # Criar resultado da cotação
+    quote_result = QuoteResult(
+        quote_request=quote_request,
+        insurer=insurer,
+        rctr_c_rate=rctr_c_rate,
+        rc_dc_rate=rc_dc_rate,
+        rctr_c_limit=rctr_c_limit,
+        rc_dc_limit=rc_dc_limit,
+        premium_value=monthly_premium,
+        observations=get_special_conditions(insurer, quote_request, rule, snapshot, high_risk_route)
+    )
     
-    return False
+    return quote_result
 
-def get_special_conditions(insurer: Insurer, quote_request: QuoteRequest, rule: InsurerBusinessRule) -> str:
+def is_high_risk_route(origin: str, destination: str, snapshot: RatingSnapshot = None) -> bool:
+    """
+    Verifica se a origem ou o destino contém alguma cidade de risco ativa.
+    A comparação ignora acentos e caixa e considera palavras inteiras.
+    """
+    snapshot = snapshot or get_rating_snapshot()
+    return snapshot.is_high_risk_route(origin, destination)
+
+def get_special_conditions(insurer: Insurer, quote_request: QuoteRequest, rule: InsurerBusinessRule,
+                           snapshot: RatingSnapshot = None, high_risk_route: bool = None) -> str:
     """
     Retorna condições especiais baseadas na seguradora, características da operação e regras de negócio.
     """
+    snapshot = snapshot or get_rating_snapshot()
     conditions = []
     
     if rule.observations:
         conditions.append(rule.observations)
 
-    if is_high_risk_route(quote_request.origin, quote_request.destination):
-        try:
-            high_risk_condition = SpecialCondition.objects.get(code='HIGH_RISK_OPERATION', is_active=True)
-            conditions.append(high_risk_condition.description)
-        except SpecialCondition.DoesNotExist:
+    if high_risk_route is None:
+        high_risk_route = is_high_risk_route(quote_request.origin, quote_request.destination, snapshot)
+
+    if high_risk_route:
+        high_risk_condition = snapshot.special_conditions.get('HIGH_RISK_OPERATION')
+        if high_risk_condition is not None:
+            conditions.append(high_risk_condition)
+        else:
             logger.warning("Condição especial 'HIGH_RISK_OPERATION' não encontrada ou inativa.")
 
-    try:
-        premium_client_threshold = Decimal(SystemParameter.objects.get(key='PREMIUM_CLIENT_MONTHLY_REVENUE_THRESHOLD').value)
-        if quote_request.monthly_revenue > premium_client_threshold:
-            try:
-                premium_client_condition = SpecialCondition.objects.get(code='PREMIUM_CLIENT_SPECIAL_CONDITIONS', is_active=True)
-                conditions.append(premium_client_condition.description)
-            except SpecialCondition.DoesNotExist:
-                logger.warning("Condição especial 'PREMIUM_CLIENT_SPECIAL_CONDITIONS' não encontrada ou inativa.")
-    except SystemParameter.DoesNotExist:
+    threshold_value = snapshot.system_parameters.get('PREMIUM_CLIENT_MONTHLY_REVENUE_THRESHOLD')
+    if threshold_value is None:
         logger.warning("Parâmetro de sistema 'PREMIUM_CLIENT_MONTHLY_REVENUE_THRESHOLD' não encontrado.")
-    except Exception as e:
-        logger.error(f"Erro ao obter ou converter parâmetro 'PREMIUM_CLIENT_MONTHLY_REVENUE_THRESHOLD': {e}")
+    else:
+        try:
+            premium_client_threshold = Decimal(threshold_value)
+            if quote_request.monthly_revenue > premium_client_threshold:
+                premium_client_condition = snapshot.special_conditions.get('PREMIUM_CLIENT_SPECIAL_CONDITIONS')
+                if premium_client_condition is not None:
+                    conditions.append(premium_client_condition)
+                else:
+                    logger.warning("Condição especial 'PREMIUM_CLIENT_SPECIAL_CONDITIONS' não encontrada ou inativa.")
+        except Exception as e:
+            logger.error(f"Erro ao obter ou converter parâmetro 'PREMIUM_CLIENT_MONTHLY_REVENUE_THRESHOLD': {e}")
     
     return "; ".join(conditions)
-
-
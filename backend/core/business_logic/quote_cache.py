@@ -0,0 +1,166 @@
+from apps.quotes.models import QuoteRequest, QuoteResult
+from core.business_logic.quotation_logic import calculate_premium, calculate_premium_with_status
+from core.business_logic.rating_snapshot import RatingSnapshot, get_rating_snapshot
+from django.conf import settings
+from django.core.cache import cache
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUOTE_CACHE_PREFIX = "quote_results"
+QUOTE_CACHE_HITS_KEY = f"{QUOTE_CACHE_PREFIX}:stats:hits"
+QUOTE_CACHE_MISSES_KEY = f"{QUOTE_CACHE_PREFIX}:stats:misses"
+
+# Campos de QuoteResult guardados no cache, na ordem da tupla serializada
+_RESULT_FIELDS = ('insurer_id', 'rctr_c_rate', 'rc_dc_rate', 'rctr_c_limit', 'rc_dc_limit', 'premium_value', 'observations')
+
+
+def pricing_cache_key(quote_request: QuoteRequest, snapshot: RatingSnapshot) -> str:
+    """
+    Chave endereçada por conteúdo: hash dos campos que afetam o preço mais a
+    versão da configuração de tarifação. Alterações cosméticas (contato,
+    endereço, nome do cliente) geram a mesma chave.
+    """
+    parts = [
+        snapshot.version,
+        quote_request.cargo_type,
+        f"{quote_request.monthly_revenue:.2f}",
+        f"{quote_request.general_lmg:.2f}",
+        snapshot.route_matcher.matches(quote_request.origin),
+        snapshot.route_matcher.matches(quote_request.destination),
+    ]
+    digest = hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+    return f"{QUOTE_CACHE_PREFIX}:{digest}"
+
+
+def _serialize(results: list) -> list:
+    return [tuple(getattr(result, field) for field in _RESULT_FIELDS) for result in results]
+
+
+def _restore(rows: list, quote_request: QuoteRequest, snapshot: RatingSnapshot) -> list:
+    insurers = {insurer.id: insurer for insurer in snapshot.insurers}
+    results = []
+    for row in rows:
+        values = dict(zip(_RESULT_FIELDS, row))
+        insurer = insurers.get(values.pop('insurer_id'))
+        if insurer is None:
+            continue
+        results.append(QuoteResult(quote_request=quote_request, insurer=insurer, **values))
+    return results
+
+
+def _record(key: str, count: int):
+    if not count:
+        return
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        cache.add(key, count, timeout=None)
+    except Exception as e:
+        logger.warning(f"Não foi possível registrar métrica do cache de cotações: {e}")
+
+
+def calculate_premium_many(quote_requests: list, snapshot: RatingSnapshot = None) -> list:
+    """
+    Tarifa várias cotações reaproveitando conjuntos de resultados já calculados.
+    Faz uma única leitura (get_many) e uma única escrita (set_many) no cache;
+    apenas as cotações sem resultado em cache passam pela tarifação. Conjuntos
+    incompletos (seguradora com falha ou fora do prazo) não são armazenados.
+    Retorna uma lista de listas de QuoteResult (não salvos), na ordem da entrada.
+    """
+    snapshot = snapshot or get_rating_snapshot()
+    if snapshot.version is None:
+        # Sem versão de configuração não é seguro reaproveitar resultados
+        return [calculate_premium(quote_request, snapshot) for quote_request in quote_requests]
+
+    keys = [pricing_cache_key(quote_request, snapshot) for quote_request in quote_requests]
+    try:
+        cached = cache.get_many(set(keys))
+    except Exception as e:
+        logger.warning(f"Cache de cotações indisponível: {e}")
+        cached = {}
+
+    computed = {}
+    all_results = []
+    hits = 0
+    for quote_request, key in zip(quote_requests, keys):
+        rows = cached.get(key, computed.get(key))
+        if rows is not None:
+            hits += 1
+            all_results.append(_restore(rows, quote_request, snapshot))
+            continue
+        results, complete = calculate_premium_with_status(quote_request, snapshot)
+        if complete:
+            computed[key] = _serialize(results)
+        else:
+            # Conjunto parcial (falha ou prazo excedido): não reaproveitar
+            logger.warning(f"Resultados incompletos para a cotação {quote_request.pk}; não armazenados no cache.")
+        all_results.append(results)
+
+    if computed:
+        try:
+            cache.set_many(computed, timeout=settings.QUOTE_RESULT_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar resultados no cache de cotações: {e}")
+
+    _record(QUOTE_CACHE_HITS_KEY, hits)
+    _record(QUOTE_CACHE_MISSES_KEY, len(quote_requests) - hits)
+    return all_results
+
+
+def calculate_premium_cached(quote_request: QuoteRequest, snapshot: RatingSnapshot = None) -> list:
+    """
+    Versão com cache de calculate_premium para uma única cotação.
+    """
+    return calculate_premium_many([quote_request], snapshot)[0]
+
+
+def get_cached_premium(quote_request: QuoteRequest, snapshot: RatingSnapshot):
+    """
+    Resultados em cache da cotação (QuoteResult não salvos) ou None, para quem
+    tarifa por conta própria (ex.: com progresso por seguradora). Registra o
+    acerto ou erro nas métricas do cache.
+    """
+    if snapshot.version is None:
+        return None
+    try:
+        rows = cache.get(pricing_cache_key(quote_request, snapshot))
+    except Exception as e:
+        logger.warning(f"Cache de cotações indisponível: {e}")
+        rows = None
+    _record(QUOTE_CACHE_HITS_KEY if rows is not None else QUOTE_CACHE_MISSES_KEY, 1)
+    return None if rows is None else _restore(rows, quote_request, snapshot)
+
+
+def cache_premium(quote_request: QuoteRequest, results: list, snapshot: RatingSnapshot):
+    """
+    Armazena o conjunto completo de resultados calculado fora de calculate_premium_many.
+    """
+    if snapshot.version is None:
+        return
+    try:
+        cache.set(pricing_cache_key(quote_request, snapshot), _serialize(results), timeout=settings.QUOTE_RESULT_CACHE_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar resultados no cache de cotações: {e}")
+
+
+def get_quote_cache_stats() -> dict:
+    """
+    Retorna as métricas de acerto/erro acumuladas do cache de cotações (zeradas
+    se o cache estiver indisponível).
+    """
+    try:
+        values = cache.get_many([QUOTE_CACHE_HITS_KEY, QUOTE_CACHE_MISSES_KEY])
+    except Exception as e:
+        logger.warning(f"Não foi possível ler as métricas do cache de cotações: {e}")
+        values = {}
+    hits = values.get(QUOTE_CACHE_HITS_KEY, 0)
+    misses = values.get(QUOTE_CACHE_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else 0.0,
+    }
@@ -0,0 +1,100 @@
+from apps.quotes.models import RiskCity, SystemParameter, SpecialCondition, RiskMultiplierConfiguration
+from apps.insurers.models import InsurerBusinessRule, Insurer, MerchandiseType
+from core.business_logic.config_version import get_config_version, bump_config_version
+from core.business_logic.route_matcher import RouteMatcher
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+RATING_CONFIG_SCOPE = "rating"
+
+# Modelos cujas alterações invalidam o snapshot de tarifação
+RATING_MODELS = (
+    Insurer, MerchandiseType, InsurerBusinessRule, RiskMultiplierConfiguration,
+    RiskCity, SpecialCondition, SystemParameter,
+)
+
+
+class RatingSnapshot:
+    """
+    Fotografia em memória de todas as tabelas usadas no cálculo do prêmio.
+    Uma vez carregada, permite tarifar uma cotação contra todas as seguradoras
+    sem nenhuma consulta ao banco de dados.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        self.insurers = []
+        self.merchandise_types = {}
+        self.rules = {}
+        self.risk_multipliers = {}
+        self.route_matcher = RouteMatcher([])
+        self.special_conditions = {}
+        self.system_parameters = {}
+
+    @classmethod
+    def load(cls, version=None) -> "RatingSnapshot":
+        snapshot = cls(version)
+        snapshot.insurers = list(Insurer.objects.filter(is_active=True).order_by('id'))
+        snapshot.merchandise_types = {m.name: m for m in MerchandiseType.objects.all()}
+        snapshot.rules = {
+            (rule.insurer_id, rule.merchandise_type_id): rule
+            for rule in InsurerBusinessRule.objects.filter(is_active=True)
+        }
+        snapshot.risk_multipliers = dict(
+            RiskMultiplierConfiguration.objects.filter(is_active=True).values_list('risk_level', 'multiplier')
+        )
+        snapshot.route_matcher = RouteMatcher(RiskCity.objects.filter(is_active=True).values_list('name', flat=True))
+        snapshot.special_conditions = dict(
+            SpecialCondition.objects.filter(is_active=True).values_list('code', 'description')
+        )
+        snapshot.system_parameters = dict(SystemParameter.objects.values_list('key', 'value'))
+        logger.info(
+            f"Snapshot de tarifação carregado (versão {version}): {len(snapshot.insurers)} seguradoras, "
+            f"{len(snapshot.rules)} regras de negócio."
+        )
+        return snapshot
+
+    def get_merchandise_type(self, name: str):
+        return self.merchandise_types.get(name)
+
+    def get_rule(self, insurer: Insurer, merchandise_type: MerchandiseType):
+        if merchandise_type is None:
+            return None
+        return self.rules.get((insurer.id, merchandise_type.id))
+
+    def is_high_risk_route(self, origin: str, destination: str) -> bool:
+        return self.route_matcher.matches(origin) or self.route_matcher.matches(destination)
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_rating_snapshot() -> RatingSnapshot:
+    """
+    Retorna o snapshot de tarifação do processo, recarregando-o apenas quando a
+    versão de configuração 'rating' mudou. Se o cache estiver indisponível, o
+    snapshot é recarregado a cada chamada (mesmo custo do cálculo sem snapshot).
+    """
+    global _snapshot
+    version = get_config_version(RATING_CONFIG_SCOPE)
+    snapshot = _snapshot
+    if snapshot is not None and version is not None and snapshot.version == version:
+        return snapshot
+
+    with _snapshot_lock:
+        if _snapshot is None or version is None or _snapshot.version != version:
+            _snapshot = RatingSnapshot.load(version)
+        return _snapshot
+
+
+def invalidate_rating_snapshot():
+    """
+    Descarta o snapshot local e publica uma nova versão para os demais processos.
+    """
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+    return bump_config_version(RATING_CONFIG_SCOPE)
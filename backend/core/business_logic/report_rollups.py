@@ -0,0 +1,179 @@
+from apps.audits.models import DailyQuoteRollup, DailyProposalRollup, RollupWatermark, RollupDirtyDay
+from apps.quotes.models import QuoteRequest, Proposal
+from core.business_logic.dashboard_counters import QUOTE_REQUEST, PROPOSAL
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from functools import reduce
+import operator
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_BATCH_SIZE = 1000
+
+# Margem sobre a última agregação: transações que gravaram updated_at antes
+# dela, mas só confirmaram depois, ainda são encontradas
+ROLLUP_OVERLAP = timedelta(minutes=10)
+
+# Agrupamentos aceitos pelos relatórios: parâmetro -> campo (ou expressão) da tabela agregada.
+# A seguradora mantém o nome de campo usado pelos relatórios antes da agregação.
+QUOTE_GROUPS = {
+    "status": "status",
+    "cargo_type": "cargo_type",
+    "broker": "broker__username",
+}
+PROPOSAL_GROUPS = {
+    "status": "status",
+    "insurer": "quote_result__insurer__name",
+    "cargo_type": "cargo_type",
+    "broker": "broker__username",
+}
+PROPOSAL_GROUP_FIELDS = {"quote_result__insurer__name": F("insurer__name")}
+
+
+def _day_ranges(field: str, days) -> Q:
+    """
+    Filtro por intervalos [início, fim) de cada dia no fuso atual, que usa o
+    índice do campo (ao contrário de field__date__in).
+    """
+    ranges = []
+    for day in days:
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        ranges.append(Q(**{f"{field}__gte": start, f"{field}__lt": start + timedelta(days=1)}))
+    return reduce(operator.or_, ranges)
+
+
+def _rebuild_quote_days(days):
+    rows = (
+        QuoteRequest.objects.filter(_day_ranges('request_date', days))
+        .annotate(day=TruncDate('request_date'))
+        .values('day', 'status', 'cargo_type', 'user')
+        .annotate(total=Count('id'), cargo_value=Sum('cargo_value'))
+        .order_by()
+    )
+    DailyQuoteRollup.objects.filter(date__in=days).delete()
+    DailyQuoteRollup.objects.bulk_create([
+        DailyQuoteRollup(
+            date=row['day'], status=row['status'], cargo_type=row['cargo_type'], broker_id=row['user'],
+            quote_count=row['total'], total_cargo_value=row['cargo_value'] or 0,
+        )
+        for row in rows
+    ], batch_size=ROLLUP_BATCH_SIZE)
+
+
+def _rebuild_proposal_days(days):
+    rows = (
+        Proposal.objects.filter(_day_ranges('proposal_date', days))
+        .annotate(day=TruncDate('proposal_date'))
+        .values('day', 'status', 'quote_result__insurer', 'quote_request__cargo_type', 'quote_request__user')
+        .annotate(total=Count('id'), premium=Sum('total_premium'))
+        .order_by()
+    )
+    DailyProposalRollup.objects.filter(date__in=days).delete()
+    DailyProposalRollup.objects.bulk_create([
+        DailyProposalRollup(
+            date=row['day'], status=row['status'], insurer_id=row['quote_result__insurer'],
+            cargo_type=row['quote_request__cargo_type'], broker_id=row['quote_request__user'],
+            proposal_count=row['total'], total_premium=row['premium'] or 0,
+        )
+        for row in rows
+    ], batch_size=ROLLUP_BATCH_SIZE)
+
+
+# Tabela de origem -> (queryset, campo de data, filtros de alterações desde, reagregação, tabela agregada).
+# Cada filtro é consultado separadamente, pelo índice do próprio updated_at, e os dias são unidos.
+ROLLUPS = {
+    QUOTE_REQUEST: (
+        QuoteRequest.objects, 'request_date',
+        lambda since: [Q(updated_at__gte=since)],
+        _rebuild_quote_days, DailyQuoteRollup,
+    ),
+    PROPOSAL: (
+        Proposal.objects, 'proposal_date',
+        # O tipo de carga e o corretor vêm da cotação
+        lambda since: [Q(updated_at__gte=since), Q(quote_request__updated_at__gte=since)],
+        _rebuild_proposal_days, DailyProposalRollup,
+    ),
+}
+
+
+def mark_rollup_days_dirty(model_name: str, dates):
+    """
+    Marca dias a reagregar na próxima atualização (exclusões de registros).
+    """
+    RollupDirtyDay.objects.bulk_create(
+        [RollupDirtyDay(model_name=model_name, date=date) for date in set(dates)], ignore_conflicts=True
+    )
+
+
+def refresh_report_rollups(full: bool = False) -> dict:
+    """
+    Atualiza as tabelas agregadas dos relatórios. Só os dias com registros
+    criados ou alterados desde a última atualização (updated_at), ou marcados
+    por exclusões, são reagregados a partir das tabelas de origem. Com
+    full=True, ou na primeira execução, todas as tabelas são reconstruídas.
+    Retorna o número de dias reagregados por tabela de origem.
+    """
+    refreshed = {}
+    with transaction.atomic():
+        for model_name, (manager, date_field, changed_since, rebuild, rollup_model) in ROLLUPS.items():
+            started_at = timezone.now()
+            # O bloqueio da marca d'água serializa atualizações concorrentes
+            watermark = RollupWatermark.objects.select_for_update().filter(model_name=model_name).first()
+            dirty = list(RollupDirtyDay.objects.filter(model_name=model_name).values_list('id', 'date'))
+
+            if full or watermark is None:
+                rollup_model.objects.all().delete()
+                querysets = [manager.all()]
+            else:
+                since = watermark.refreshed_until - ROLLUP_OVERLAP
+                querysets = [manager.filter(condition) for condition in changed_since(since)]
+            days = set()
+            for queryset in querysets:
+                days.update(queryset.annotate(day=TruncDate(date_field)).order_by().values_list('day', flat=True).distinct())
+            days.update(date for _, date in dirty)
+
+            if days:
+                days = sorted(days)
+                for start in range(0, len(days), ROLLUP_BATCH_SIZE):
+                    rebuild(days[start:start + ROLLUP_BATCH_SIZE])
+            RollupDirtyDay.objects.filter(id__in=[pk for pk, _ in dirty]).delete()
+            RollupWatermark.objects.update_or_create(model_name=model_name, defaults={'refreshed_until': started_at})
+            refreshed[model_name] = len(days)
+
+    logger.info(f"Tabelas de relatórios atualizadas: {refreshed}")
+    return refreshed
+
+
+def _query_rollups(rollup_model, count_field, sum_field, groups, group_by, date_from, date_to, filters, group_fields=None):
+    group_fields = group_fields or {}
+    plain = [groups[name] for name in group_by if groups[name] not in group_fields]
+    aliased = {groups[name]: group_fields[groups[name]] for name in group_by if groups[name] in group_fields}
+    return (
+        rollup_model.objects.filter(date__gte=date_from, date__lte=date_to, **filters)
+        .values(*plain, **aliased)
+        .annotate(count=Sum(count_field), **{sum_field: Sum(sum_field)})
+        .order_by(*[groups[name] for name in group_by])
+    )
+
+
+def quote_report(date_from, date_to, group_by=("status",), **filters):
+    """
+    Cotações no período agrupadas pelos campos de QUOTE_GROUPS, lidas da tabela agregada.
+    """
+    return _query_rollups(
+        DailyQuoteRollup, 'quote_count', 'total_cargo_value', QUOTE_GROUPS, group_by, date_from, date_to, filters
+    )
+
+
+def proposal_report(date_from, date_to, group_by=("insurer",), **filters):
+    """
+    Propostas no período agrupadas pelos campos de PROPOSAL_GROUPS, lidas da tabela agregada.
+    """
+    return _query_rollups(
+        DailyProposalRollup, 'proposal_count', 'total_premium', PROPOSAL_GROUPS, group_by, date_from, date_to,
+        filters, PROPOSAL_GROUP_FIELDS,
+    )
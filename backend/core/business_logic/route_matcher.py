@@ -0,0 +1,75 @@
+from collections import deque
+import re
+import unicodedata
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Remove acentos e normaliza caixa ("São Paulo" -> "sao paulo").
+    """
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text: str) -> list:
+    """
+    Quebra o texto normalizado em palavras alfanuméricas, para que um padrão
+    como "RJ" só case com a palavra inteira, e não dentro de outras palavras.
+    """
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+class RouteMatcher:
+    """
+    Autômato Aho-Corasick sobre tokens, compilado a partir dos nomes das cidades
+    de risco. Verificar um texto custa tempo linear no seu tamanho, independente
+    da quantidade de cidades cadastradas.
+    """
+
+    def __init__(self, names):
+        self._goto = [{}]
+        self._fail = [0]
+        self._terminal = [False]
+
+        for name in names:
+            tokens = tokenize(name)
+            if not tokens:
+                continue
+            state = 0
+            for token in tokens:
+                next_state = self._goto[state].get(token)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][token] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._terminal.append(False)
+                state = next_state
+            self._terminal[state] = True
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(token, 0)
+                # Um estado também é terminal se algum sufixo dele for uma cidade
+                self._terminal[next_state] = self._terminal[next_state] or self._terminal[self._fail[next_state]]
+
+    def matches(self, text: str) -> bool:
+        state = 0
+        for token in tokenize(text):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            if self._terminal[state]:
+                return True
+        return False
@@ -0,0 +1,278 @@
+from apps.insurers.models import Insurer, InsurerBusinessRule, MerchandiseType
+from apps.tasks.pricing_tasks import reprice_open_quotes_task
+from core.business_logic.item_import import iter_lines
+from core.business_logic.rating_snapshot import invalidate_rating_snapshot
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+import csv
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+STAGING_TABLE = "tariff_staging"
+BULK_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+# Colunas obrigatórias da planilha de tarifas
+REQUIRED_COLUMNS = ('insurer', 'merchandise_type', 'rctr_c_rate', 'rc_dc_rate')
+
+# Campos de InsurerBusinessRule carregados da planilha. Em regras novas, colunas ausentes ou
+# células vazias usam o padrão do modelo; em regras existentes, mantêm o valor atual.
+RULE_FIELDS = (
+    'rctr_c_rate', 'rc_dc_rate', 'high_risk_multiplier', 'volume_discount_threshold', 'volume_discount_rate',
+    'franchise_percentage', 'minimum_franchise', 'is_excluded', 'observations', 'valid_from', 'valid_until',
+    'is_active',
+)
+
+BOOLEAN_VALUES = {
+    'true': True, 'sim': True, 's': True, 'yes': True, '1': True,
+    'false': False, 'não': False, 'nao': False, 'n': False, 'no': False, '0': False,
+}
+
+
+class TariffLoadError(Exception):
+    """
+    Erro que impede a leitura da planilha de tarifas (formato, colunas, dependências).
+    """
+    pass
+
+
+def read_tariff_csv(chunks, delimiter: str = ';'):
+    """
+    Lê a planilha CSV (com cabeçalho) em blocos e produz (linha, dicionário).
+    """
+    reader = csv.DictReader(iter_lines(chunks), delimiter=delimiter)
+    _check_columns(reader.fieldnames or [])
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_tariff_parquet(source):
+    """
+    Lê a planilha em Parquet e produz (linha, dicionário). Requer o pacote opcional pyarrow.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise TariffLoadError("A leitura de arquivos Parquet requer o pacote pyarrow.")
+
+    parquet_file = pq.ParquetFile(source)
+    _check_columns(parquet_file.schema_arrow.names)
+    line = 0
+    for batch in parquet_file.iter_batches(batch_size=BULK_BATCH_SIZE):
+        for row in batch.to_pylist():
+            line += 1
+            yield line, {key: '' if value is None else str(value) for key, value in row.items()}
+
+
+def _check_columns(columns):
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise TariffLoadError(f"Colunas obrigatórias ausentes na planilha: {', '.join(missing)}.")
+
+
+def _clean_value(field, raw):
+    """
+    Valor da célula validado pelo campo do modelo, ou None se a célula estiver vazia (não informado).
+    """
+    raw = '' if raw is None else str(raw).strip()
+    if raw == '':
+        return None
+    if isinstance(field, models.DecimalField) and ',' in raw and '.' not in raw:
+        raw = raw.replace(',', '.')  # Aceita vírgula como separador decimal
+    if isinstance(field, models.BooleanField):
+        raw = BOOLEAN_VALUES.get(raw.lower(), raw)
+    return field.clean(raw, None)
+
+
+def _default_value(field):
+    return field.to_python(field.get_default())
+
+
+def parse_tariff_rows(rows, insurer_ids: dict):
+    """
+    Valida as linhas da planilha com as regras dos campos do modelo. Cada regra
+    traz apenas as colunas presentes na planilha, com None nas células vazias.
+    Retorna (regras por (seguradora, mercadoria), níveis de risco por mercadoria, erros).
+    Linhas repetidas para o mesmo par seguradora/mercadoria: prevalece a última.
+    """
+    rule_fields = [InsurerBusinessRule._meta.get_field(name) for name in RULE_FIELDS]
+    risk_level_field = MerchandiseType._meta.get_field('risk_level')
+    rules = {}
+    risk_levels = {}
+    errors = []
+    error_count = 0
+
+    for line, row in rows:
+        try:
+            insurer_name = (row.get('insurer') or '').strip()
+            insurer_id = insurer_ids.get(insurer_name)
+            if insurer_id is None:
+                raise ValidationError(f"Seguradora '{insurer_name}' não cadastrada.")
+            merchandise_name = (row.get('merchandise_type') or '').strip()
+            if not merchandise_name:
+                raise ValidationError("Tipo de mercadoria em branco.")
+            values = {field.name: _clean_value(field, row[field.name]) for field in rule_fields if field.name in row}
+            if (row.get('risk_level') or '').strip():
+                risk_levels[merchandise_name] = risk_level_field.clean(row['risk_level'].strip(), None)
+            else:
+                risk_levels.setdefault(merchandise_name, None)
+        except ValidationError as e:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"Linha {line}: {' '.join(e.messages)}")
+            continue
+        rules[(insurer_id, merchandise_name)] = values
+
+    return rules, risk_levels, errors, error_count
+
+
+def upsert_merchandise_types(risk_levels: dict) -> tuple:
+    """
+    Cria os tipos de mercadoria ausentes e atualiza o nível de risco dos informados.
+    Retorna (ids por nome, quantidade criada).
+    """
+    existing = {m.name: m for m in MerchandiseType.objects.filter(name__in=list(risk_levels))}
+    to_create = [
+        MerchandiseType(name=name, risk_level=risk_level or MerchandiseType._meta.get_field('risk_level').default)
+        for name, risk_level in risk_levels.items() if name not in existing
+    ]
+    to_update = []
+    for name, merchandise_type in existing.items():
+        risk_level = risk_levels[name]
+        if risk_level and merchandise_type.risk_level != risk_level:
+            merchandise_type.risk_level = risk_level
+            to_update.append(merchandise_type)
+
+    MerchandiseType.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    MerchandiseType.objects.bulk_update(to_update, ['risk_level'], batch_size=BULK_BATCH_SIZE)
+    ids = dict(MerchandiseType.objects.filter(name__in=list(risk_levels)).values_list('name', 'id'))
+    return ids, len(to_create)
+
+
+def _upsert_rules_copy(rows: list, update_fields: list) -> int:
+    """
+    PostgreSQL: COPY das regras para uma tabela temporária (células vazias como
+    NULL), um UPDATE das regras existentes apenas nas colunas da planilha
+    (update_fields), mantendo o valor atual onde a célula está vazia, e um
+    INSERT das regras novas com os padrões do modelo.
+    """
+    qn = connection.ops.quote_name
+    table = qn(InsurerBusinessRule._meta.db_table)
+    fields = [InsurerBusinessRule._meta.get_field(name) for name in RULE_FIELDS]
+    columns = ['insurer_id', 'merchandise_type_id'] + [field.column for field in fields]
+    column_types = ['integer', 'integer'] + [field.db_type(connection) for field in fields]
+    column_list = ', '.join(qn(column) for column in columns)
+    key_match = (
+        f"r.{qn('insurer_id')} = s.{qn('insurer_id')} AND r.{qn('merchandise_type_id')} = s.{qn('merchandise_type_id')}"
+    )
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow('' if value is None else value for value in row)
+    buffer.seek(0)
+
+    update_list = ', '.join(
+        f"{qn(field.column)} = COALESCE(s.{qn(field.column)}, r.{qn(field.column)})"
+        for field in fields if field.name in update_fields
+    )
+    insert_list = ', '.join(
+        [f"s.{qn('insurer_id')}", f"s.{qn('merchandise_type_id')}"]
+        + [f"COALESCE(s.{qn(field.column)}, %s::{field.db_type(connection)})" for field in fields]
+    )
+    defaults = [field.get_db_prep_save(_default_value(field), connection) for field in fields]
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {STAGING_TABLE} ("
+            + ', '.join(f"{qn(column)} {column_type}" for column, column_type in zip(columns, column_types))
+            + ") ON COMMIT DROP"
+        )
+        cursor.copy_expert(f"COPY {STAGING_TABLE} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+        updated = 0
+        if update_list:
+            cursor.execute(f"UPDATE {table} r SET {update_list} FROM {STAGING_TABLE} s WHERE {key_match}")
+            updated = cursor.rowcount
+        cursor.execute(
+            f"INSERT INTO {table} ({column_list}, {qn('rate')}) "
+            f"SELECT {insert_list}, 0 FROM {STAGING_TABLE} s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table} r WHERE {key_match})",
+            defaults,
+        )
+        return updated + cursor.rowcount
+
+
+def _upsert_rules_orm(rows: list, update_fields: list) -> int:
+    """
+    Demais bancos: mesma regra do COPY, com as regras existentes carregadas em
+    memória, bulk_update das colunas da planilha e bulk_create das novas.
+    """
+    existing = {
+        (rule.insurer_id, rule.merchandise_type_id): rule
+        for rule in InsurerBusinessRule.objects.filter(
+            insurer_id__in={row[0] for row in rows}, merchandise_type_id__in={row[1] for row in rows}
+        )
+    }
+    to_create = []
+    to_update = []
+    for insurer_id, merchandise_type_id, *values in rows:
+        informed = {name: value for name, value in zip(RULE_FIELDS, values) if value is not None}
+        rule = existing.get((insurer_id, merchandise_type_id))
+        if rule is None:
+            to_create.append(InsurerBusinessRule(insurer_id=insurer_id, merchandise_type_id=merchandise_type_id, **informed))
+            continue
+        for name, value in informed.items():
+            setattr(rule, name, value)
+        to_update.append(rule)
+
+    InsurerBusinessRule.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    if update_fields:
+        InsurerBusinessRule.objects.bulk_update(to_update, update_fields, batch_size=BULK_BATCH_SIZE)
+    return len(to_create) + len(to_update)
+
+
+def load_tariffs(rows, reprice: bool = True) -> dict:
+    """
+    Carrega uma planilha de tarifas em InsurerBusinessRule e MerchandiseType.
+
+    As linhas são validadas antes de qualquer gravação: se houver erros, nada é
+    gravado. Regras existentes só têm alteradas as colunas presentes na
+    planilha, e células vazias mantêm o valor atual; regras novas usam os
+    padrões do modelo no que não for informado. No PostgreSQL as regras são
+    carregadas via COPY em uma tabela temporária; nos demais bancos, com
+    bulk_update/bulk_create. Ao final a versão de configuração de
+    tarifação é incrementada e, se `reprice`, as cotações em aberto das
+    seguradoras afetadas são recalculadas.
+    """
+    insurer_ids = dict(Insurer.objects.values_list('name', 'id'))
+    rules, risk_levels, errors, error_count = parse_tariff_rows(rows, insurer_ids)
+    summary = {"rules": len(rules), "error_count": error_count, "errors": errors}
+    if error_count or not rules:
+        summary.update(loaded=0, merchandise_types_created=0)
+        return summary
+
+    with transaction.atomic():
+        merchandise_ids, created_types = upsert_merchandise_types(risk_levels)
+        rows = [
+            [insurer_id, merchandise_ids[merchandise_name]] + [values.get(name) for name in RULE_FIELDS]
+            for (insurer_id, merchandise_name), values in rules.items()
+        ]
+        # Colunas presentes na planilha: as demais não são alteradas nas regras existentes
+        update_fields = [name for name in RULE_FIELDS if name in next(iter(rules.values()))]
+        if connection.vendor == 'postgresql':
+            loaded = _upsert_rules_copy(rows, update_fields)
+        else:
+            loaded = _upsert_rules_orm(rows, update_fields)
+
+        # Upserts em massa não disparam sinais: invalidar o snapshot explicitamente
+        transaction.on_commit(invalidate_rating_snapshot)
+        if reprice:
+            insurer_list = sorted({insurer_id for insurer_id, _ in rules})
+            transaction.on_commit(lambda: reprice_open_quotes_task.delay(insurer_list))
+
+    logger.info(f"Planilha de tarifas carregada: {loaded} regras, {created_types} tipos de mercadoria criados.")
+    summary.update(loaded=loaded, merchandise_types_created=created_types)
+    return summary
@@ -0,0 +1,224 @@
+from apps.quotes.models import QuoteRequest, QuoteResult
+from core.business_logic.quotation_logic import get_special_conditions, is_high_risk_route
+from core.business_logic.rating_snapshot import RatingSnapshot, get_rating_snapshot
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Escalas de ponto fixo (todos os valores são inteiros int64)
+MONEY_SCALE = 100          # centavos
+RATE_SCALE = 10 ** 4       # taxas com 4 casas decimais
+MULTIPLIER_SCALE = 100     # multiplicadores com 2 casas decimais
+DISCOUNT_SCALE = 10 ** 4   # fator (1 - desconto/100) com 4 casas decimais
+
+# V (centavos) * S (escala 10^10) / 10^12 = prêmio em centavos
+_SPLIT = 10 ** 6
+_PREMIUM_DIVISOR = 10 ** 12
+
+
+def to_fixed(value, scale: int) -> int:
+    return int((Decimal(value) * scale).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_fixed(value: int, scale: int, places: str) -> Decimal:
+    return (Decimal(int(value)) / scale).quantize(Decimal(places))
+
+
+def _round_half_up_div(numerator, divisor: int):
+    # Divisão inteira com arredondamento "half up" para valores não negativos
+    quotient, remainder = np.divmod(numerator, divisor)
+    return quotient + (2 * remainder >= divisor)
+
+
+def _premium_cents(revenue_cents, scaled_rate):
+    """
+    Calcula floor(V * S / 10^12) e o resto sem estourar int64, decompondo os
+    dois operandos em partes de 10^6 (multiplicação longa em inteiros).
+    """
+    a, b = np.divmod(revenue_cents, _SPLIT)
+    c, d = np.divmod(scaled_rate, _SPLIT)
+    middle = a * d + b * c
+    middle_high, middle_low = np.divmod(middle, _SPLIT)
+    carry, remainder = np.divmod(middle_low * _SPLIT + b * d, _PREMIUM_DIVISOR)
+    return a * c + middle_high + carry, remainder
+
+
+class RatingMatrix:
+    """
+    Regras de tarifação do snapshot em formato colunar (seguradoras x tipos de
+    mercadoria), prontas para o cálculo vetorizado.
+    """
+
+    def __init__(self, snapshot: RatingSnapshot):
+        self.insurers = list(snapshot.insurers)
+        self.insurer_ids = np.array([insurer.id for insurer in self.insurers], dtype=np.int64)
+        merchandise_types = list(snapshot.merchandise_types.values())
+        self.type_index = {merchandise_type.name: t for t, merchandise_type in enumerate(merchandise_types)}
+
+        # Pelo menos uma coluna, para que a indexação funcione sem tipos cadastrados
+        shape = (len(self.insurers), max(len(merchandise_types), 1))
+        self.valid = np.zeros(shape, dtype=bool)
+        self.rctr_c_rate = np.zeros(shape, dtype=np.int64)
+        self.rc_dc_rate = np.zeros(shape, dtype=np.int64)
+        self.multiplier = np.full(shape, MULTIPLIER_SCALE, dtype=np.int64)
+        self.discount_threshold = np.zeros(shape, dtype=np.int64)
+        self.discount_factor = np.full(shape, DISCOUNT_SCALE, dtype=np.int64)
+
+        self.minimum_premium = np.array(
+            [to_fixed(insurer.minimum_premium, MONEY_SCALE) for insurer in self.insurers], dtype=np.int64)
+        self.max_rctr_c_limit = np.array(
+            [to_fixed(insurer.max_rctr_c_limit, MONEY_SCALE) for insurer in self.insurers], dtype=np.int64)
+        self.max_rc_dc_limit = np.array(
+            [to_fixed(insurer.max_rc_dc_limit, MONEY_SCALE) for insurer in self.insurers], dtype=np.int64)
+
+        for i, insurer in enumerate(self.insurers):
+            for t, merchandise_type in enumerate(merchandise_types):
+                rule = snapshot.get_rule(insurer, merchandise_type)
+                # Limite de desconto nulo: regra ignorada, como em calculate_premium_for_insurer
+                if rule is None or rule.volume_discount_threshold is None:
+                    continue
+                self.valid[i, t] = True
+                self.rctr_c_rate[i, t] = to_fixed(rule.rctr_c_rate, RATE_SCALE)
+                self.rc_dc_rate[i, t] = to_fixed(rule.rc_dc_rate, RATE_SCALE)
+                self.discount_threshold[i, t] = to_fixed(rule.volume_discount_threshold, MONEY_SCALE)
+                self.discount_factor[i, t] = DISCOUNT_SCALE - to_fixed(rule.volume_discount_rate, MONEY_SCALE)
+
+                risk_level = merchandise_type.risk_level
+                if risk_level != 'LOW':
+                    multiplier = snapshot.risk_multipliers.get(risk_level)
+                    if multiplier is None:
+                        multiplier = rule.high_risk_multiplier if risk_level in ['HIGH', 'EXTREME'] else Decimal('1.0')
+                    self.multiplier[i, t] = to_fixed(multiplier, MULTIPLIER_SCALE)
+
+    def merchandise_indexes(self, cargo_types) -> np.ndarray:
+        return np.array([self.type_index.get(cargo_type, -1) for cargo_type in cargo_types], dtype=np.int64)
+
+
+def price_matrix(matrix: RatingMatrix, monthly_revenue, general_lmg, type_indexes) -> dict:
+    """
+    Aplica a mesma fórmula de calculate_premium_for_insurer a Q cotações x I
+    seguradoras de uma só vez, em inteiros de ponto fixo.
+
+    Entradas: arrays (Q,) com faturamento e LMG em centavos e o índice do tipo de
+    mercadoria (-1 se desconhecido). Saída: arrays (Q, I) com a máscara de
+    validade, prêmio e limites em centavos e taxas em 1/10^4 de ponto percentual.
+    Prêmio e taxas coincidem com calculate_premium_for_insurer, que também arredonda
+    com ROUND_HALF_UP.
+    """
+    revenue = np.asarray(monthly_revenue, dtype=np.int64)[:, None]
+    lmg = np.asarray(general_lmg, dtype=np.int64)[:, None]
+    type_indexes = np.asarray(type_indexes, dtype=np.int64)
+    known_type = (type_indexes >= 0)[:, None]
+    columns = np.where(type_indexes >= 0, type_indexes, 0)
+
+    def gather(table):
+        return table[:, columns].T
+
+    valid = known_type & gather(matrix.valid)
+    threshold = gather(matrix.discount_threshold)
+    discount = np.where((threshold > 0) & (revenue >= threshold), gather(matrix.discount_factor), DISCOUNT_SCALE)
+    factor = gather(matrix.multiplier) * discount
+
+    rctr_c_rate = gather(matrix.rctr_c_rate)
+    rc_dc_rate = gather(matrix.rc_dc_rate)
+    premium, remainder = _premium_cents(revenue, (rctr_c_rate + rc_dc_rate) * factor)
+    minimum = matrix.minimum_premium[None, :]
+    premium = np.where(premium < minimum, minimum, premium + (2 * remainder >= _PREMIUM_DIVISOR))
+
+    rate_divisor = MULTIPLIER_SCALE * DISCOUNT_SCALE
+    return {
+        "valid": valid,
+        "premium": np.where(valid, premium, 0),
+        "rctr_c_rate": np.where(valid, _round_half_up_div(rctr_c_rate * factor, rate_divisor), 0),
+        "rc_dc_rate": np.where(valid, _round_half_up_div(rc_dc_rate * factor, rate_divisor), 0),
+        "rctr_c_limit": np.minimum(lmg, matrix.max_rctr_c_limit[None, :]),
+        "rc_dc_limit": np.minimum(lmg, matrix.max_rc_dc_limit[None, :]),
+    }
+
+
+def reprice_open_quotes(insurer_ids: list = None, chunk_size: int = 2000) -> int:
+    """
+    Recalcula os QuoteResult existentes de todas as cotações em aberto (pendentes
+    e na versão atual) usando o motor vetorizado, e grava com bulk_update.
+    Taxas, limites, prêmio e observações são atualizados; resultados de
+    seguradoras que deixaram de se aplicar (regra removida ou incompleta, como em
+    calculate_premium_for_insurer) são excluídos, exceto os já usados em propostas.
+    Se insurer_ids for informado, apenas os resultados dessas seguradoras são
+    atualizados. Retorna o número de resultados atualizados.
+    """
+    snapshot = get_rating_snapshot()
+    matrix = RatingMatrix(snapshot)
+    insurer_columns = {insurer_id: i for i, insurer_id in enumerate(matrix.insurer_ids.tolist())}
+    if insurer_ids is not None:
+        selected = set(insurer_ids)
+        insurer_columns = {k: v for k, v in insurer_columns.items() if k in selected}
+    if not insurer_columns:
+        return 0
+
+    open_quotes = (
+        QuoteRequest.objects.filter(status="PENDING", is_current_version=True).order_by('id')
+        .only('id', 'cargo_type', 'monthly_revenue', 'general_lmg', 'origin', 'destination')
+    )
+    updated = deleted = 0
+    chunk = []
+    for quote_request in open_quotes.iterator(chunk_size=chunk_size):
+        chunk.append(quote_request)
+        if len(chunk) >= chunk_size:
+            chunk_updated, chunk_deleted = _reprice_chunk(snapshot, matrix, insurer_columns, chunk)
+            updated, deleted = updated + chunk_updated, deleted + chunk_deleted
+            chunk = []
+    if chunk:
+        chunk_updated, chunk_deleted = _reprice_chunk(snapshot, matrix, insurer_columns, chunk)
+        updated, deleted = updated + chunk_updated, deleted + chunk_deleted
+
+    logger.info(f"Repricing vetorizado concluído: {updated} resultados atualizados, {deleted} excluídos.")
+    return updated
+
+
+def _reprice_chunk(snapshot: RatingSnapshot, matrix: RatingMatrix, insurer_columns: dict, quote_requests: list) -> tuple:
+    priced = price_matrix(
+        matrix,
+        [to_fixed(quote_request.monthly_revenue, MONEY_SCALE) for quote_request in quote_requests],
+        [to_fixed(quote_request.general_lmg, MONEY_SCALE) for quote_request in quote_requests],
+        matrix.merchandise_indexes([quote_request.cargo_type for quote_request in quote_requests]),
+    )
+    quote_rows = {quote_request.id: q for q, quote_request in enumerate(quote_requests)}
+    high_risk_routes = [
+        is_high_risk_route(quote_request.origin, quote_request.destination, snapshot) for quote_request in quote_requests
+    ]
+
+    results = list(QuoteResult.objects.filter(
+        quote_request_id__in=list(quote_rows), insurer_id__in=list(insurer_columns)
+    ).only('id', 'quote_request_id', 'insurer_id'))
+
+    to_update = []
+    to_delete = []
+    for result in results:
+        q = quote_rows[result.quote_request_id]
+        i = insurer_columns[result.insurer_id]
+        if not priced["valid"][q, i]:
+            to_delete.append(result.id)
+            continue
+        quote_request = quote_requests[q]
+        insurer = matrix.insurers[i]
+        rule = snapshot.get_rule(insurer, snapshot.get_merchandise_type(quote_request.cargo_type))
+        result.rctr_c_rate = from_fixed(priced["rctr_c_rate"][q, i], RATE_SCALE, '0.0001')
+        result.rc_dc_rate = from_fixed(priced["rc_dc_rate"][q, i], RATE_SCALE, '0.0001')
+        result.rctr_c_limit = from_fixed(priced["rctr_c_limit"][q, i], MONEY_SCALE, '0.01')
+        result.rc_dc_limit = from_fixed(priced["rc_dc_limit"][q, i], MONEY_SCALE, '0.01')
+        result.premium_value = from_fixed(priced["premium"][q, i], MONEY_SCALE, '0.01')
+        result.observations = get_special_conditions(insurer, quote_request, rule, snapshot, high_risk_routes[q])
+        to_update.append(result)
+
+    QuoteResult.objects.bulk_update(
+        to_update,
+        ['rctr_c_rate', 'rc_dc_rate', 'rctr_c_limit', 'rc_dc_limit', 'premium_value', 'observations'],
+        batch_size=1000
+    )
+    deleted = 0
+    if to_delete:
+        # Resultados escolhidos em propostas são mantidos: a exclusão removeria a proposta (CASCADE)
+        deleted, _ = QuoteResult.objects.filter(id__in=to_delete, proposal__isnull=True).delete()
+    return len(to_update), deleted
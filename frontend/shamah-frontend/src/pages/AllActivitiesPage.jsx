@@ -108,7 +108,7 @@ const AllActivitiesPage = () => {
             ) : (
               <div className="space-y-4">
                 {activities.map((activity) => (
-                  <div key={`${activity.action_type}-${activity.id}`} className="flex items-start space-x-4 p-4 border rounded-lg hover:bg-gray-50 transition-colors">
+                  <div key={activity.log_id} className="flex items-start space-x-4 p-4 border rounded-lg hover:bg-gray-50 transition-colors">
                     <div className="flex-shrink-0">
                       {getActivityIcon(activity.action_type)}
                     </div>
@@ -295,7 +295,7 @@ const DashboardPage = () => {
               <CardContent className="p-6">
                 <div className="space-y-4">
                   {recentActivity.map((activity, index) => (
-                    <div key={`${activity.action_type}-${activity.id}`}>
+                    <div key={activity.log_id}>
                       <div className="flex items-start space-x-3">
                         <div className={`p-2 rounded-full ${
                           activity.action_type === 'QUOTE_REQUEST' ? 'bg-blue-100' : 'bg-green-100'